@@ -0,0 +1,115 @@
+"""
+Precompressed variants of exported documents.
+
+Route exports are text (GPX, KML, GeoJSON, CSV) and shrink to a fraction
+of their size when compressed, which matters on the cellular links field
+tablets download over. Since a planned route never changes, each export is
+compressed once when it is generated and every later download picks the
+preferred variant the client accepts. gzip is always available; brotli is
+used when the optional brotli package is installed.
+"""
+
+import gzip
+from typing import Dict, Iterable, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDENTITY = 'identity'
+
+# Content codings in order of preference when a client accepts several
+PREFERRED_ENCODINGS = ('br', 'gzip', IDENTITY)
+
+# Compression effort. Exports are compressed on the first download's
+# request path, so brotli stays at a mid quality: 5 gets most of quality
+# 11's size at a small fraction of its time, which grows steeply with
+# document size above that. gzip's extra effort at level 9 is cheap.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 5
+
+# Documents smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def compress_variants(content: bytes,
+                      min_size: int = MIN_COMPRESS_BYTES) -> Dict[str, bytes]:
+    """
+    Compress a document with every available content coding.
+
+    Args:
+        content: The uncompressed document
+        min_size: Documents shorter than this are only kept uncompressed
+
+    Returns:
+        Dictionary mapping content coding ('identity', 'gzip', 'br') to
+        bytes; codings that do not make the document smaller are left out
+    """
+    variants = {IDENTITY: content}
+    if len(content) < min_size:
+        return variants
+
+    # mtime=0 keeps the output, and so its ETag, stable across runs
+    variants['gzip'] = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+    try:
+        import brotli
+        variants['br'] = brotli.compress(content, quality=BROTLI_QUALITY)
+    except ImportError:
+        logger.debug("brotli not installed, serving gzip only")
+
+    return {coding: data for coding, data in variants.items()
+            if coding == IDENTITY or len(data) < len(content)}
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> str:
+    """
+    Pick the content coding to answer a request with.
+
+    Follows RFC 9110: codings listed with q=0 are refused and '*' stands
+    for any coding not listed. Among acceptable codings the highest q-value
+    wins; ties go by PREFERRED_ENCODINGS order (br, then gzip, then
+    identity), which compress_variants() only keeps when smaller than the
+    document. Identity only competes when the client names it; otherwise it
+    is the fallback.
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header, if any
+        available: Content codings the document is stored in
+
+    Returns:
+        The chosen content coding ('identity' when nothing else fits)
+    """
+    available = set(available)
+    if not accept_encoding:
+        return IDENTITY
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+
+    def weight_of(coding: str) -> float:
+        if coding in weights:
+            return weights[coding]
+        if coding == IDENTITY:
+            return 0.0
+        return weights.get('*', 0.0)
+
+    candidates = [coding for coding in PREFERRED_ENCODINGS
+                  if coding in available and weight_of(coding) > 0]
+    if not candidates:
+        return IDENTITY
+    return max(candidates, key=lambda coding: (weight_of(coding),
+                                               -PREFERRED_ENCODINGS.index(coding)))
@@ -8,6 +8,7 @@ import logging
 from typing import List, Tuple, Dict
 import tempfile
 import os
+from edge_attributes import edge_highway, edge_name
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,7 +22,8 @@ class CPPSolver:
         Initialize CPP solver with a street network graph.
         
         Args:
-            graph: NetworkX MultiDiGraph representing the street network
+            graph: NetworkX MultiDiGraph representing the street network, or
+                a graph_arrays.ArrayGraph snapshot (read in place, not copied)
         """
         self.graph = graph.copy()
         self.augmented_graph = None
@@ -88,6 +90,12 @@ class CPPSolver:
         Returns:
             DataFrame with columns: node_from, node_to, distance, and other edge attributes
         """
+        if hasattr(self.graph, 'edge_frame'):
+            # Snapshot graphs build the frame straight from their columns
+            df = self.graph.edge_frame()
+            logger.info(f"Converted graph snapshot to edge list with {len(df)} edges")
+            return df
+
         edges = []
         
         # Handle MultiDiGraph - may have multiple edges between nodes
@@ -99,10 +107,16 @@ class CPPSolver:
                 'length': data.get('length', 1.0)  # Keep length for compatibility
             }
             
-            # Add other relevant attributes
-            for attr in ['name', 'highway', 'oneway']:
-                if attr in data:
-                    edge_data[attr] = data[attr]
+            # Add other relevant attributes (names and highway classes may be
+            # interned into codes by MapLoader)
+            name = edge_name(self.graph, data)
+            if name is not None:
+                edge_data['name'] = name
+            highway = edge_highway(self.graph, data)
+            if highway is not None:
+                edge_data['highway'] = highway
+            if 'oneway' in data:
+                edge_data['oneway'] = data['oneway']
             
             edges.append(edge_data)
         
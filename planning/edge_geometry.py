@@ -0,0 +1,206 @@
+"""
+Per-graph lon/lat geometry table shared by all route export formats.
+
+Each export format used to walk the route on its own, look up the edge
+dicts of every traversed edge, search the multi-edges for geometry and
+reproject it point by point. EdgeGeometryTable does that work once per
+graph: it keeps node positions as arrays and the lon/lat geometry of every
+(u, v) edge pair in one flat coordinate array with per-edge offsets,
+reprojected in a single batched transform. Exports then map the route to
+node and edge indices and gather from the table.
+"""
+
+import numpy as np
+import networkx as nx
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+import logging
+
+from edge_attributes import edge_name
+from graph_simplify import edge_coordinates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def is_projected(graph: nx.MultiDiGraph) -> bool:
+    """Check whether a graph's coordinates need reprojecting to lat/lon."""
+    crs = graph.graph.get('crs', 'EPSG:4326')
+    return crs != 'EPSG:4326' and crs != 'epsg:4326'
+
+
+class EdgeGeometryTable:
+    """Node positions and per-edge lon/lat geometry of a graph."""
+
+    def __init__(self, graph: nx.MultiDiGraph):
+        """
+        Build the table.
+
+        Args:
+            graph: Street graph (NetworkX or graph_arrays.ArrayGraph) with
+                'lat'/'lon' or 'x'/'y' node attributes
+        """
+        transformer = None
+        self.projected = is_projected(graph)
+        if self.projected:
+            from pyproj import Transformer
+            transformer = Transformer.from_crs(graph.graph['crs'], 'EPSG:4326', always_xy=True)
+
+        # Nodes: lat/lon attributes (falling back to y/x) as written by the
+        # node-based formats, and x/y reprojected for the GeoJSON fallback
+        self.node_ids: List[Hashable] = list(graph.nodes)
+        self.node_index: Dict[Hashable, int] = {n: i for i, n in enumerate(self.node_ids)}
+        nodes = graph.nodes
+        node_data = [nodes[n] for n in self.node_ids]
+        self.node_lat = _column([d.get('lat', d.get('y')) for d in node_data])
+        self.node_lon = _column([d.get('lon', d.get('x')) for d in node_data])
+        node_x = _column([d.get('x') for d in node_data])
+        node_y = _column([d.get('y') for d in node_data])
+        # Node formats skip nodes with a missing or zero coordinate
+        self.node_valid = (np.isfinite(self.node_lat) & np.isfinite(self.node_lon) &
+                           (self.node_lat != 0) & (self.node_lon != 0))
+        self.node_xy_valid = np.isfinite(node_x) & np.isfinite(node_y)
+
+        # Edge pairs: geometry of the first multi-edge that has any, and the
+        # first street name
+        self.edge_index: Dict[Tuple[Hashable, Hashable], int] = {}
+        self.edge_names: List[Optional[str]] = []
+        pieces = []
+        for u, v, data in graph.edges(data=True):
+            i = self.edge_index.get((u, v))
+            if i is None:
+                i = self.edge_index[(u, v)] = len(self.edge_names)
+                self.edge_names.append(None)
+                pieces.append(None)
+            if pieces[i] is None:
+                coords = edge_coordinates(data)
+                if coords is not None:
+                    pieces[i] = np.asarray(coords, dtype=np.float64)[:, :2]
+            if self.edge_names[i] is None:
+                self.edge_names[i] = edge_name(graph, data)
+        counts = [0 if p is None else len(p) for p in pieces]
+        self.has_geometry = np.array([p is not None for p in pieces], dtype=bool)
+        self.offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64)
+        coords = np.concatenate([p for p in pieces if p is not None]) \
+            if self.has_geometry.any() else np.zeros((0, 2))
+
+        # One transform call for every edge vertex and node; node_x_lon and
+        # node_y_lat hold node x/y in lon/lat
+        self.node_x_lon, self.node_y_lat = node_x, node_y
+        if transformer is not None:
+            xs = np.concatenate([coords[:, 0], node_x])
+            ys = np.concatenate([coords[:, 1], node_y])
+            lon, lat = transformer.transform(xs, ys)
+            coords = np.column_stack([lon[:len(coords)], lat[:len(coords)]])
+            self.node_x_lon, self.node_y_lat = lon[len(coords):], lat[len(coords):]
+        self.coords = coords
+
+        logger.info(f"Built edge geometry table: {len(self.node_ids)} nodes, "
+                    f"{len(self.edge_names)} edge pairs, {len(coords)} vertices")
+
+    def route_indices(self, route: Sequence[Tuple[Hashable, Hashable]]
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Map a route to table indices.
+
+        Args:
+            route: List of edge tuples (node_from, node_to)
+
+        Returns:
+            Tuple of (from-node indices, to-node indices, edge pair indices
+            with -1 for pairs not in the graph)
+        """
+        node_index, edge_index = self.node_index, self.edge_index
+        count = len(route)
+        u = np.fromiter((node_index[e[0]] for e in route), dtype=np.int64, count=count)
+        v = np.fromiter((node_index[e[1]] for e in route), dtype=np.int64, count=count)
+        edges = np.fromiter((edge_index.get((e[0], e[1]), -1) for e in route),
+                            dtype=np.int64, count=count)
+        return u, v, edges
+
+    def route_points(self, u_idx: np.ndarray, v_idx: np.ndarray, e_idx: np.ndarray,
+                     previous_v: int = -1, previous_point: Optional[np.ndarray] = None
+                     ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Gather the lon/lat line of a route (or a chunk of one).
+        
+        Edges with geometry contribute their vertices, dropping the first one
+        when it repeats the previous point. Edges without geometry contribute
+        their end nodes, skipping the from node when the previous such edge
+        ended there.
+        
+        Args:
+            u_idx: From-node indices (see route_indices)
+            v_idx: To-node indices
+            e_idx: Edge pair indices
+            previous_v: To-node index of the last edge without geometry in
+                earlier chunks, or -1
+            previous_point: Last point of earlier chunks, or None
+            
+        Returns:
+            Tuple of (points as an (n, 2) lon/lat array, position of each
+            point's edge in the chunk, previous_v for the next chunk)
+        """
+        has_geometry = np.zeros(len(e_idx), dtype=bool)
+        known = e_idx >= 0
+        has_geometry[known] = self.has_geometry[e_idx[known]]
+        
+        if self.projected:
+            # Graph is projected, use x/y transformed to lon/lat
+            node_lon, node_lat, node_ok = self.node_x_lon, self.node_y_lat, self.node_xy_valid
+        else:
+            # Graph is not projected, use lat/lon directly
+            node_lon, node_lat, node_ok = self.node_lon, self.node_lat, self.node_valid
+        
+        # Points per route edge
+        geometry = np.flatnonzero(has_geometry)
+        fallback = np.flatnonzero(~has_geometry)
+        edges = e_idx[geometry]
+        geometry_counts = self.offsets[edges + 1] - self.offsets[edges]
+        previous = np.concatenate([[previous_v], v_idx[fallback[:-1]]])
+        with_u = (u_idx[fallback] != previous) & node_ok[u_idx[fallback]]
+        with_v = node_ok[v_idx[fallback]]
+        counts = np.zeros(len(e_idx), dtype=np.int64)
+        counts[geometry] = geometry_counts
+        counts[fallback] = with_u.astype(np.int64) + with_v
+        starts = np.cumsum(counts) - counts
+        
+        points = np.empty((int(counts.sum()), 2))
+        points[concat_ranges(starts[geometry], geometry_counts)] = \
+            self.coords[concat_ranges(self.offsets[edges], geometry_counts)]
+        for nodes, positions in ((u_idx[fallback][with_u], starts[fallback][with_u]),
+                                 (v_idx[fallback][with_v], starts[fallback][with_v] + with_u[with_v])):
+            points[positions] = np.column_stack([node_lon[nodes], node_lat[nodes]])
+        point_edges = np.repeat(np.arange(len(e_idx)), counts)
+        
+        # Drop the first vertex of a street when it repeats the previous point
+        first = starts[geometry][geometry_counts > 0]
+        before = np.empty((len(first), 2))
+        inner = first > 0
+        before[inner] = points[first[inner] - 1]
+        if previous_point is None:
+            before[~inner] = np.nan
+        else:
+            before[~inner] = previous_point
+        repeated = np.all(np.abs(points[first] - before) < 0.000001, axis=1)
+        keep = np.ones(len(points), dtype=bool)
+        keep[first[repeated]] = False
+        
+        if len(fallback):
+            previous_v = int(v_idx[fallback[-1]])
+        return points[keep], point_edges[keep], previous_v
+
+    def edge_coords(self, edge: int) -> np.ndarray:
+        """Lon/lat vertices of an edge pair (empty if it has no geometry)."""
+        return self.coords[self.offsets[edge]:self.offsets[edge + 1]]
+
+
+def concat_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate arange(start, start + count) for each start and count."""
+    total = int(counts.sum())
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(total)
+
+
+def _column(values: list) -> np.ndarray:
+    """Float array of node attribute values, NaN where missing."""
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
@@ -0,0 +1,227 @@
+"""
+Local gazetteer of place boundary polygons.
+
+MapLoader.load_by_place used to resolve every place name through Nominatim.
+The gazetteer keeps resolved boundaries in a JSON store indexed by
+normalized place name and aliases, so repeated lookups are a dictionary hit
+and offline workers can run from a store seeded ahead of time from a
+GeoJSON file. Names missing from the store fall back to the online resolver
+and the result is saved for next time.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+import logging
+
+from shapely.geometry import mapping, shape
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Store file name inside the OSMnx cache folder
+DEFAULT_STORE_NAME = 'gazetteer.json'
+
+
+def normalize_place_name(name: str) -> str:
+    """
+    Normalize a place name for lookup.
+
+    Case, Unicode form, repeated whitespace, spacing around commas and
+    trailing periods are ignored, so "Piedmont, California, USA" and
+    " piedmont ,california,  usa." map to the same key.
+
+    Args:
+        name: Place name
+
+    Returns:
+        Normalized lookup key
+    """
+    name = unicodedata.normalize('NFKC', name).casefold()
+    parts = [re.sub(r'\s+', ' ', part).strip().rstrip('.').strip() for part in name.split(',')]
+    return ','.join(part for part in parts if part)
+
+
+class Gazetteer:
+    """Place name to boundary polygon store with an online fallback."""
+
+    def __init__(self, path: Optional[str] = None, online_fallback: bool = True):
+        """
+        Initialize the gazetteer, loading the store file if it exists.
+
+        Args:
+            path: JSON store path (default: gazetteer.json in the OSMnx
+                cache folder)
+            online_fallback: If True, resolve unknown names with OSMnx
+                geocoding and save the result to the store
+        """
+        if path is None:
+            import osmnx as ox
+            path = os.path.join(ox.settings.cache_folder, DEFAULT_STORE_NAME)
+        self.path = path
+        self.online_fallback = online_fallback
+
+        # places: canonical name -> {'aliases': [...], 'geometry': GeoJSON}
+        self.places: Dict[str, dict] = {}
+        # index: normalized name or alias -> canonical name
+        self.index: Dict[str, str] = {}
+        # Parsed polygons, built on first lookup of each place
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for name, entry in json.load(f).get('places', {}).items():
+                    self._index_place(name, entry)
+            logger.info(f"Loaded {len(self.places)} places from gazetteer {path}")
+
+    def lookup(self, name: str):
+        """
+        Look up a place boundary in the local store only.
+
+        Args:
+            name: Place name or alias
+
+        Returns:
+            Shapely (Multi)Polygon in lat/lon, or None if unknown
+        """
+        canonical = self.index.get(normalize_place_name(name))
+        if canonical is None:
+            return None
+        polygon = self._shapes.get(canonical)
+        if polygon is None:
+            polygon = shape(self.places[canonical]['geometry'])
+            self._shapes[canonical] = polygon
+        return polygon
+
+    def resolve(self, name: str):
+        """
+        Get a place boundary, geocoding it online if it is not stored.
+
+        Args:
+            name: Place name or alias
+
+        Returns:
+            Shapely (Multi)Polygon in lat/lon
+
+        Raises:
+            ValueError: If the place is unknown and online fallback is disabled
+        """
+        polygon = self.lookup(name)
+        if polygon is not None:
+            logger.info(f"Resolved {name} from local gazetteer")
+            return polygon
+        if not self.online_fallback:
+            raise ValueError(f"Place not in gazetteer: {name}")
+
+        import osmnx as ox
+        logger.info(f"Geocoding {name} online")
+        polygon = ox.geocode_to_gdf(name).union_all()
+        self.add(name, polygon)
+        self.save()
+        return polygon
+
+    def add(self, name: str, polygon, aliases: Iterable[str] = ()) -> None:
+        """
+        Add or replace a place in the store (in memory; call save() to persist).
+
+        Args:
+            name: Canonical place name
+            polygon: Shapely (Multi)Polygon in lat/lon
+            aliases: Other names that resolve to the same place
+        """
+        entry = {'aliases': sorted(set(aliases)), 'geometry': mapping(polygon)}
+        with self._lock:
+            self._index_place(name, entry)
+            self._shapes[name] = polygon
+
+    def add_alias(self, name: str, alias: str) -> None:
+        """
+        Make an alias resolve to an already stored place.
+
+        Args:
+            name: Stored place name or alias
+            alias: New alias
+
+        Raises:
+            ValueError: If the place is not stored
+        """
+        canonical = self.index.get(normalize_place_name(name))
+        if canonical is None:
+            raise ValueError(f"Place not in gazetteer: {name}")
+        with self._lock:
+            aliases = self.places[canonical]['aliases']
+            if alias not in aliases:
+                aliases.append(alias)
+            self.index[normalize_place_name(alias)] = canonical
+
+    def seed_from_file(self, path: str, name_property: str = 'name',
+                       aliases_property: str = 'aliases') -> int:
+        """
+        Add places from a GeoJSON FeatureCollection.
+
+        Each feature needs a name property; an optional aliases property
+        holds a list of other names. The store is saved afterwards.
+
+        Args:
+            path: GeoJSON file path
+            name_property: Feature property holding the place name
+            aliases_property: Feature property holding the alias list
+
+        Returns:
+            Number of places added
+
+        Raises:
+            ValueError: If a feature has no name
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json.load(f)['features']
+
+        for feature in features:
+            properties = feature.get('properties') or {}
+            name = properties.get(name_property)
+            if not name:
+                raise ValueError(f"Feature without '{name_property}' property in {path}")
+            self.add(name, shape(feature['geometry']), properties.get(aliases_property, []))
+
+        self.save()
+        logger.info(f"Seeded gazetteer with {len(features)} places from {path}")
+        return len(features)
+
+    def names(self) -> List[str]:
+        """Get the canonical names of all stored places."""
+        return sorted(self.places)
+
+    def save(self) -> None:
+        """Write the store to disk atomically."""
+        with self._lock:
+            data = json.dumps({'places': self.places})
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+    def _index_place(self, name: str, entry: dict) -> None:
+        """Store an entry and index its name and aliases."""
+        self.places[name] = entry
+        self._shapes.pop(name, None)
+        self.index[normalize_place_name(name)] = name
+        for alias in entry.get('aliases', []):
+            self.index[normalize_place_name(alias)] = name
+
+
+_default_gazetteer = None
+
+
+def default_gazetteer() -> Gazetteer:
+    """Get the process-wide gazetteer backed by the default store file."""
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer()
+    return _default_gazetteer
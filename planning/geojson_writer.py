@@ -0,0 +1,279 @@
+"""
+Streaming GeoJSON writer for planned routes.
+
+RouteExporter.export_to_geojson builds the whole FeatureCollection as nested
+lists and dicts and writes it indented. This writer instead walks the route
+in fixed-size chunks, gathers each chunk's lon/lat line from the graph's
+EdgeGeometryTable and emits it straight away with compact separators and
+fixed coordinate precision. Memory use depends on the chunk size (and, for
+per-segment output, on the number of distinct streets), not on route
+length. Output is the same document structure as export_to_geojson, except
+that summary properties that are only known at the end (point and segment
+counts) are written after the features. iter_window_geojson() writes the
+segments of all or part of a route from its precomputed RouteColumns (the
+route's segment index) instead of the graph.
+"""
+
+import json
+import numpy as np
+from datetime import datetime
+from typing import Dict, Hashable, Iterator, List, Optional, TextIO, Tuple
+import logging
+
+from edge_geometry import EdgeGeometryTable
+from route_encoding import RouteColumns
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Route edges gathered and formatted per chunk
+CHUNK_EDGES = 4096
+
+# Decimal places of written coordinates (6 is about 0.1 m)
+DEFAULT_PRECISION = 6
+
+# One feature of the segmented document, as written by json.dumps; node ids
+# and the edge key are filled in as JSON text, so any node id type works
+_SEGMENT_FEATURE = ('{"type":"Feature","properties":{"segment_index":%d,"from_node":%s,'
+                    '"to_node":%s,"traversal_number":%d,"edge_key":%s,"street_name":%s},'
+                    '"geometry":{"type":"LineString","coordinates":[%s]}}')
+
+
+def iter_route_geojson(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                       route_name: str = "StreetView Route", include_segments: bool = False,
+                       precision: int = DEFAULT_PRECISION,
+                       chunk_edges: int = CHUNK_EDGES,
+                       keep: Optional[np.ndarray] = None) -> Iterator[str]:
+    """
+    Generate a route's GeoJSON document in pieces.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        route_name: Name for the route
+        include_segments: If True, one feature per traversed edge with
+            traversal metadata, otherwise one LineString for the route
+        precision: Decimal places of coordinates
+        chunk_edges: Route edges gathered per chunk
+        keep: Optional mask over the route's points (e.g. a simplification
+            level from polyline_simplify.RouteLevels); other points are skipped
+
+    Returns:
+        Iterator of JSON text pieces that concatenate to the document
+    """
+    timestamp = datetime.now().isoformat()
+    if include_segments:
+        yield from _iter_segments(table, route, route_name, timestamp, precision, chunk_edges, keep)
+        return
+
+    yield '{"type":"FeatureCollection","features":[{"type":"Feature","geometry":' \
+          '{"type":"LineString","coordinates":['
+    total_points = 0
+    for points, _, _ in iter_route_chunks(table, route, chunk_edges, keep):
+        if len(points):
+            yield (',' if total_points else '') + _format_points(points, precision)
+            total_points += len(points)
+    yield ']},"properties":' + _dumps({
+        'name': route_name,
+        'timestamp': timestamp,
+        'total_points': total_points,
+        'total_edges': len(route),
+    }) + '}]}'
+
+
+def write_route_geojson(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                        output: TextIO, **options) -> int:
+    """
+    Stream a route's GeoJSON document to a text file or socket wrapper.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        output: Object with a write(str) method
+        **options: Passed to iter_route_geojson
+
+    Returns:
+        Number of characters written
+    """
+    written = 0
+    for piece in iter_route_geojson(table, route, **options):
+        output.write(piece)
+        written += len(piece)
+    return written
+
+
+def window_geojson(columns: RouteColumns, route: List[Tuple[Hashable, Hashable]],
+                   start: int = 0, stop: Optional[int] = None,
+                   keep: Optional[np.ndarray] = None,
+                   precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Write the segmented GeoJSON of a window of a route's segments.
+
+    Args:
+        columns: The route's precomputed columns
+        route: List of edge tuples (node_from, node_to) the columns were made from
+        start: First segment
+        stop: Segment after the window (default: end of the route)
+        keep: Optional mask over the route's points
+        precision: Decimal places of coordinates
+
+    Returns:
+        Compact GeoJSON text
+    """
+    return ''.join(iter_window_geojson(columns, route, start, stop, keep=keep,
+                                       precision=precision))
+
+
+def iter_window_geojson(columns: RouteColumns, route: List[Tuple[Hashable, Hashable]],
+                        start: int = 0, stop: Optional[int] = None,
+                        keep: Optional[np.ndarray] = None,
+                        precision: int = DEFAULT_PRECISION,
+                        chunk_edges: int = CHUNK_EDGES) -> Iterator[str]:
+    """
+    Generate the segmented GeoJSON of a window of a route's segments in pieces.
+
+    Features are those the streamed segments document has for the window,
+    so that windows fetched one after another concatenate to it; traversal
+    numbers, names and geometry come from the columns instead of the graph.
+
+    Args:
+        columns: The route's precomputed columns
+        route: List of edge tuples (node_from, node_to) the columns were made from
+        start: First segment
+        stop: Segment after the window (default: end of the route)
+        keep: Optional mask over the route's points
+        precision: Decimal places of coordinates
+        chunk_edges: Segments formatted per piece
+
+    Returns:
+        Iterator of JSON text pieces that concatenate to the document
+    """
+    start, stop = columns.clip(start, stop)
+    timestamp = datetime.now().isoformat()
+    # Names are JSON-encoded once, code -1 picks the trailing empty name
+    names = [_dumps(name) for name in columns.names] + ['""']
+    yield '{"type":"FeatureCollection","features":['
+    n_features = 0
+    for chunk_start in range(start, stop, chunk_edges):
+        chunk_stop = min(stop, chunk_start + chunk_edges)
+        points, offsets, traversals, name_codes = columns.window(chunk_start, chunk_stop, keep)
+        pairs = _point_strings(points, precision)
+        offsets = offsets.tolist()
+        pieces = []
+        for i, ((u, v), traversal, code) in enumerate(zip(route[chunk_start:chunk_stop],
+                                                          traversals.tolist(),
+                                                          name_codes.tolist())):
+            first, last = offsets[i], offsets[i + 1]
+            if first == last:
+                continue
+            low, high = (u, v) if u <= v else (v, u)
+            pieces.append(_SEGMENT_FEATURE % (
+                chunk_start + i, _node_json(u), _node_json(v), traversal,
+                _edge_key_json(low, high), names[code], ','.join(pairs[first:last])))
+        if pieces:
+            yield (',' if n_features else '') + ','.join(pieces)
+            n_features += len(pieces)
+
+    collection = columns.properties(start, stop)
+    collection.pop('total_points')
+    collection['timestamp'] = timestamp
+    collection['total_segments'] = n_features
+    yield '],"properties":' + _dumps(collection) + '}'
+
+
+def _iter_segments(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                   route_name: str, timestamp: str, precision: int,
+                   chunk_edges: int, keep: Optional[np.ndarray]) -> Iterator[str]:
+    """Generate the per-segment FeatureCollection."""
+    yield '{"type":"FeatureCollection","features":['
+    traversals: Dict[Tuple[Hashable, Hashable], int] = {}
+    n_segments = 0
+    for points, point_edges, chunk_start in iter_route_chunks(table, route, chunk_edges, keep):
+        chunk = route[chunk_start:chunk_start + chunk_edges]
+        counts = np.bincount(point_edges, minlength=len(chunk)).tolist()
+        ends = np.cumsum(counts).tolist()
+        e_idx = table.route_indices(chunk)[2]
+        pieces = []
+        for offset, ((u, v), count, end) in enumerate(zip(chunk, counts, ends)):
+            # Track traversals
+            edge_key = (min(u, v), max(u, v))  # Normalize edge direction
+            traversals[edge_key] = traversals.get(edge_key, 0) + 1
+            if not count:
+                continue
+            edge = int(e_idx[offset])
+            name = ''
+            if edge >= 0 and table.has_geometry[edge] and table.edge_names[edge] is not None:
+                name = table.edge_names[edge]
+            properties = _dumps({
+                'segment_index': chunk_start + offset,
+                'from_node': u,
+                'to_node': v,
+                'traversal_number': traversals[edge_key],
+                'edge_key': f"{edge_key[0]}_{edge_key[1]}",
+                'street_name': name,
+            })
+            pieces.append('{"type":"Feature","properties":' + properties +
+                          ',"geometry":{"type":"LineString","coordinates":[' +
+                          _format_points(points[end - count:end], precision) + ']}}')
+        if pieces:
+            yield (',' if n_segments else '') + ','.join(pieces)
+            n_segments += len(pieces)
+    yield '],"properties":' + _dumps({
+        'name': route_name,
+        'timestamp': timestamp,
+        'total_segments': n_segments,
+        'total_edges': len(route),
+        'unique_edges': len(traversals),
+        'max_traversals': max(traversals.values()) if traversals else 0,
+    }) + '}'
+
+
+def iter_route_chunks(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                 chunk_edges: int, keep: Optional[np.ndarray] = None
+                 ) -> Iterator[Tuple[np.ndarray, np.ndarray, int]]:
+    """Gather the route line chunk by chunk, carrying duplicate and fallback state over."""
+    previous_v = -1
+    previous_point: Optional[np.ndarray] = None
+    point_start = 0
+    for chunk_start in range(0, len(route), chunk_edges):
+        chunk = route[chunk_start:chunk_start + chunk_edges]
+        points, point_edges, previous_v = table.route_points(
+            *table.route_indices(chunk), previous_v=previous_v, previous_point=previous_point)
+        if len(points):
+            previous_point = points[-1]
+        if keep is not None:
+            chunk_keep = keep[point_start:point_start + len(points)]
+            point_start += len(points)
+            points, point_edges = points[chunk_keep], point_edges[chunk_keep]
+        yield points, point_edges, chunk_start
+
+
+def _format_points(points: np.ndarray, precision: int) -> str:
+    """Format (n, 2) points as comma-separated [lon,lat] pairs in one formatting call."""
+    template = ','.join([f'[%.{precision}f,%.{precision}f]'] * len(points))
+    return template % tuple(points.ravel().tolist())
+
+
+def _point_strings(points: np.ndarray, precision: int) -> List[str]:
+    """Format (n, 2) points as a list of [lon,lat] strings in one formatting call."""
+    if not len(points):
+        return []
+    template = '|'.join([f'[%.{precision}f,%.{precision}f]'] * len(points))
+    return (template % tuple(points.ravel().tolist())).split('|')
+
+
+def _dumps(value) -> str:
+    """Compact JSON text."""
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _node_json(node) -> str:
+    """JSON text of a node id, skipping json.dumps for OSM integer ids."""
+    return str(node) if type(node) is int else _dumps(node)
+
+
+def _edge_key_json(low, high) -> str:
+    """JSON text of an edge key 'low_high', as _iter_segments writes it."""
+    if type(low) is int and type(high) is int:
+        return '"%d_%d"' % (low, high)
+    return _dumps(f"{low}_{high}")
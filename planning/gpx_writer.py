@@ -0,0 +1,266 @@
+"""
+Streaming GPX writer for planned routes.
+
+RouteExporter.export_to_gpx used to build a gpxpy object per track point
+and serialize the document through gpxpy's XML builder, which is slow and
+holds every point in memory twice. This writer gathers the track points
+chunk by chunk from the graph's EdgeGeometryTable and formats each chunk
+with a single string operation. Its output is byte for byte what gpxpy
+1.6 writes for the same track: the same header, indentation and number
+formatting. Optionally the track is split into several segments for GPS
+units that limit segment length, and a route (<rte>) of turn instructions
+is written ahead of the track for navigation apps.
+"""
+
+import numpy as np
+from typing import Hashable, Iterator, List, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape
+import logging
+
+from edge_geometry import EdgeGeometryTable, concat_ranges
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Route edges gathered and formatted per chunk
+CHUNK_EDGES = 4096
+
+# Smallest change of heading (degrees) at a junction written as a turn,
+# and the change from which it is a U-turn
+TURN_ANGLE = 45.0
+U_TURN_ANGLE = 150.0
+
+GPX_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<gpx xmlns="http://www.topografix.com/GPX/1/1" '
+              'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+              'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
+              'http://www.topografix.com/GPX/1/1/gpx.xsd" version="1.1" '
+              'creator="gpx.py -- https://github.com/tkrajina/gpxpy">')
+
+_TRACK_POINT = '\n      <trkpt lat="%s" lon="%s">\n      </trkpt>'
+_ROUTE_POINT = '\n    <rtept lat="%s" lon="%s">\n      <name>%s</name>\n    </rtept>'
+_SEGMENT_BREAK = '\n    </trkseg>\n    <trkseg>'
+
+
+def iter_route_gpx(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                   route_name: Optional[str] = "StreetView Route",
+                   max_segment_points: Optional[int] = None,
+                   include_turns: bool = False,
+                   chunk_edges: int = CHUNK_EDGES) -> Iterator[str]:
+    """
+    Generate a route's GPX 1.1 document in pieces.
+
+    The track holds each node the first time the route reaches it and the
+    street geometry of every traversed edge, as export_to_gpx always has.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        route_name: Name for the track (and route of turns), or None for none
+        max_segment_points: If given, start a new track segment after this
+            many points; each segment starts with the last point of the
+            previous one so the line stays connected
+        include_turns: If True, write a route with a point per turn
+        chunk_edges: Route edges gathered per chunk
+
+    Returns:
+        Iterator of XML text pieces that concatenate to the document
+
+    Raises:
+        ValueError: If max_segment_points is less than 2
+    """
+    if max_segment_points is not None and max_segment_points < 2:
+        raise ValueError(f"max_segment_points must be at least 2, got {max_segment_points}")
+    name = '' if route_name is None else f'\n    <name>{escape(route_name)}</name>'
+
+    yield GPX_HEADER
+    if include_turns:
+        yield '\n  <rte>' + name
+        for start in range(0, len(route), chunk_edges):
+            # Chunks overlap by one edge so junctions between them are seen
+            turns = route_turns(table, route[max(start - 1, 0):start + chunk_edges])
+            if turns:
+                yield ''.join(_ROUTE_POINT % (_number(lat), _number(lon), escape(text))
+                              for lat, lon, text in turns)
+        yield '\n  </rte>'
+    yield '\n  <trk>' + name + '\n    <trkseg>'
+
+    added = ~table.node_valid
+    in_segment = 0
+    last_point = ''
+    for start in range(0, len(route), chunk_edges):
+        lat, lon = track_points(table, route[start:start + chunk_edges], added)
+        points = _point_strings(lat, lon)
+        if max_segment_points is None:
+            if points:
+                yield ''.join(points)
+            continue
+        pieces = []
+        while points:
+            room = max_segment_points - in_segment
+            if room == 0:
+                pieces.append(_SEGMENT_BREAK + last_point)
+                in_segment = 1
+                continue
+            taken, points = points[:room], points[room:]
+            pieces.extend(taken)
+            in_segment += len(taken)
+            last_point = taken[-1]
+        yield ''.join(pieces)
+    yield '\n    </trkseg>\n  </trk>\n</gpx>'
+
+
+def write_route_gpx(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                    output: TextIO, **options) -> int:
+    """
+    Stream a route's GPX document to a text file or buffer.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        output: Object with a write(str) method
+        **options: Passed to iter_route_gpx
+
+    Returns:
+        Number of characters written
+    """
+    written = 0
+    for piece in iter_route_gpx(table, route, **options):
+        output.write(piece)
+        written += len(piece)
+    return written
+
+
+def track_points(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                 added: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gather the GPX track points of a route (or a chunk of one).
+
+    Each edge contributes its from node if not added before, the inner
+    vertices of its geometry, and its to node if not added before.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        added: Per node, whether it was written already; updated in place
+            and carried over between chunks
+
+    Returns:
+        Tuple of (latitudes, longitudes) of the points in order
+    """
+    u_idx, v_idx, e_idx = table.route_indices(route)
+    if not len(u_idx):
+        return np.zeros(0), np.zeros(0)
+
+    # New nodes: the first occurrence of each node not added in earlier chunks
+    nodes = np.column_stack([u_idx, v_idx]).ravel()
+    _, first = np.unique(nodes, return_index=True)
+    new = np.zeros(len(nodes), dtype=bool)
+    new[first] = True
+    new &= ~added[nodes]
+    added[nodes[new]] = True
+    new_u, new_v = new[0::2], new[1::2]
+
+    # Inner vertices of each edge's geometry
+    known = e_idx >= 0
+    inner_starts = np.zeros(len(e_idx), dtype=np.int64)
+    inner_counts = np.zeros(len(e_idx), dtype=np.int64)
+    edges = e_idx[known]
+    inner_starts[known] = table.offsets[edges] + 1
+    inner_counts[known] = np.maximum(table.offsets[edges + 1] - table.offsets[edges] - 2, 0)
+
+    # Place from nodes, inner vertices and to nodes edge by edge
+    sizes = new_u + inner_counts + new_v
+    edge_starts = np.cumsum(sizes) - sizes
+    lat = np.empty(int(sizes.sum()))
+    lon = np.empty(len(lat))
+    at = edge_starts[new_u]
+    lat[at], lon[at] = table.node_lat[u_idx[new_u]], table.node_lon[u_idx[new_u]]
+    at = concat_ranges(edge_starts + new_u, inner_counts)
+    inner = table.coords[concat_ranges(inner_starts, inner_counts)]
+    lat[at], lon[at] = inner[:, 1], inner[:, 0]
+    at = (edge_starts + sizes - 1)[new_v]
+    lat[at], lon[at] = table.node_lat[v_idx[new_v]], table.node_lon[v_idx[new_v]]
+    return lat, lon
+
+
+def route_turns(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                turn_angle: float = TURN_ANGLE) -> List[Tuple[float, float, str]]:
+    """
+    Find the turns between consecutive edges of a route.
+
+    Headings are taken from the last piece of the arriving edge's geometry
+    and the first piece of the departing edge's, so curved streets do not
+    read as turns.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        turn_angle: Smallest change of heading (degrees) reported
+
+    Returns:
+        List of (lat, lon, instruction) at the junction nodes, e.g.
+        'Turn left onto Shattuck Avenue'
+    """
+    u_idx, v_idx, e_idx = table.route_indices(route)
+    if len(u_idx) < 2:
+        return []
+    node_lon = np.where(table.node_valid, table.node_lon, np.nan)
+    node_lat = np.where(table.node_valid, table.node_lat, np.nan)
+    start = np.column_stack([node_lon[u_idx], node_lat[u_idx]])
+    end = np.column_stack([node_lon[v_idx], node_lat[v_idx]])
+
+    # The vertex after an edge's start and the one before its end
+    after_start, before_end = end.copy(), start.copy()
+    shaped = e_idx >= 0
+    shaped[shaped] = np.diff(table.offsets)[e_idx[shaped]] >= 2
+    edges = e_idx[shaped]
+    after_start[shaped] = table.coords[table.offsets[edges] + 1]
+    before_end[shaped] = table.coords[table.offsets[edges + 1] - 2]
+
+    # Local planar headings around each junction
+    scale = np.cos(np.radians(end[:-1, 1]))
+    arriving = end[:-1] - before_end[:-1]
+    leaving = after_start[1:] - start[1:]
+    arriving[:, 0] *= scale
+    leaving[:, 0] *= scale
+    change = np.degrees(np.arctan2(leaving[:, 1], leaving[:, 0]) -
+                        np.arctan2(arriving[:, 1], arriving[:, 0]))
+    change = (change + 180.0) % 360.0 - 180.0
+
+    junction = (v_idx[:-1] == u_idx[1:]) & np.isfinite(change) & (np.abs(change) >= turn_angle)
+    turns = []
+    for i in np.flatnonzero(junction).tolist():
+        angle = float(change[i])
+        if abs(angle) >= U_TURN_ANGLE:
+            text = 'Make a U-turn'
+        else:
+            text = 'Turn left' if angle > 0 else 'Turn right'
+        street = table.edge_names[e_idx[i + 1]] if e_idx[i + 1] >= 0 else None
+        if isinstance(street, list):
+            street = '; '.join(street)
+        if street:
+            text += f' onto {street}'
+        node = v_idx[i]
+        turns.append((float(table.node_lat[node]), float(table.node_lon[node]), text))
+    return turns
+
+
+def _point_strings(lat: np.ndarray, lon: np.ndarray) -> List[str]:
+    """Format track points in one formatting call, numbers as gpxpy writes them."""
+    if not len(lat):
+        return []
+    values = np.column_stack([lat, lon]).ravel()
+    # str() of a float, as gpxpy uses, except where that is scientific notation
+    plain = np.all((np.abs(values) >= 1e-4) & (np.abs(values) < 1e16) | (values == 0))
+    numbers = values.tolist() if plain else [_number(value) for value in values.tolist()]
+    template = '|'.join([_TRACK_POINT] * len(lat))
+    return (template % tuple(numbers)).split('|')
+
+
+def _number(value: float) -> str:
+    """A coordinate as gpxpy writes it (GPX 1.1 does not allow exponents)."""
+    text = str(value)
+    if 'e' not in text:
+        return text
+    return format(value, '.10f').rstrip('0').rstrip('.')
@@ -0,0 +1,415 @@
+"""
+Columnar graph snapshots opened through memory maps.
+
+Loading a stored graph used to mean unpickling or rebuilding NetworkX
+objects in every worker process. A snapshot instead stores a preprocessed
+graph as plain NumPy arrays (.npy files in one directory): node ids and
+coordinates, CSR adjacency sorted by source node, edge attribute columns,
+one flat coordinate buffer with per-edge offsets, and a small JSON file with
+the CRS and interned name/highway tables. load_graph_arrays() opens the
+arrays with mmap_mode='r', so loading is near instant and several processes
+opening the same snapshot share the same physical pages.
+
+ArrayGraph exposes the read-only subset of the NetworkX MultiDiGraph API
+used by CPPSolver and RouteExporter (nodes[n], has_edge, graph[u][v],
+edges(...), graph.graph), building small attribute dicts only for the
+nodes and edges that are accessed.
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import networkx as nx
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from edge_attributes import edge_highway, edge_name
+from graph_simplify import edge_coordinates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bumped when the file layout changes
+SNAPSHOT_VERSION = 1
+
+# Array files of a snapshot
+NODE_ARRAYS = ('node_ids', 'node_x', 'node_y', 'node_lat', 'node_lon')
+EDGE_ARRAYS = ('indptr', 'edge_target', 'edge_key', 'edge_length', 'edge_oneway',
+               'edge_name_code', 'edge_highway_code', 'coords_offsets', 'coords')
+
+META_FILE = 'meta.json'
+
+
+def save_graph_arrays(graph: nx.MultiDiGraph, directory: str) -> str:
+    """
+    Save a preprocessed graph as a columnar snapshot.
+
+    Args:
+        graph: Preprocessed (projected, simplified) graph with integer node
+            ids and 'x'/'y'/'lat'/'lon' node attributes
+        directory: Snapshot directory; replaced if it exists
+
+    Returns:
+        The snapshot directory
+
+    Raises:
+        ValueError: If the graph has non-integer node ids
+    """
+    arrays, meta = graph_to_arrays(graph)
+
+    # Write into a temporary directory and swap it in, so readers never
+    # see a half-written snapshot
+    temp_dir = f"{directory.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_dir, f'{name}.npy'), array)
+    with open(os.path.join(temp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.replace(temp_dir, directory)
+
+    size_mb = sum(a.nbytes for a in arrays.values()) / 1e6
+    logger.info(f"Saved graph snapshot to {directory}: {len(arrays['node_ids'])} nodes, "
+                f"{len(arrays['edge_target'])} edges, {size_mb:.1f} MB")
+    return directory
+
+
+def graph_to_arrays(graph) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Convert a graph into snapshot columns.
+
+    Args:
+        graph: Preprocessed graph with integer node ids, or an ArrayGraph
+            (whose arrays are returned as they are)
+
+    Returns:
+        Tuple of (arrays named as in NODE_ARRAYS and EDGE_ARRAYS, metadata)
+
+    Raises:
+        ValueError: If the graph has non-integer node ids
+    """
+    if isinstance(graph, ArrayGraph):
+        return graph.arrays(), graph.meta()
+
+    nodes = list(graph.nodes)
+    if not all(isinstance(node, (int, np.integer)) for node in nodes):
+        raise ValueError("Graph snapshots need integer node ids")
+
+    node_ids = np.array(nodes, dtype=np.int64)
+    order = np.argsort(node_ids)
+    node_ids = node_ids[order]
+    node_data = [graph.nodes[node] for node in node_ids.tolist()]
+    arrays = {
+        'node_ids': node_ids,
+        'node_x': np.array([d.get('x', np.nan) for d in node_data], dtype=np.float64),
+        'node_y': np.array([d.get('y', np.nan) for d in node_data], dtype=np.float64),
+        'node_lat': np.array([d.get('lat', d.get('y', np.nan)) for d in node_data], dtype=np.float64),
+        'node_lon': np.array([d.get('lon', d.get('x', np.nan)) for d in node_data], dtype=np.float64),
+    }
+
+    edges = sorted(graph.edges(keys=True, data=True), key=lambda e: (e[0], e[1], e[2]))
+    source = np.searchsorted(node_ids, np.array([e[0] for e in edges], dtype=np.int64))
+    target = np.searchsorted(node_ids, np.array([e[1] for e in edges], dtype=np.int64))
+
+    tables = {'name': [], 'highway': []}
+    codes = {'name': {}, 'highway': {}}
+
+    def intern(attr, value):
+        if value is None:
+            return -1
+        key = tuple(value) if isinstance(value, list) else value
+        if key not in codes[attr]:
+            codes[attr][key] = len(tables[attr])
+            tables[attr].append(value)
+        return codes[attr][key]
+
+    name_codes, highway_codes, oneway, lengths, pieces = [], [], [], [], []
+    offsets = [0]
+    for _, _, _, data in edges:
+        name_codes.append(intern('name', edge_name(graph, data)))
+        highway_codes.append(intern('highway', edge_highway(graph, data)))
+        value = data.get('oneway')
+        oneway.append(-1 if value is None else int(any(value) if isinstance(value, list)
+                                                   else bool(value)))
+        lengths.append(data.get('length', np.nan))
+        coords = edge_coordinates(data)
+        if coords is not None:
+            coords = np.asarray(coords, dtype=np.float64)[:, :2]
+            pieces.append(coords)
+        offsets.append(offsets[-1] + (0 if coords is None else len(coords)))
+
+    arrays.update({
+        'indptr': np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(node_ids)))]),
+        'edge_target': target.astype(np.int64),
+        'edge_key': np.array([e[2] for e in edges], dtype=np.int64),
+        'edge_length': np.array(lengths, dtype=np.float64),
+        'edge_oneway': np.array(oneway, dtype=np.int8),
+        'edge_name_code': np.array(name_codes, dtype=np.int32),
+        'edge_highway_code': np.array(highway_codes, dtype=np.int32),
+        'coords_offsets': np.array(offsets, dtype=np.int64),
+        'coords': np.concatenate(pieces) if pieces else np.zeros((0, 2)),
+    })
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'crs': str(graph.graph.get('crs', 'EPSG:4326')),
+        'name_table': tables['name'],
+        'highway_table': tables['highway'],
+    }
+    return arrays, meta
+
+
+def load_graph_arrays(directory: str, mmap: bool = True) -> 'ArrayGraph':
+    """
+    Open a columnar graph snapshot.
+
+    Args:
+        directory: Snapshot directory written by save_graph_arrays()
+        mmap: If True (default), memory-map the arrays read-only instead of
+            reading them into process memory
+
+    Returns:
+        ArrayGraph backed by the snapshot files
+
+    Raises:
+        ValueError: If the snapshot version is not supported
+    """
+    with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported graph snapshot version: {meta.get('version')}")
+
+    mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode)
+              for name in NODE_ARRAYS + EDGE_ARRAYS}
+    return ArrayGraph(arrays, meta)
+
+
+class _NodeView:
+    """graph.nodes for ArrayGraph: iteration, membership and attribute dicts."""
+
+    def __init__(self, graph: 'ArrayGraph'):
+        self._graph = graph
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._graph.node_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._graph.node_ids)
+
+    def __contains__(self, node) -> bool:
+        return self._graph.node_index(node) is not None
+
+    def __getitem__(self, node) -> Dict[str, float]:
+        i = self._graph.node_index(node)
+        if i is None:
+            raise KeyError(node)
+        g = self._graph
+        return {'x': float(g.node_x[i]), 'y': float(g.node_y[i]),
+                'lat': float(g.node_lat[i]), 'lon': float(g.node_lon[i])}
+
+    def __call__(self, data: bool = False):
+        return self.data() if data else iter(self)
+
+    def data(self):
+        return ((node, self[node]) for node in self)
+
+
+class ArrayGraph:
+    """Read-only MultiDiGraph view over columnar snapshot arrays."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """
+        Wrap snapshot arrays.
+
+        Args:
+            arrays: Arrays named as in NODE_ARRAYS and EDGE_ARRAYS
+            meta: Snapshot metadata (CRS and string tables)
+        """
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        # Same keys MapLoader leaves on pruned NetworkX graphs, so
+        # edge_name/edge_highway work unchanged
+        self.graph = {'crs': meta['crs'], 'name_table': meta['name_table'],
+                      'highway_table': meta['highway_table']}
+        self._sources = None
+
+    @property
+    def nodes(self) -> _NodeView:
+        # Built per access rather than stored, so an ArrayGraph holds no
+        # reference cycle and its arrays are released as soon as it is dropped
+        return _NodeView(self)
+
+    # --- NetworkX-compatible read API ---
+
+    def is_directed(self) -> bool:
+        return True
+
+    def is_multigraph(self) -> bool:
+        return True
+
+    def copy(self) -> 'ArrayGraph':
+        """Snapshots are immutable, so a copy is the snapshot itself."""
+        return self
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.edge_target)
+
+    def __len__(self) -> int:
+        return self.number_of_nodes()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.nodes)
+
+    def __contains__(self, node) -> bool:
+        return node in self.nodes
+
+    def __getitem__(self, node) -> Dict[int, Dict[int, dict]]:
+        """Adjacency of a node: {target: {key: edge data}}."""
+        i = self.node_index(node)
+        if i is None:
+            raise KeyError(node)
+        adjacency: Dict[int, Dict[int, dict]] = {}
+        for e in range(int(self.indptr[i]), int(self.indptr[i + 1])):
+            target = int(self.node_ids[self.edge_target[e]])
+            adjacency.setdefault(target, {})[int(self.edge_key[e])] = self.edge_data(e)
+        return adjacency
+
+    def has_edge(self, u, v, key=None) -> bool:
+        return bool(len(self._edge_positions(u, v, key)))
+
+    def successors(self, node) -> Iterator[int]:
+        return iter(self[node])
+
+    def edges(self, keys: bool = False, data: Any = False, default: Any = None):
+        """
+        Iterate over edges like MultiDiGraph.edges.
+
+        Args:
+            keys: Include edge keys
+            data: True for attribute dicts, an attribute name for one value
+            default: Value for a missing attribute when data is a name
+
+        Returns:
+            Generator of edge tuples
+        """
+        sources = self.node_ids[self.sources()].tolist()
+        targets = self.node_ids[self.edge_target].tolist()
+        edge_keys = self.edge_key.tolist()
+        for e, (u, v, k) in enumerate(zip(sources, targets, edge_keys)):
+            item = (u, v, k) if keys else (u, v)
+            if data is True:
+                item += (self.edge_data(e),)
+            elif data:
+                item += (self.edge_data(e).get(data, default),)
+            yield item
+
+    # --- Array access ---
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The snapshot arrays, by file name."""
+        return {name: getattr(self, name) for name in NODE_ARRAYS + EDGE_ARRAYS}
+
+    def meta(self) -> Dict[str, Any]:
+        """Snapshot metadata (version, CRS and string tables)."""
+        return {'version': SNAPSHOT_VERSION, 'crs': self.graph['crs'],
+                'name_table': self.graph['name_table'],
+                'highway_table': self.graph['highway_table']}
+
+    def node_index(self, node) -> Optional[int]:
+        """Position of a node id in the sorted node arrays, or None."""
+        try:
+            node = int(node)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self.node_ids, node))
+        if i < len(self.node_ids) and self.node_ids[i] == node:
+            return i
+        return None
+
+    def sources(self) -> np.ndarray:
+        """Source node index of every edge (expanded from the CSR index pointer)."""
+        if self._sources is None:
+            self._sources = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        return self._sources
+
+    def edge_data(self, e: int) -> dict:
+        """Attribute dict of edge e, with coordinates as a view into the buffer."""
+        data = {'length': float(self.edge_length[e])}
+        oneway = int(self.edge_oneway[e])
+        if oneway >= 0:
+            data['oneway'] = bool(oneway)
+        if self.edge_name_code[e] >= 0:
+            data['name_code'] = int(self.edge_name_code[e])
+        if self.edge_highway_code[e] >= 0:
+            data['highway_code'] = int(self.edge_highway_code[e])
+        start, end = int(self.coords_offsets[e]), int(self.coords_offsets[e + 1])
+        if end > start:
+            data['coords'] = self.coords[start:end]
+        return data
+
+    def edge_frame(self) -> pd.DataFrame:
+        """
+        Build the solver's edge list straight from the columns.
+
+        Returns:
+            DataFrame with node_from, node_to, distance, length, name,
+            highway and oneway columns, as CPPSolver writes for postman_problems
+        """
+        def decode(codes, table):
+            lookup = np.array(table + [None], dtype=object)
+            return lookup[np.where(codes >= 0, codes, len(table))]
+
+        oneway = np.asarray(self.edge_oneway)
+        frame = pd.DataFrame({
+            'node_from': self.node_ids[self.sources()],
+            'node_to': self.node_ids[self.edge_target],
+            'distance': self.edge_length,
+            'length': self.edge_length,
+            'name': decode(np.asarray(self.edge_name_code), self.graph['name_table']),
+            'highway': decode(np.asarray(self.edge_highway_code), self.graph['highway_table']),
+            'oneway': np.where(oneway >= 0, oneway == 1, None),
+        })
+        return frame
+
+    def is_strongly_connected(self) -> bool:
+        """Check strong connectivity with forward and backward sweeps over the CSR arrays."""
+        n = len(self.node_ids)
+        if n == 0:
+            return False
+        sources = self.sources()
+        targets = np.asarray(self.edge_target)
+        for tails, heads in ((sources, targets), (targets, sources)):
+            order = np.argsort(tails, kind='stable')
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(tails, minlength=n))])
+            heads_sorted = heads[order]
+            seen = np.zeros(n, dtype=bool)
+            seen[0] = True
+            frontier = np.array([0])
+            while len(frontier):
+                counts = indptr[frontier + 1] - indptr[frontier]
+                starts = np.repeat(indptr[frontier], counts)
+                within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                reached = heads_sorted[starts + within]
+                frontier = np.unique(reached[~seen[reached]])
+                seen[frontier] = True
+            if not seen.all():
+                return False
+        return True
+
+    def _edge_positions(self, u, v, key=None) -> List[int]:
+        """Edge positions from u to v (with the given key, if any)."""
+        i, j = self.node_index(u), self.node_index(v)
+        if i is None or j is None:
+            return []
+        start, end = int(self.indptr[i]), int(self.indptr[i + 1])
+        positions = [start + p for p in np.flatnonzero(self.edge_target[start:end] == j).tolist()]
+        if key is not None:
+            positions = [p for p in positions if self.edge_key[p] == key]
+        return positions
@@ -0,0 +1,177 @@
+"""
+In-process pool of loaded region graphs.
+
+Web users tend to redraw rectangles inside the same neighborhood, and each
+request used to load and preprocess a new graph. The pool keeps recently
+loaded, preprocessed graphs together with the lat/lon extent they were
+loaded for, indexed by an R-tree (shapely STRtree). A bounding box that lies
+entirely inside a pooled extent is cut out of that graph by node position
+instead of being loaded again. Pooled graphs are evicted least recently used
+first once their estimated memory exceeds a budget.
+"""
+
+import threading
+import time
+import networkx as nx
+import numpy as np
+import shapely
+from shapely.geometry import box
+from shapely.strtree import STRtree
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import logging
+
+from edge_attributes import graph_memory_bytes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PooledGraph:
+    """A preprocessed graph and the lat/lon extent it was loaded for."""
+
+    def __init__(self, key: Hashable, extent, graph: nx.MultiDiGraph,
+                 memory_report: Optional[Dict[str, Any]] = None):
+        """
+        Index a graph's node positions for cutting.
+
+        Args:
+            key: Load settings the graph was built with
+            extent: Shapely geometry in lat/lon the graph was loaded for
+            graph: Preprocessed graph with 'lat'/'lon' node attributes
+            memory_report: Attribute pruning report of the graph's load
+                (see edge_attributes.memory_report), if it was pruned
+        """
+        self.key = key
+        self.extent = extent
+        self.graph = graph
+        self.memory_report = memory_report
+        self.memory_bytes = graph_memory_bytes(graph)
+        nodes = graph.nodes
+        self.node_ids = np.array(list(nodes), dtype=object)
+        count = len(self.node_ids)
+        self.lat = np.fromiter((nodes[n]['lat'] for n in self.node_ids), dtype=np.float64, count=count)
+        self.lon = np.fromiter((nodes[n]['lon'] for n in self.node_ids), dtype=np.float64, count=count)
+        self.last_used = time.monotonic()
+
+
+class RegionGraphPool:
+    """LRU pool of region graphs with an R-tree over their extents."""
+
+    def __init__(self, memory_budget_mb: float = 512):
+        """
+        Initialize the pool.
+
+        Args:
+            memory_budget_mb: Estimated graph memory (see
+                edge_attributes.graph_memory_bytes) above which the least
+                recently used graphs are evicted
+        """
+        self.memory_budget_bytes = int(memory_budget_mb * 1e6)
+        self.entries: List[PooledGraph] = []
+        self._tree: Optional[STRtree] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, key: Hashable, extent, graph: nx.MultiDiGraph,
+            memory_report: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Add a preprocessed graph to the pool.
+
+        Args:
+            key: Load settings the graph was built with (e.g. network type);
+                only requests with an equal key are served from it
+            extent: Shapely geometry in lat/lon the graph was loaded for
+            graph: Preprocessed graph with 'lat'/'lon' node attributes
+            memory_report: Attribute pruning report of the graph's load,
+                returned with graphs cut out of it
+        """
+        entry = PooledGraph(key, extent, graph, memory_report)
+
+        if entry.memory_bytes > self.memory_budget_bytes:
+            logger.info(f"Graph of {entry.memory_bytes / 1e6:.1f} MB exceeds the pool budget, "
+                        "not pooled")
+            return
+
+        with self._lock:
+            self.entries.append(entry)
+            self._evict()
+            self._tree = STRtree([e.extent for e in self.entries])
+        logger.info(f"Pooled graph for {key!r}: {graph.number_of_nodes()} nodes, "
+                    f"{entry.memory_bytes / 1e6:.1f} MB ({len(self.entries)} pooled)")
+
+    def get_bbox(self, key: Hashable, north: float, south: float, east: float,
+                 west: float) -> Optional[Tuple[nx.MultiDiGraph, Optional[Dict[str, Any]]]]:
+        """
+        Cut a bounding box out of a pooled graph containing it.
+
+        Args:
+            key: Load settings the graph must have been built with
+            north: Northern latitude boundary
+            south: Southern latitude boundary
+            east: Eastern longitude boundary
+            west: Western longitude boundary
+
+        Returns:
+            Largest weakly connected component of the pooled graph's nodes
+            inside the box (an independent copy) and the pooled graph's
+            memory report, or None if no pooled extent contains the box
+        """
+        query = box(west, south, east, north)
+        with self._lock:
+            entry = self._containing_entry(key, query)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.last_used = time.monotonic()
+
+        start = time.time()
+        inside = ((entry.lat >= south) & (entry.lat <= north) &
+                  (entry.lon >= west) & (entry.lon <= east))
+        graph = entry.graph.subgraph(entry.node_ids[inside].tolist()).copy()
+        if graph.number_of_nodes():
+            largest = max(nx.weakly_connected_components(graph), key=len)
+            graph.remove_nodes_from([n for n in list(graph.nodes) if n not in largest])
+
+        logger.info(f"Cut bbox out of pooled graph in {(time.time() - start) * 1000:.1f} ms: "
+                    f"{graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        return graph, entry.memory_report
+
+    def clear(self) -> None:
+        """Drop all pooled graphs."""
+        with self._lock:
+            self.entries = []
+            self._tree = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool size, memory use and hit counts."""
+        with self._lock:
+            return {
+                'graphs': len(self.entries),
+                'memory_mb': round(sum(e.memory_bytes for e in self.entries) / 1e6, 2),
+                'memory_budget_mb': round(self.memory_budget_bytes / 1e6, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _containing_entry(self, key: Hashable, query) -> Optional[PooledGraph]:
+        """Find the smallest pooled extent with a matching key that contains the query."""
+        if self._tree is None:
+            return None
+        # predicate='within' returns tree geometries the query lies within
+        candidates = [self.entries[i] for i in self._tree.query(query, predicate='within')]
+        candidates = [e for e in candidates if e.key == key]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: shapely.area(e.extent))
+
+    def _evict(self) -> None:
+        """Drop least recently used graphs until the pool fits its budget."""
+        self.entries.sort(key=lambda e: e.last_used)
+        total = sum(e.memory_bytes for e in self.entries)
+        while total > self.memory_budget_bytes and self.entries:
+            evicted = self.entries.pop(0)
+            total -= evicted.memory_bytes
+            logger.info(f"Evicted pooled graph for {evicted.key!r} "
+                        f"({evicted.memory_bytes / 1e6:.1f} MB)")
@@ -0,0 +1,207 @@
+"""
+Validation and repair pass run on simplified graphs before solving.
+
+Downloaded and clipped street graphs carry artifacts that make the Chinese
+Postman solve larger without adding streets worth covering: short
+self-loops, zero-length edges between coincident nodes, duplicate parallel
+edges with identical geometry, one-way stubs left dangling where the area
+boundary clipped a one-way street, and tiny fragments disconnected from the
+main network. repair_graph removes (or, for zero-length edges, contracts)
+them using degree and attribute arrays and reports what it changed.
+
+Only the lossless repairs run by default: duplicate edges and zero-length
+edges carry no street the route would miss. Short self-loops, one-way stubs
+and fragments are usually real streets (cul-de-sac loops, one-way streets
+cut by the area boundary, disconnected lanes), so dropping them loses
+coverage; those repairs are opt-in, and the report gives the street length
+they removed.
+"""
+
+import networkx as nx
+import numpy as np
+from typing import Any, Dict, List, Tuple
+import logging
+
+from graph_simplify import edge_coordinates
+from graph_stats import record_edge_added, record_edge_removed, record_node_removed
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default repair settings; any of them can be overridden per call
+DEFAULT_REPAIR_OPTIONS = {
+    # Edges shorter than this (m) between two distinct nodes are contracted
+    'min_edge_length': 0.1,
+    # Drop parallel edges with the same endpoints, length and geometry
+    'drop_duplicate_edges': True,
+    # Lossy: drop self-loops up to max_self_loop_length (m; None for all)
+    'drop_self_loops': False,
+    'max_self_loop_length': 100.0,
+    # Lossy: iteratively drop one-way edges into dead ends and out of dead starts
+    'drop_oneway_stubs': False,
+    # Lossy: drop components (other than the largest) shorter than
+    # min_fragment_length (m)
+    'drop_fragments': False,
+    'min_fragment_length': 200.0,
+}
+
+
+def repair_graph(graph: nx.MultiDiGraph, **options) -> Dict[str, Any]:
+    """
+    Remove solver-inflating artifacts from a simplified graph, in place.
+
+    Args:
+        graph: Simplified, projected graph with edge 'length' attributes
+        **options: Overrides for DEFAULT_REPAIR_OPTIONS
+
+    Returns:
+        Report with the number of self-loops, zero-length edges, duplicate
+        edges, one-way stub edges and fragment nodes removed, the street
+        length (m) removed with them (dropped_length; duplicates are not
+        counted, their street is still in the graph), and the edge and
+        odd-degree node counts before and after
+
+    Raises:
+        ValueError: If an unknown option is given
+    """
+    unknown = set(options) - set(DEFAULT_REPAIR_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown repair options: {', '.join(sorted(unknown))}")
+    settings = {**DEFAULT_REPAIR_OPTIONS, **options}
+
+    report = {'edges_before': graph.number_of_edges(),
+              'odd_nodes_before': _count_odd_nodes(graph)}
+
+    edges = list(graph.edges(keys=True, data=True))
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    u = np.fromiter((index[e[0]] for e in edges), dtype=np.int64, count=len(edges))
+    v = np.fromiter((index[e[1]] for e in edges), dtype=np.int64, count=len(edges))
+    length = np.fromiter((e[3].get('length', 0.0) for e in edges), dtype=np.float64,
+                         count=len(edges))
+
+    # Self-loops
+    loops = (u == v) & settings['drop_self_loops']
+    if settings['max_self_loop_length'] is not None:
+        loops &= length <= settings['max_self_loop_length']
+    drop = loops.copy()
+    report['self_loops'] = int(loops.sum())
+
+    # Duplicate parallel edges: same endpoints and length, then same geometry
+    duplicates = np.zeros(len(edges), dtype=bool)
+    if settings['drop_duplicate_edges'] and len(edges):
+        rounded = np.round(length, 3)
+        order = np.lexsort((rounded, v, u))
+        same = ((u[order][1:] == u[order][:-1]) & (v[order][1:] == v[order][:-1]) &
+                (rounded[order][1:] == rounded[order][:-1]))
+        for first, second in zip(order[:-1][same].tolist(), order[1:][same].tolist()):
+            if drop[first] or drop[second]:
+                continue
+            if _same_geometry(edges[first][3], edges[second][3]):
+                duplicates[second] = True
+    drop |= duplicates
+    report['duplicate_edges'] = int(duplicates.sum())
+
+    # One-way stubs: edges into nodes with no way out, or out of nodes with
+    # no way in, peeled until none are left
+    stubs = np.zeros(len(edges), dtype=bool)
+    if settings['drop_oneway_stubs'] and len(edges):
+        while True:
+            alive = ~(drop | stubs)
+            out_degree = np.bincount(u[alive], minlength=len(nodes))
+            in_degree = np.bincount(v[alive], minlength=len(nodes))
+            sink = (out_degree == 0) & (in_degree > 0)
+            source = (in_degree == 0) & (out_degree > 0)
+            peel = alive & (sink[v] | source[u])
+            if not peel.any():
+                break
+            stubs |= peel
+    drop |= stubs
+    report['oneway_stub_edges'] = int(stubs.sum())
+    dropped_length = float(length[loops | stubs].sum())
+
+    for i in np.flatnonzero(drop).tolist():
+        _remove_edge(graph, edges[i])
+
+    # Zero-length edges between distinct nodes: merge the nodes
+    short = ~drop & (u != v) & (length < settings['min_edge_length'])
+    report['zero_length_edges'] = int(short.sum())
+    for i in np.flatnonzero(short).tolist():
+        a, b = edges[i][0], edges[i][1]
+        if a in graph and b in graph and graph.has_edge(a, b, edges[i][2]):
+            _remove_edge(graph, edges[i])
+            dropped_length += length[i]
+            _contract(graph, a, b, settings['min_edge_length'])
+
+    # Isolated nodes and small fragments
+    removed_nodes = 0
+    if settings['drop_fragments']:
+        components = sorted(nx.weakly_connected_components(graph), key=len, reverse=True)
+        for component in components[1:]:
+            total = sum(d.get('length', 0.0)
+                        for _, _, d in graph.subgraph(component).edges(data=True))
+            if total < settings['min_fragment_length']:
+                for node in component:
+                    _remove_node(graph, node)
+                removed_nodes += len(component)
+                dropped_length += total
+    report['fragment_nodes'] = removed_nodes
+    report['dropped_length'] = round(float(dropped_length), 1)
+
+    report['edges_after'] = graph.number_of_edges()
+    report['odd_nodes_after'] = _count_odd_nodes(graph)
+    logger.info(f"Graph repair: {report['edges_before']} -> {report['edges_after']} edges, "
+                f"{report['odd_nodes_before']} -> {report['odd_nodes_after']} odd-degree nodes "
+                f"({report['self_loops']} self-loops, {report['duplicate_edges']} duplicates, "
+                f"{report['oneway_stub_edges']} one-way stub edges, "
+                f"{report['zero_length_edges']} zero-length edges, "
+                f"{removed_nodes} fragment nodes; "
+                f"{report['dropped_length']} m of street dropped)")
+    return report
+
+
+def _same_geometry(a: dict, b: dict) -> bool:
+    """Check whether two edges have identical geometry (or both have none)."""
+    coords_a, coords_b = edge_coordinates(a), edge_coordinates(b)
+    if coords_a is None or coords_b is None:
+        return coords_a is None and coords_b is None
+    return np.array_equal(np.asarray(coords_a), np.asarray(coords_b))
+
+
+def _remove_edge(graph: nx.MultiDiGraph, edge: Tuple) -> None:
+    """Remove one (u, v, key, data) edge and update memoized statistics."""
+    a, b, key, data = edge
+    graph.remove_edge(a, b, key)
+    record_edge_removed(graph, a, b, data.get('length', 0.0))
+
+
+def _remove_node(graph: nx.MultiDiGraph, node) -> None:
+    """Remove a node and its edges, updating memoized statistics."""
+    for edge in list(graph.in_edges(node, keys=True, data=True)) + \
+            list(graph.out_edges(node, keys=True, data=True)):
+        if graph.has_edge(edge[0], edge[1], edge[2]):
+            _remove_edge(graph, edge)
+    graph.remove_node(node)
+    record_node_removed(graph, node)
+
+
+def _contract(graph: nx.MultiDiGraph, keep, merge, min_edge_length: float) -> None:
+    """Move all edges of node merge onto node keep and remove merge."""
+    moved: List[Tuple] = []
+    for a, b, key, data in list(graph.in_edges(merge, keys=True, data=True)) + \
+            list(graph.out_edges(merge, keys=True, data=True)):
+        if graph.has_edge(a, b, key):
+            _remove_edge(graph, (a, b, key, data))
+            # Other short edges between the pair would become zero-length loops
+            if {a, b} == {keep, merge} and data.get('length', 0.0) < min_edge_length:
+                continue
+            moved.append((keep if a == merge else a, keep if b == merge else b, data))
+    _remove_node(graph, merge)
+    for a, b, data in moved:
+        graph.add_edge(a, b, **data)
+        record_edge_added(graph, a, b, data.get('length', 0.0))
+
+
+def _count_odd_nodes(graph: nx.MultiDiGraph) -> int:
+    """Count nodes with an odd total (in + out) degree."""
+    return sum(1 for _, degree in graph.degree() if degree % 2 == 1)
@@ -0,0 +1,290 @@
+"""
+Fast topological simplification of street network graphs.
+
+Replacement for ``ox.simplify_graph`` that identifies interstitial nodes from
+array degree counts and merges each chain of them into a single edge whose
+geometry is a slice of one flat coordinate buffer instead of a shapely
+LineString.
+"""
+
+import networkx as nx
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Edge attributes that are summed (rather than collected) when a chain of
+# edges is merged into a single edge
+SUMMED_ATTRIBUTES = ('length', 'travel_time')
+
+
+def simplify_graph(graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+    """
+    Simplify graph topology by merging chains of degree-2 nodes.
+
+    Uses the same endpoint rules as OSMnx, so the resulting nodes and edges
+    match ``ox.simplify_graph``. Each merged edge gets a ``coords`` attribute,
+    an (n, 2) array view of x/y points in the graph's CRS, and keeps the OSM
+    way IDs of the merged segments in ``osmid``.
+
+    The graph is modified in place and returned.
+
+    Args:
+        graph: Unsimplified graph with 'x'/'y' node attributes
+
+    Returns:
+        Simplified graph
+    """
+    nodes = list(graph.nodes())
+    n_nodes = len(nodes)
+    if n_nodes == 0:
+        graph.graph['simplified'] = True
+        return graph
+
+    index = {node: i for i, node in enumerate(nodes)}
+    edge_list = list(graph.edges(data=True))
+    initial_edges = len(edge_list)
+    u = np.fromiter((index[a] for a, _, _ in edge_list), dtype=np.int64, count=initial_edges)
+    v = np.fromiter((index[b] for _, b, _ in edge_list), dtype=np.int64, count=initial_edges)
+
+    endpoints = _find_endpoints(u, v, n_nodes)
+    successors, first_edge = _unique_successors(u, v, n_nodes)
+
+    # Walk every chain that starts at an endpoint and passes through an
+    # interstitial node, collecting node indices into one flat buffer
+    paths = []
+    for start in np.flatnonzero(endpoints).tolist():
+        for succ in successors[start]:
+            if not endpoints[succ]:
+                paths.append(_build_path(start, succ, successors, endpoints, nodes))
+
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(path) for path in paths])
+    flat_nodes = np.fromiter((i for path in paths for i in path), dtype=np.int64,
+                             count=int(offsets[-1]))
+    xy = np.column_stack([
+        np.fromiter((x for _, x in graph.nodes(data='x')), dtype=np.float64, count=n_nodes),
+        np.fromiter((y for _, y in graph.nodes(data='y')), dtype=np.float64, count=n_nodes),
+    ])
+    coords = xy[flat_nodes]
+
+    # Edge traversed by each hop of each chain; a chain of k nodes has k - 1
+    # hops, so the hop offsets are the node offsets shifted by chain number
+    hop_mask = np.ones(len(flat_nodes), dtype=bool)
+    hop_mask[offsets[1:] - 1] = False
+    hops = np.array([first_edge[(a, b)] for a, b in
+                     zip(flat_nodes[hop_mask].tolist(), flat_nodes[1:][hop_mask[:-1]].tolist())],
+                    dtype=np.int64)
+    hop_offsets = offsets - np.arange(len(offsets))
+    summed = {}
+    for attr in SUMMED_ATTRIBUTES:
+        values = np.array([data.get(attr, 0.0) for _, _, data in edge_list], dtype=np.float64)
+        if paths:
+            summed[attr] = np.add.reduceat(values[hops], hop_offsets[:-1]).tolist()
+
+    nodes_to_remove = set()
+    edges_to_add = []
+    hop_list = hops.tolist()
+    for i, path in enumerate(paths):
+        chain = [edge_list[e][2] for e in hop_list[hop_offsets[i]:hop_offsets[i + 1]]]
+        attributes = _merge_path_attributes(chain)
+        for attr, totals in summed.items():
+            if attr in attributes:
+                attributes[attr] = totals[i]
+        attributes['coords'] = coords[offsets[i]:offsets[i + 1]]
+        nodes_to_remove.update(nodes[j] for j in path[1:-1])
+        edges_to_add.append((nodes[path[0]], nodes[path[-1]], attributes))
+
+    graph.add_edges_from(edges_to_add)
+    graph.remove_nodes_from(nodes_to_remove)
+    _remove_rings(graph, nodes, endpoints, nodes_to_remove)
+
+    graph.graph['simplified'] = True
+    logger.info(f"Simplified graph: {n_nodes} to {graph.number_of_nodes()} nodes, "
+                f"{initial_edges} to {graph.number_of_edges()} edges")
+
+    return graph
+
+
+def edge_coordinates(edge_data: dict) -> Optional[Sequence]:
+    """
+    Get the x/y point sequence of an edge, if it has one.
+
+    Args:
+        edge_data: Attribute dict of a single edge
+
+    Returns:
+        Sequence of (x, y) points, or None for straight node-to-node edges
+    """
+    if 'coords' in edge_data:
+        return edge_data['coords']
+    if 'geometry' in edge_data:
+        return list(edge_data['geometry'].coords)
+    return None
+
+
+def _find_endpoints(u: np.ndarray, v: np.ndarray, n_nodes: int) -> np.ndarray:
+    """
+    Flag the nodes that must survive simplification.
+
+    A node is an endpoint if it self-loops, has no incoming or no outgoing
+    edges, or does not have exactly two neighbors with a degree of 2 or 4.
+
+    Args:
+        u: Source node index of each edge
+        v: Target node index of each edge
+        n_nodes: Number of nodes
+
+    Returns:
+        Boolean array indexed by node index
+    """
+    out_degree = np.bincount(u, minlength=n_nodes)
+    in_degree = np.bincount(v, minlength=n_nodes)
+    degree = in_degree + out_degree
+    self_loops = np.bincount(u[u == v], minlength=n_nodes) > 0
+
+    # Unique neighbors regardless of direction
+    pairs = np.unique(np.concatenate([u * n_nodes + v, v * n_nodes + u]))
+    n_neighbors = np.bincount(pairs // n_nodes, minlength=n_nodes)
+
+    interstitial = (n_neighbors == 2) & ((degree == 2) | (degree == 4))
+    return self_loops | (out_degree == 0) | (in_degree == 0) | ~interstitial
+
+
+def _unique_successors(u: np.ndarray, v: np.ndarray,
+                       n_nodes: int) -> Tuple[List[List[int]], Dict[Tuple[int, int], int]]:
+    """
+    Build unique successor lists from edge index arrays.
+
+    Args:
+        u: Source node index of each edge
+        v: Target node index of each edge
+        n_nodes: Number of nodes
+
+    Returns:
+        Tuple of successor node indices by node index, and the position of
+        the first edge for each (source, target) pair
+    """
+    pairs, first = np.unique(u * n_nodes + v, return_index=True)
+    sources = (pairs // n_nodes).tolist()
+    targets = (pairs % n_nodes).tolist()
+    successors = [[] for _ in range(n_nodes)]
+    for source, target in zip(sources, targets):
+        successors[source].append(target)
+    first_edge = dict(zip(zip(sources, targets), first.tolist()))
+    return successors, first_edge
+
+
+def _build_path(start: int, succ: int, successors: List[List[int]],
+                endpoints: np.ndarray, nodes: list) -> List[int]:
+    """
+    Follow a chain of interstitial nodes from one endpoint to the next.
+
+    Args:
+        start: Endpoint node index the chain starts from
+        succ: First (interstitial) node index of the chain
+        successors: Unique successor lists by node index
+        endpoints: Endpoint flags by node index
+        nodes: Node IDs by node index, for log messages
+
+    Returns:
+        Node indices of the chain, first and last being endpoints
+    """
+    path = [start, succ]
+    seen = {start, succ}
+
+    for current in successors[succ]:
+        if current in seen:
+            continue
+        path.append(current)
+        seen.add(current)
+        while not endpoints[current]:
+            candidates = [n for n in successors[current] if n not in seen]
+            if len(candidates) == 1:
+                current = candidates[0]
+                path.append(current)
+                seen.add(current)
+            elif not candidates:
+                if start in successors[current]:
+                    # End of a self-looping chain, close it on the start node
+                    path.append(start)
+                    return path
+                # A oneway turning into a two-way street with duplicated
+                # incoming edges, keep what we have
+                logger.warning(f"Unexpected simplify pattern near node {nodes[current]}")
+                return path
+            else:
+                raise ValueError(f"Interstitial node {nodes[current]} has "
+                                 f"{len(candidates)} onward neighbors")
+        return path
+
+    return path
+
+
+def _merge_path_attributes(chain: List[dict]) -> Dict:
+    """
+    Combine the attributes of the edges along a chain.
+
+    Attributes with a single distinct value keep it, anything else (including
+    OSM way IDs) becomes a list of the distinct values in path order. Summed
+    attributes are filled in by the caller.
+
+    Args:
+        chain: Attribute dicts of the edges along the chain, in order
+
+    Returns:
+        Attribute dict for the merged edge
+    """
+    collected = {}
+    for edge_data in chain:
+        for attr, value in edge_data.items():
+            if attr in collected:
+                collected[attr].append(value)
+            else:
+                collected[attr] = [value]
+
+    merged = {}
+    for attr, values in collected.items():
+        if values.count(values[0]) == len(values):
+            merged[attr] = values[0]
+            continue
+        try:
+            distinct = list(dict.fromkeys(values))
+        except TypeError:
+            # Unhashable values (already merged lists), keep them all
+            distinct = values
+        merged[attr] = distinct[0] if len(distinct) == 1 else distinct
+    return merged
+
+
+def _remove_rings(graph: nx.MultiDiGraph, nodes: list, endpoints: np.ndarray,
+                  removed: set) -> None:
+    """
+    Remove isolated rings made up entirely of interstitial nodes.
+
+    Such rings are never reached from an endpoint, so they are the only
+    interstitial nodes still left in the graph.
+
+    Args:
+        graph: Graph being simplified
+        nodes: Node IDs by node index
+        endpoints: Endpoint flags by node index
+        removed: Node IDs already removed from the graph
+    """
+    leftover = [nodes[i] for i in np.flatnonzero(~endpoints).tolist()
+                if nodes[i] not in removed]
+    if not leftover:
+        return
+
+    ring_nodes = []
+    for component in nx.weakly_connected_components(graph.subgraph(leftover)):
+        touches_rest = any(
+            neighbor not in component
+            for node in component
+            for neighbor in list(graph.successors(node)) + list(graph.predecessors(node))
+        )
+        if not touches_rest:
+            ring_nodes.extend(component)
+    graph.remove_nodes_from(ring_nodes)
@@ -0,0 +1,231 @@
+"""
+Memoized graph statistics with incremental updates.
+
+Area statistics are requested several times per route (RoutePlanner's
+full_pipeline, once per web request), and each call used to rescan the
+graph, build degree dicts and run the connectivity and Eulerian checks.
+Here the statistics are computed once from degree and length arrays and
+memoized per graph object; code that adds or removes edges or nodes reports
+the change through the record_* functions so the counters are updated in
+place instead of recomputed. Strong connectivity is only recomputed, lazily,
+when a change may have affected it. MapLoader starts tracking before
+graph_repair runs, so the repair's removals take the incremental path.
+"""
+
+import networkx as nx
+import numpy as np
+import weakref
+from typing import Any, Dict, Hashable, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Memoized statistics by graph object. Entries go away with their graph, so
+# a new graph can never pick up statistics left behind at a reused id(), and
+# copies (which share graph.graph with the original) start without any.
+_STATS: 'weakref.WeakKeyDictionary[nx.MultiDiGraph, Dict[str, Any]]' = \
+    weakref.WeakKeyDictionary()
+
+# Number of odd-degree nodes listed in the public statistics
+ODD_NODES_SHOWN = 10
+
+
+def graph_stats(graph: nx.MultiDiGraph) -> Dict[str, Any]:
+    """
+    Get basic statistics about the graph, computing them on first use.
+
+    Args:
+        graph: NetworkX graph
+
+    Returns:
+        Dictionary with node and edge counts, total edge length, strong
+        connectivity, Eulerian flag and odd-degree node count (with the
+        first few odd-degree nodes)
+    """
+    state = _state(graph)
+    if state['is_strongly_connected'] is None:
+        if hasattr(graph, 'is_strongly_connected'):
+            # Snapshot graphs (graph_arrays.ArrayGraph) check it on their arrays
+            state['is_strongly_connected'] = graph.is_strongly_connected()
+        else:
+            state['is_strongly_connected'] = (graph.number_of_nodes() > 0 and
+                                              nx.is_strongly_connected(graph))
+
+    odd_nodes = state['odd_nodes']
+    return {
+        'n_nodes': state['n_nodes'],
+        'n_edges': state['n_edges'],
+        'total_edge_length': state['total_edge_length'],
+        'is_strongly_connected': state['is_strongly_connected'],
+        'is_eulerian': state['is_strongly_connected'] and state['n_unbalanced'] == 0,
+        'n_odd_degree_nodes': len(odd_nodes),
+        'odd_degree_nodes': [node for node, _ in zip(odd_nodes, range(ODD_NODES_SHOWN))],
+    }
+
+
+def track_stats(graph: nx.MultiDiGraph) -> None:
+    """
+    Compute the statistics counters now so later record_* calls update them.
+
+    The record_* functions are no-ops for a graph without memoized
+    statistics; call this before a batch of recorded changes (as MapLoader
+    does before repair) to keep the statistics current through them.
+    Strong connectivity is left to be computed on first use.
+
+    Args:
+        graph: NetworkX graph
+    """
+    _state(graph)
+
+
+def invalidate_stats(graph: nx.MultiDiGraph) -> None:
+    """Drop the memoized statistics, e.g. after an unrecorded bulk change."""
+    _STATS.pop(graph, None)
+
+
+def record_edge_added(graph: nx.MultiDiGraph, u: Hashable, v: Hashable,
+                      length: float = 0.0) -> None:
+    """
+    Update memoized statistics after an edge u->v was added to the graph.
+
+    Args:
+        graph: Graph the edge was added to
+        u: Source node
+        v: Target node
+        length: Length of the new edge
+    """
+    state = _recorded_state(graph)
+    if state is None:
+        return
+    state['n_edges'] += 1
+    state['total_edge_length'] += length
+    # add_edge creates missing endpoints
+    state['n_nodes'] = graph.number_of_nodes()
+    _update_degrees(graph, state, u, v, added=True)
+    # Adding an edge cannot disconnect a strongly connected graph
+    if not state['is_strongly_connected']:
+        state['is_strongly_connected'] = None
+    _stamp(graph, state)
+
+
+def record_edge_removed(graph: nx.MultiDiGraph, u: Hashable, v: Hashable,
+                        length: float = 0.0) -> None:
+    """
+    Update memoized statistics after an edge u->v was removed from the graph.
+
+    Args:
+        graph: Graph the edge was removed from
+        u: Source node
+        v: Target node
+        length: Length of the removed edge
+    """
+    state = _recorded_state(graph)
+    if state is None:
+        return
+    state['n_edges'] -= 1
+    state['total_edge_length'] -= length
+    _update_degrees(graph, state, u, v, added=False)
+    # Removing an edge cannot connect a graph that was not strongly connected
+    if state['is_strongly_connected']:
+        state['is_strongly_connected'] = None
+    _stamp(graph, state)
+
+
+def record_node_removed(graph: nx.MultiDiGraph, node: Hashable) -> None:
+    """
+    Update memoized statistics after a node was removed from the graph.
+
+    Its edges must have been reported with record_edge_removed() first
+    (remove them before the node), so the node had degree zero.
+
+    Args:
+        graph: Graph the node was removed from
+        node: Removed node
+    """
+    state = _recorded_state(graph)
+    if state is None:
+        return
+    state['n_nodes'] = graph.number_of_nodes()
+    state['odd_nodes'].pop(node, None)
+    state['is_strongly_connected'] = None
+    _stamp(graph, state)
+
+
+def _state(graph: nx.MultiDiGraph) -> Dict[str, Any]:
+    """Get the memoized statistics, recomputing them if the graph changed unrecorded."""
+    state = _recorded_state(graph)
+    if state is not None and state['signature'] == _signature(graph):
+        return state
+    if state is not None:
+        logger.info("Graph changed since statistics were computed, recomputing")
+    state = _compute_state(graph)
+    _STATS[graph] = state
+    return state
+
+
+def _recorded_state(graph: nx.MultiDiGraph) -> Optional[Dict[str, Any]]:
+    """Get the memoized statistics of this graph object, if any."""
+    return _STATS.get(graph)
+
+
+def _compute_state(graph: nx.MultiDiGraph) -> Dict[str, Any]:
+    """Compute all statistics from degree and length arrays."""
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = [(index[u], index[v], length)
+             for u, v, length in graph.edges(data='length', default=0.0)]
+
+    if edges:
+        u, v, lengths = (np.array(column) for column in zip(*edges))
+    else:
+        u = v = np.zeros(0, dtype=np.int64)
+        lengths = np.zeros(0)
+    out_degree = np.bincount(u.astype(np.int64), minlength=len(nodes))
+    in_degree = np.bincount(v.astype(np.int64), minlength=len(nodes))
+    odd = np.flatnonzero((in_degree + out_degree) % 2 == 1)
+
+    state = {
+        'n_nodes': len(nodes),
+        'n_edges': len(edges),
+        'total_edge_length': float(lengths.sum()),
+        'is_strongly_connected': None,
+        'n_unbalanced': int(np.count_nonzero(in_degree != out_degree)),
+        # Insertion-ordered dict used as an ordered set
+        'odd_nodes': dict.fromkeys(nodes[i] for i in odd.tolist()),
+    }
+    _stamp(graph, state)
+    return state
+
+
+def _update_degrees(graph: nx.MultiDiGraph, state: Dict[str, Any],
+                    u: Hashable, v: Hashable, added: bool) -> None:
+    """Update odd-degree and in/out imbalance counters for one edge change."""
+    if u == v:
+        # A self-loop adds 1 to both in- and out-degree of the same node
+        return
+    step = 1 if added else -1
+    for node, out_change in ((u, step), (v, -step)):
+        balance = (graph.out_degree(node) - graph.in_degree(node)) if node in graph else 0
+        before = balance - out_change
+        state['n_unbalanced'] += (balance != 0) - (before != 0)
+        if node in state['odd_nodes']:
+            del state['odd_nodes'][node]
+        else:
+            state['odd_nodes'][node] = None
+
+
+def _signature(graph: nx.MultiDiGraph) -> tuple:
+    """
+    Cheap fingerprint used to detect changes that were not recorded.
+
+    Node and edge counts catch any unrecorded change that adds or removes
+    nodes or edges; one that keeps both counts (e.g. replacing an edge)
+    must be recorded or followed by invalidate_stats().
+    """
+    return graph.number_of_nodes(), graph.number_of_edges()
+
+
+def _stamp(graph: nx.MultiDiGraph, state: Dict[str, Any]) -> None:
+    """Store the fingerprint of the graph the statistics describe."""
+    state['signature'] = _signature(graph)
@@ -0,0 +1,124 @@
+"""
+Lean HTML map export of planned routes.
+
+RouteExporter.visualize_route_folium renders a Folium map whose polyline
+lists both end nodes of every traversed edge as JSON arrays, so the HTML
+of a city-scale route runs to tens of megabytes and draws straight lines
+between nodes. render_route_html() instead fills a small static page with
+the route's street geometry (the line of the GeoJSON export), simplified
+with polyline_simplify and packed as a Google encoded polyline. The page
+decodes it in the browser and draws it with Leaflet on a canvas.
+"""
+
+import json
+import numpy as np
+from html import escape
+from string import Template
+from typing import Optional
+import logging
+
+from polyline_simplify import simplify_lines
+from route_encoding import POLYLINE_PRECISION, encode_polyline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Largest distance (m) a dropped vertex may be from the drawn line
+HTML_TOLERANCE = 2.0
+
+# Leaflet release loaded by the page (the one Folium uses)
+LEAFLET_URL = 'https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist'
+
+_PAGE = Template('''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>$title</title>
+<link rel="stylesheet" href="$leaflet/leaflet.css">
+<script src="$leaflet/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script type="application/json" id="route">$payload</script>
+<script>
+function decode(encoded, precision) {
+  var points = [], index = 0, lat = 0, lon = 0, factor = Math.pow(10, precision);
+  while (index < encoded.length) {
+    for (var k = 0; k < 2; k++) {
+      var result = 0, shift = 0, byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      var delta = (result & 1) ? ~(result >> 1) : (result >> 1);
+      if (k === 0) { lat += delta; } else { lon += delta; }
+    }
+    points.push([lat / factor, lon / factor]);
+  }
+  return points;
+}
+var route = JSON.parse(document.getElementById('route').textContent);
+var map = L.map('map', {preferCanvas: true});
+L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+  maxZoom: 19,
+  attribution: '&copy; OpenStreetMap contributors'
+}).addTo(map);
+var points = decode(route.polyline, route.precision);
+if (points.length) {
+  var line = L.polyline(points, {color: 'blue', weight: 3, opacity: 0.8})
+    .bindPopup(route.name).addTo(map);
+  L.circleMarker(points[0], {color: 'green', radius: 7}).bindPopup('Start').addTo(map);
+  L.circleMarker(points[points.length - 1], {color: 'red', radius: 7})
+    .bindPopup('End').addTo(map);
+  map.fitBounds(line.getBounds());
+} else {
+  map.setView([0, 0], 2);
+}
+</script>
+</body>
+</html>
+''')
+
+
+def render_route_html(points: np.ndarray, route_name: str = "StreetView Route",
+                      tolerance: Optional[float] = HTML_TOLERANCE,
+                      precision: int = POLYLINE_PRECISION,
+                      point_edges: Optional[np.ndarray] = None) -> str:
+    """
+    Render the HTML map page of a route line.
+
+    Args:
+        points: (n, 2) lon/lat points of the route line
+        route_name: Name shown as the page title and line popup
+        tolerance: Simplification tolerance (m), or None for every point
+        precision: Decimal places kept in the encoded polyline
+        point_edges: Optional route position of each point; each edge's
+            piece of the line is then simplified on its own, which is much
+            faster than one pass over a long route that crosses itself
+
+    Returns:
+        The HTML document
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    kept = points
+    if tolerance and len(points) > 2:
+        if point_edges is None:
+            offsets = np.array([0, len(points)])
+        else:
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(point_edges))])
+        kept = points[simplify_lines(points, offsets, tolerance)]
+
+    payload = json.dumps({
+        'name': route_name,
+        'precision': precision,
+        'points': len(kept),
+        'polyline': encode_polyline(kept, precision),
+    }, separators=(',', ':'))
+    logger.info(f"HTML map line: {len(kept)} of {len(points)} points")
+    # '<' cannot close the script element when escaped
+    return _PAGE.substitute(title=escape(route_name), leaflet=LEAFLET_URL,
+                            payload=payload.replace('<', '\\u003c'))
+
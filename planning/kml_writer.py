@@ -0,0 +1,263 @@
+"""
+Streaming KML and KMZ writer for planned routes.
+
+RouteExporter.export_to_kml used to build the whole document as one string
+with the route as a single placemark, which field apps struggle to render
+for city-scale routes. This writer walks the route in fixed-size chunks
+and writes each chunk's placemarks as soon as they are formatted, so
+memory use depends on the chunk size rather than route length. A route can
+be written as one placemark (the original document, unchanged), as one
+placemark per chunk of the route line, or as one placemark per traversed
+street segment named after the street, with repeat traversals styled
+apart. write_route_kmz() compresses the same stream into a KMZ archive as
+it is written.
+"""
+
+import numpy as np
+import zipfile
+from typing import BinaryIO, Dict, Hashable, Iterator, List, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape
+import logging
+
+from edge_geometry import EdgeGeometryTable, concat_ranges
+from geojson_writer import DEFAULT_PRECISION, iter_route_chunks
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Route edges gathered and formatted per chunk
+CHUNK_EDGES = 4096
+
+# Ways of splitting the route into placemarks
+PLACEMARK_MODES = ('route', 'chunk', 'segment')
+
+_HEADER = '''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Document>
+    <name>{name}</name>
+    <description>Route generated for street coverage</description>
+    <Style id="route">
+      <LineStyle>
+        <color>ff0000ff</color>
+        <width>4</width>
+      </LineStyle>
+    </Style>'''
+
+# Streets driven again, for per-segment placemarks
+_REPEAT_STYLE = '''
+    <Style id="repeat">
+      <LineStyle>
+        <color>ff00a5ff</color>
+        <width>4</width>
+      </LineStyle>
+    </Style>'''
+
+_FOOTER = '''
+  </Document>
+</kml>'''
+
+_PLACEMARK = '''
+    <Placemark>
+      <name>%s</name>
+      <styleUrl>#%s</styleUrl>
+      <ExtendedData>
+        <Data name="%s"><value>%d</value></Data>
+        <Data name="%s"><value>%d</value></Data>
+      </ExtendedData>
+      <LineString>
+        <tessellate>1</tessellate>
+        <coordinates>%s</coordinates>
+      </LineString>
+    </Placemark>'''
+
+
+def iter_route_kml(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                   route_name: str = "StreetView Route", placemarks: str = 'route',
+                   precision: int = DEFAULT_PRECISION,
+                   chunk_edges: int = CHUNK_EDGES) -> Iterator[str]:
+    """
+    Generate a route's KML document in pieces.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        route_name: Name for the route
+        placemarks: 'route' for a single placemark through the route's
+            nodes in order of first visit (the original KML export),
+            'chunk' for one placemark per chunk of the route's street
+            geometry, or 'segment' for one placemark per traversed edge
+        precision: Decimal places of coordinates in 'chunk' and 'segment'
+            placemarks
+        chunk_edges: Route edges gathered per chunk
+
+    Returns:
+        Iterator of XML text pieces that concatenate to the document
+
+    Raises:
+        ValueError: If the placemark mode is not supported
+    """
+    if placemarks not in PLACEMARK_MODES:
+        raise ValueError(f"Unsupported placemark mode: {placemarks}")
+    name = escape(route_name)
+
+    if placemarks == 'route':
+        yield from _iter_route_placemark(table, route, name, chunk_edges)
+        return
+
+    yield _HEADER.format(name=name)
+    if placemarks == 'segment':
+        yield _REPEAT_STYLE
+        yield from _iter_segment_placemarks(table, route, precision, chunk_edges)
+    else:
+        yield from _iter_chunk_placemarks(table, route, name, precision, chunk_edges)
+    yield _FOOTER
+
+
+def write_route_kml(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                    output: TextIO, **options) -> int:
+    """
+    Stream a route's KML document to a text file or buffer.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        output: Object with a write(str) method
+        **options: Passed to iter_route_kml
+
+    Returns:
+        Number of characters written
+    """
+    written = 0
+    for piece in iter_route_kml(table, route, **options):
+        output.write(piece)
+        written += len(piece)
+    return written
+
+
+def write_route_kmz(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                    output: BinaryIO, **options) -> int:
+    """
+    Stream a route's KML document into a KMZ archive as doc.kml.
+
+    The archive entry is compressed as the document is generated, so the
+    uncompressed KML is never held in memory. Output need not be seekable.
+
+    Args:
+        table: Geometry table of the route's graph
+        route: List of edge tuples (node_from, node_to)
+        output: Path or binary file object to write the archive to
+        **options: Passed to iter_route_kml
+
+    Returns:
+        Number of uncompressed KML bytes written
+    """
+    written = 0
+    with zipfile.ZipFile(output, 'w') as archive:
+        # A fixed timestamp keeps the archive the same for the same route
+        info = zipfile.ZipInfo('doc.kml', date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, 'w', force_zip64=True) as entry:
+            for piece in iter_route_kml(table, route, **options):
+                data = piece.encode('utf-8')
+                entry.write(data)
+                written += len(data)
+    return written
+
+
+def _iter_route_placemark(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                          name: str, chunk_edges: int) -> Iterator[str]:
+    """The single-placemark document through nodes in order of first visit."""
+    yield _HEADER.format(name=name)
+    yield ('\n    <Placemark>\n      <name>%s</name>\n      <styleUrl>#route</styleUrl>'
+           '\n      <LineString>\n        <coordinates>\n' % name)
+    added = ~table.node_valid
+    written = 0
+    for start in range(0, len(route), chunk_edges):
+        u_idx, v_idx, _ = table.route_indices(route[start:start + chunk_edges])
+        nodes = np.column_stack([u_idx, v_idx]).ravel()
+        nodes = nodes[~added[nodes]]
+        _, first = np.unique(nodes, return_index=True)
+        nodes = nodes[np.sort(first)]
+        added[nodes] = True
+        if len(nodes):
+            lines = [f"          {lon},{lat},0" for lon, lat in
+                     zip(table.node_lon[nodes].tolist(), table.node_lat[nodes].tolist())]
+            yield ('\n' if written else '') + '\n'.join(lines)
+            written += len(lines)
+    yield ('\n        </coordinates>\n      </LineString>\n    </Placemark>' + _FOOTER)
+
+
+def _iter_chunk_placemarks(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                           name: str, precision: int, chunk_edges: int) -> Iterator[str]:
+    """One placemark per chunk of the route line, each starting where the last ended."""
+    previous: Optional[np.ndarray] = None
+    part = 0
+    for points, _, chunk_start in iter_route_chunks(table, route, chunk_edges):
+        if previous is not None and len(points):
+            points = np.vstack([previous, points])
+        if len(points) < 2:
+            continue
+        previous = points[-1:]
+        part += 1
+        chunk_end = min(chunk_start + chunk_edges, len(route))
+        yield _PLACEMARK % (f'{name} (part {part})', 'route',
+                            'first_segment', chunk_start, 'last_segment', chunk_end - 1,
+                            ' '.join(_coordinate_strings(points, precision)))
+
+
+def _iter_segment_placemarks(table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                             precision: int, chunk_edges: int) -> Iterator[str]:
+    """One placemark per traversed edge with its whole street geometry."""
+    if table.projected:
+        node_lon, node_lat, node_ok = table.node_x_lon, table.node_y_lat, table.node_xy_valid
+    else:
+        node_lon, node_lat, node_ok = table.node_lon, table.node_lat, table.node_valid
+    traversals: Dict[Tuple[Hashable, Hashable], int] = {}
+
+    for chunk_start in range(0, len(route), chunk_edges):
+        chunk = route[chunk_start:chunk_start + chunk_edges]
+        u_idx, v_idx, e_idx = table.route_indices(chunk)
+
+        # Each edge's geometry, or its two end nodes when it has none
+        shaped = e_idx >= 0
+        shaped[shaped] = table.has_geometry[e_idx[shaped]]
+        edges = e_idx[shaped]
+        counts = np.full(len(chunk), 2, dtype=np.int64)
+        counts[shaped] = table.offsets[edges + 1] - table.offsets[edges]
+        starts = np.cumsum(counts) - counts
+        points = np.empty((int(counts.sum()), 2))
+        points[concat_ranges(starts[shaped], counts[shaped])] = \
+            table.coords[concat_ranges(table.offsets[edges], counts[shaped])]
+        plain = ~shaped
+        points[starts[plain]] = np.column_stack([node_lon[u_idx[plain]], node_lat[u_idx[plain]]])
+        points[starts[plain] + 1] = np.column_stack([node_lon[v_idx[plain]],
+                                                     node_lat[v_idx[plain]]])
+        usable = shaped | (node_ok[u_idx] & node_ok[v_idx])
+        coordinates = _coordinate_strings(points, precision)
+
+        pieces = []
+        for offset, (u, v) in enumerate(chunk):
+            edge_key = (min(u, v), max(u, v))
+            traversals[edge_key] = traversal = traversals.get(edge_key, 0) + 1
+            if not usable[offset] or counts[offset] < 2:
+                continue
+            edge = int(e_idx[offset])
+            street = table.edge_names[edge] if edge >= 0 else None
+            if isinstance(street, list):
+                street = '; '.join(street)
+            start = int(starts[offset])
+            pieces.append(_PLACEMARK % (
+                escape(str(street)) if street else f'Segment {chunk_start + offset}',
+                'route' if traversal == 1 else 'repeat',
+                'segment_index', chunk_start + offset, 'traversal_number', traversal,
+                ' '.join(coordinates[start:start + int(counts[offset])])))
+        if pieces:
+            yield ''.join(pieces)
+
+
+def _coordinate_strings(points: np.ndarray, precision: int) -> List[str]:
+    """Format (n, 2) lon/lat points as KML 'lon,lat,0' tuples in one formatting call."""
+    if not len(points):
+        return []
+    template = '|'.join([f'%.{precision}f,%.{precision}f,0'] * len(points))
+    return (template % tuple(points.ravel().tolist())).split('|')
@@ -4,25 +4,80 @@ Module for loading street network data from OpenStreetMap.
 
 import osmnx as ox
 import networkx as nx
+import numpy as np
 from typing import Union, Tuple, Optional
 import logging
+from graph_simplify import simplify_graph
+from edge_attributes import graph_memory_bytes, memory_report, prune_edge_attributes
+from graph_stats import graph_stats, track_stats
+from graph_repair import repair_graph
+import overpass_stream
+import network_modes
+from gazetteer import Gazetteer, default_gazetteer
+from graph_pool import RegionGraphPool
+from graph_arrays import ArrayGraph, load_graph_arrays, save_graph_arrays
+from tile_fetcher import TileFetcher
+import shapely
+import shapely.wkb
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Margin (m) downloaded around a region, as OSMnx does, so intersections
+# whose side streets lie outside the region survive simplification
+DOWNLOAD_BUFFER = 500
+
 
 class MapLoader:
     """Handles loading and preprocessing of street network data from OSM."""
     
-    def __init__(self, network_type: str = 'drive'):
+    def __init__(self, network_type: str = 'drive', prune_attributes: bool = False,
+                 streaming: bool = False, tile_fetcher: Optional[TileFetcher] = None,
+                 shared_download: bool = False, gazetteer: Optional[Gazetteer] = None,
+                 graph_pool: Optional[RegionGraphPool] = None,
+                 repair: bool = False, repair_options: Optional[dict] = None):
         """
         Initialize MapLoader.
         
         Args:
             network_type: Type of street network to load.
                 Options: 'drive', 'drive_service', 'walk', 'bike', 'all'
+            prune_attributes: If True, keep only the node and edge attributes
+                used for solving and exporting, and intern street names and
+                highway classes into integer codes; OSM way IDs are dropped
+            streaming: If True, place and polygon loads stream the Overpass
+                response to the cache and parse it incrementally instead of
+                building the graph through OSMnx (lower peak memory)
+            tile_fetcher: If given, bbox, place and polygon loads fetch
+                uncached data as concurrent tiles through it and parse
+                them with the streaming parser
+            shared_download: If True, download the superset 'all' network
+                once per region, cache it in-process and derive this
+                network type from it by filtering (see network_modes), so
+                loading another mode for the same area skips the download
+            gazetteer: Place boundary store used by load_by_place
+                (default: the shared store in the OSMnx cache folder)
+            graph_pool: Pool of loaded region graphs; bbox loads inside a
+                pooled region are cut out of it instead of loaded again,
+                and loaded graphs are added to it
+            repair: If True, drop duplicate edges and contract zero-length
+                edges after simplification (see graph_repair); neither
+                removes a street
+            repair_options: Overrides for graph_repair.DEFAULT_REPAIR_OPTIONS,
+                e.g. to opt in to the lossy repairs (self-loops, one-way
+                stubs, fragments)
         """
         self.network_type = network_type
+        self.prune_attributes = prune_attributes
+        self.streaming = streaming
+        self.tile_fetcher = tile_fetcher
+        self.shared_download = shared_download
+        self.gazetteer = gazetteer
+        self.graph_pool = graph_pool
+        self.repair = repair
+        self.repair_options = repair_options or {}
+        self.repair_report = None
+        self.memory_report = None
         ox.settings.use_cache = True
         ox.settings.log_console = False
         
@@ -37,8 +92,7 @@ class MapLoader:
             NetworkX MultiDiGraph representing the street network
         """
         logger.info(f"Loading street network for {place_name}")
-        graph = ox.graph_from_place(place_name, network_type=self.network_type)
-        return self._preprocess_graph(graph)
+        return self._load(('place', place_name))
     
     def load_by_bbox(self, north: float, south: float, 
                      east: float, west: float) -> nx.MultiDiGraph:
@@ -55,10 +109,7 @@ class MapLoader:
             NetworkX MultiDiGraph representing the street network
         """
         logger.info(f"Loading street network for bbox: N={north}, S={south}, E={east}, W={west}")
-        # OSMnx expects bbox as (west, south, east, north) - i.e., (left, bottom, right, top)
-        graph = ox.graph_from_bbox(bbox=(west, south, east, north), 
-                                   network_type=self.network_type)
-        return self._preprocess_graph(graph)
+        return self._load(('bbox', north, south, east, west))
     
     def load_by_polygon(self, polygon) -> nx.MultiDiGraph:
         """
@@ -71,8 +122,8 @@ class MapLoader:
             NetworkX MultiDiGraph representing the street network
         """
         logger.info("Loading street network for polygon area")
-        graph = ox.graph_from_polygon(polygon, network_type=self.network_type)
-        return self._preprocess_graph(graph)
+        # WKB makes the polygon usable as a superset cache key
+        return self._load(('polygon', polygon.wkb))
     
     def load_by_point(self, lat: float, lon: float, 
                       dist: float = 1000) -> nx.MultiDiGraph:
@@ -88,72 +139,347 @@ class MapLoader:
             NetworkX MultiDiGraph representing the street network
         """
         logger.info(f"Loading street network around point ({lat}, {lon}) with {dist}m radius")
-        graph = ox.graph_from_point((lat, lon), dist=dist, 
-                                    network_type=self.network_type)
-        return self._preprocess_graph(graph)
+        return self._load(('point', lat, lon, dist))
     
-    def _preprocess_graph(self, graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+    def _load(self, region: tuple) -> nx.MultiDiGraph:
         """
-        Preprocess the graph for routing.
+        Load and preprocess the street network of a region.
+        
+        With shared_download, the region's 'all' network comes from (or is
+        added to) the process-wide superset cache and this loader's network
+        type is filtered out of it. With a graph pool, bounding boxes inside
+        an already loaded region are cut out of the pooled graph and
+        repaired like a fresh load, and newly loaded graphs are added to the
+        pool.
         
         Args:
-            graph: Raw graph from OSM
+            region: Region key, e.g. ('place', name) or ('bbox', n, s, e, w)
             
         Returns:
             Preprocessed graph
         """
+        pool_key = self._pool_key()
+        if self.graph_pool and region[0] == 'bbox':
+            pooled = self.graph_pool.get_bbox(pool_key, *region[1:])
+            if pooled is not None:
+                return self._finish_pooled_graph(*pooled)
+        
+        extent = self._region_extent(region)
+        if not self.shared_download:
+            graph = self._download(region, self.network_type)
+        else:
+            superset = network_modes.superset_cache.get(region)
+            if superset is None:
+                logger.info(f"Downloading shared '{network_modes.SUPERSET_NETWORK_TYPE}' network")
+                network_modes.ensure_filter_tags()
+                raw = self._download(region, network_modes.SUPERSET_NETWORK_TYPE, retain_all=True)
+                superset = network_modes.superset_cache.put(region, self._project_graph(raw))
+            else:
+                logger.info(f"Using cached shared network for {self.network_type} graph")
+            graph = superset.derive(self.network_type)
+        graph = self._preprocess_graph(graph, extent)
+        
+        if self.graph_pool:
+            self.graph_pool.add(pool_key, extent, graph, self.memory_report)
+        return graph
+    
+    def _pool_key(self) -> tuple:
+        """Get the settings a pooled graph must have been loaded with to be reused."""
+        return (self.network_type, self.prune_attributes, self.repair,
+                tuple(sorted(self.repair_options.items())))
+    
+    def _region_extent(self, region: tuple):
+        """
+        Get the lat/lon area a region's graph was loaded for.
+        
+        Args:
+            region: Region key, as passed to _load()
+            
+        Returns:
+            Shapely geometry in lat/lon
+        """
+        kind, *args = region
+        if kind == 'place':
+            # Already resolved by the download, so this is a local lookup
+            return (self.gazetteer or default_gazetteer()).resolve(args[0])
+        if kind == 'bbox':
+            north, south, east, west = args
+            # OSMnx's own polygon, whose vertex order its cache keys depend on
+            return ox.utils_geo.bbox_to_poly((west, south, east, north))
+        if kind == 'polygon':
+            return shapely.wkb.loads(args[0])
+        lat, lon, dist = args
+        return ox.utils_geo.bbox_to_poly(ox.utils_geo.bbox_from_point((lat, lon), dist))
+    
+    def _download(self, region: tuple, network_type: str,
+                  retain_all: bool = False) -> nx.MultiDiGraph:
+        """
+        Download the unsimplified street network of a region.
+        
+        OSMnx and streamed loads download a DOWNLOAD_BUFFER margin around the
+        region; the graph is cut back to the region only after
+        simplification (see _preprocess_graph).
+        
+        Args:
+            region: Region key, as passed to _load()
+            network_type: OSMnx network type to download
+            retain_all: If True, keep every connected component
+            
+        Returns:
+            Raw graph (lat/lon from OSMnx, projected from the streaming parser)
+        """
+        kind, *args = region
+        streaming = self.streaming or self.tile_fetcher
+        
+        if kind == 'bbox':
+            if self.tile_fetcher:
+                buffered = ox.utils_geo.buffer_geometry(self._region_extent(region),
+                                                        DOWNLOAD_BUFFER)
+                return self._download_polygon_streaming(buffered, network_type, retain_all)
+            return self._download_buffered(self._region_extent(region), network_type,
+                                           retain_all)
+        
+        if kind in ('place', 'polygon'):
+            if kind == 'place':
+                # Same boundary ox.graph_from_place would geocode, but served
+                # from the local gazetteer when the place is known
+                polygon = (self.gazetteer or default_gazetteer()).resolve(args[0])
+            else:
+                polygon = shapely.wkb.loads(args[0])
+            buffered = ox.utils_geo.buffer_geometry(polygon, DOWNLOAD_BUFFER)
+            if streaming:
+                return self._download_polygon_streaming(buffered, network_type, retain_all)
+            return overpass_stream.download_graph(buffered, network_type, retain_all)
+        
+        if kind == 'point':
+            # Same box ox.graph_from_point loads
+            return self._download_buffered(self._region_extent(region), network_type, retain_all)
+        
+        raise ValueError(f"Unknown region type: {kind}")
+    
+    def _download_buffered(self, polygon, network_type: str,
+                           retain_all: bool = False) -> nx.MultiDiGraph:
+        """
+        Download the unsimplified network of a polygon and its surroundings.
+        
+        Args:
+            polygon: Shapely Polygon/MultiPolygon in lat/lon
+            network_type: OSMnx network type to download
+            retain_all: If True, keep every connected component
+            
+        Returns:
+            Lat/lon graph of the polygon buffered by DOWNLOAD_BUFFER meters
+        """
+        buffered = ox.utils_geo.buffer_geometry(polygon, DOWNLOAD_BUFFER)
+        return overpass_stream.download_graph(buffered, network_type, retain_all)
+    
+    def _download_polygon_streaming(self, polygon, network_type: str,
+                                    retain_all: bool = False) -> nx.MultiDiGraph:
+        """
+        Download street network within a polygon through the streaming parser.
+        
+        Without a tile fetcher the queries are the ones OSMnx sends for the
+        same polygon, so streamed and OSMnx loads of a region share cache
+        files.
+        
+        Args:
+            polygon: Shapely Polygon/MultiPolygon in lat/lon
+            network_type: OSMnx network type to download
+            retain_all: If True, keep every connected component
+            
+        Returns:
+            Projected, unsimplified graph
+        """
+        if self.tile_fetcher:
+            sources = self.tile_fetcher.fetch_polygon(polygon, network_type)
+        else:
+            sources = [overpass_stream.fetch_to_cache(query)
+                       for query in overpass_stream.network_queries(polygon, network_type)]
+        return overpass_stream.build_graph(sources, network_type, polygon=polygon,
+                                           retain_all=retain_all)
+    
+    def _project_graph(self, graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+        """
+        Project a lat/lon graph to UTM, keeping 'lat'/'lon' node attributes.
+        
+        Args:
+            graph: Raw graph (returned unchanged if already projected)
+            
+        Returns:
+            Projected graph
+        """
+        if ox.projection.is_projected(graph.graph['crs']):
+            return graph
+        
         # Store original lat/lon before projection
         for node_id, node_data in graph.nodes(data=True):
             node_data['lat'] = node_data.get('y')
             node_data['lon'] = node_data.get('x')
         
         # Project to UTM for accurate distance calculations
-        graph = ox.project_graph(graph)
+        return ox.project_graph(graph)
+    
+    def _preprocess_graph(self, graph: nx.MultiDiGraph, extent=None) -> nx.MultiDiGraph:
+        """
+        Preprocess the graph for routing.
+        
+        Args:
+            graph: Raw graph from OSM (lat/lon, or already projected with
+                'lat'/'lon' node attributes)
+            extent: Optional lat/lon region to cut the simplified graph to;
+                the raw graph then covers a margin around it
+            
+        Returns:
+            Preprocessed graph
+        """
+        graph = self._project_graph(graph)
         
         # Add edge lengths if not present
         if 'length' not in next(iter(graph.edges(data=True)))[2]:
             graph = ox.distance.add_edge_lengths(graph)
         
-        # Simplify graph topology if not already simplified
-        try:
-            graph = ox.simplify_graph(graph)
-        except:
-            # Graph is already simplified, skip
-            pass
+        # Merge chains of interstitial nodes into single edges; graphs are
+        # downloaded unsimplified so this runs on the projected coordinates
+        if not graph.graph.get('simplified'):
+            graph = simplify_graph(graph)
+        
+        # Cut only now, so intersections on the boundary stay nodes
+        if extent is not None:
+            graph = self._cut_to_extent(graph, extent)
+        
+        self._repair_graph(graph)
+        
+        if self.prune_attributes:
+            before = graph_memory_bytes(graph)
+            graph = prune_edge_attributes(graph)
+            self.memory_report = memory_report(before, graph_memory_bytes(graph))
+            logger.info(f"Graph memory: {self.memory_report['before_mb']} MB -> "
+                       f"{self.memory_report['after_mb']} MB "
+                       f"({self.memory_report['saved_percent']}% saved)")
         
         logger.info(f"Graph loaded: {graph.number_of_nodes()} nodes, "
                    f"{graph.number_of_edges()} edges")
         
         return graph
     
+    def _finish_pooled_graph(self, graph: nx.MultiDiGraph,
+                             pooled_memory: Optional[dict]) -> nx.MultiDiGraph:
+        """
+        Finish a graph cut out of the pool the way a fresh load is finished.
+        
+        The pooled graph was simplified before it was cut, just as a fresh
+        load simplifies its buffered download before cutting it to the
+        region, so the simplification step is skipped here: run on the cut
+        graph it would merge the boundary intersections a fresh load keeps.
+        The steps that follow the cut in _preprocess_graph run as usual:
+        repair, since the cut leaves new stubs and fragments at the box
+        edge, and the reports, with the memory saving scaled from the
+        pooled graph's load.
+        
+        Args:
+            graph: Graph returned by RegionGraphPool.get_bbox()
+            pooled_memory: Memory report stored with the pooled graph
+            
+        Returns:
+            The finished graph
+            
+        Raises:
+            ValueError: If the box contains no graph nodes
+        """
+        if not graph.number_of_nodes():
+            raise ValueError("Found no graph nodes within the requested area")
+        
+        self._repair_graph(graph)
+        
+        if self.prune_attributes and pooled_memory and pooled_memory['after_mb']:
+            after = graph_memory_bytes(graph)
+            ratio = pooled_memory['before_mb'] / pooled_memory['after_mb']
+            self.memory_report = memory_report(int(after * ratio), after)
+        
+        logger.info(f"Graph loaded from pool: {graph.number_of_nodes()} nodes, "
+                   f"{graph.number_of_edges()} edges")
+        return graph
+    
+    def _repair_graph(self, graph: nx.MultiDiGraph) -> None:
+        """Run graph_repair on a cut graph if enabled, recording its report."""
+        if self.repair:
+            # Track statistics first so the repair's removals update them
+            # incrementally instead of forcing a recompute afterwards
+            track_stats(graph)
+            self.repair_report = repair_graph(graph, **self.repair_options)
+    
+    def _cut_to_extent(self, graph: nx.MultiDiGraph, extent) -> nx.MultiDiGraph:
+        """
+        Cut a simplified graph to a region, as ox.graph_from_polygon does.
+        
+        Nodes outside the region are removed without simplifying again, and
+        the largest weakly connected component is kept. Each remaining node's
+        street_count is taken from the uncut graph, so it still counts
+        streets that leave the region.
+        
+        Args:
+            graph: Simplified graph with 'lat'/'lon' node attributes,
+                modified in place
+            extent: Shapely geometry in lat/lon
+            
+        Returns:
+            The cut graph
+        """
+        nodes = np.array(list(graph.nodes), dtype=object)
+        data = graph.nodes
+        lon = np.fromiter((data[n]['lon'] for n in nodes), dtype=np.float64, count=len(nodes))
+        lat = np.fromiter((data[n]['lat'] for n in nodes), dtype=np.float64, count=len(nodes))
+        inside = shapely.intersects_xy(extent, lon, lat)
+        if not inside.any():
+            raise ValueError("Found no graph nodes within the requested area")
+        
+        street_counts = ox.stats.count_streets_per_node(graph, nodes=nodes[inside].tolist())
+        graph.remove_nodes_from(nodes[~inside].tolist())
+        largest = max(nx.weakly_connected_components(graph), key=len)
+        if len(largest) < graph.number_of_nodes():
+            graph.remove_nodes_from([n for n in list(graph.nodes) if n not in largest])
+        nx.set_node_attributes(graph, street_counts, 'street_count')
+        return graph
+    
+    def save_snapshot(self, graph: nx.MultiDiGraph, directory: str) -> str:
+        """
+        Save a preprocessed graph as a columnar snapshot (see graph_arrays).
+        
+        Args:
+            graph: Graph returned by one of the load methods
+            directory: Snapshot directory; replaced if it exists
+            
+        Returns:
+            The snapshot directory
+        """
+        return save_graph_arrays(graph, directory)
+    
+    def load_snapshot(self, directory: str) -> ArrayGraph:
+        """
+        Open a saved snapshot through memory maps, without rebuilding NetworkX objects.
+        
+        Args:
+            directory: Snapshot directory written by save_snapshot()
+            
+        Returns:
+            Read-only ArrayGraph usable by CPPSolver and RouteExporter
+        """
+        graph = load_graph_arrays(directory)
+        logger.info(f"Graph snapshot opened: {graph.number_of_nodes()} nodes, "
+                    f"{graph.number_of_edges()} edges")
+        return graph
+    
     def get_graph_stats(self, graph: nx.MultiDiGraph) -> dict:
         """
         Get basic statistics about the graph.
         
+        Statistics are computed once and memoized on the graph (see
+        graph_stats), so repeated calls are cheap.
+        
         Args:
             graph: NetworkX graph
             
         Returns:
             Dictionary with graph statistics
         """
-        stats = {
-            'n_nodes': graph.number_of_nodes(),
-            'n_edges': graph.number_of_edges(),
-            'total_edge_length': sum(data['length'] for _, _, data in graph.edges(data=True)),
-            'is_strongly_connected': nx.is_strongly_connected(graph),
-            'is_eulerian': nx.is_eulerian(graph)
-        }
-        
-        # Count odd-degree nodes (important for Chinese Postman Problem)
-        in_degrees = dict(graph.in_degree())
-        out_degrees = dict(graph.out_degree())
-        odd_nodes = []
-        for node in graph.nodes():
-            total_degree = in_degrees[node] + out_degrees[node]
-            if total_degree % 2 == 1:
-                odd_nodes.append(node)
-        
-        stats['n_odd_degree_nodes'] = len(odd_nodes)
-        stats['odd_degree_nodes'] = odd_nodes[:10]  # Show first 10 for brevity
-        
-        return stats
\ No newline at end of file
+        return graph_stats(graph)
@@ -0,0 +1,251 @@
+"""
+Derive drive/walk/bike street graphs from one shared 'all' network download.
+
+Loading the same area for several network types used to download and
+preprocess it once per mode. Instead, the superset 'all' network is fetched
+once per region and kept in an in-process LRU cache with a memory budget,
+together with a table of the tags the OSMnx network filters test. Each mode's subgraph is
+then selected by evaluating that mode's Overpass filter against the table
+with vectorized lookups, so switching modes for a cached area costs a filter
+pass instead of a download.
+"""
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import pandas as pd
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import logging
+
+from edge_attributes import graph_memory_bytes
+from overpass_stream import network_way_filter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Network type downloaded once and filtered into the others
+SUPERSET_NETWORK_TYPE = 'all'
+
+# Network types that can be derived from the superset
+DERIVED_NETWORK_TYPES = ('all', 'all_public', 'drive', 'drive_service', 'walk', 'bike')
+
+# One Overpass filter clause: ["tag"] or ["tag"!~"regex"]
+_CLAUSE = re.compile(r'\["([^"]+)"(?:!~"([^"]*)")?\]')
+
+# Filter clause as (tag, regex); regex None means the tag must be present
+Clause = Tuple[str, Optional[str]]
+
+
+def network_filter_clauses(network_type: str) -> List[Clause]:
+    """
+    Parse the OSMnx Overpass filter of a network type into clauses.
+
+    Args:
+        network_type: OSMnx network type
+
+    Returns:
+        List of (tag, regex) clauses; a way passes the filter when it has
+        every tag whose regex is None and no tag value matching a regex
+
+    Raises:
+        ValueError: If the filter uses a clause form that is not supported
+    """
+    way_filter = network_way_filter(network_type)
+    clauses = [(m.group(1), m.group(2)) for m in _CLAUSE.finditer(way_filter)]
+    if _CLAUSE.sub('', way_filter):
+        raise ValueError(f"Unsupported filter for network type {network_type!r}: {way_filter}")
+    return clauses
+
+
+def filter_tags(network_types=DERIVED_NETWORK_TYPES) -> List[str]:
+    """
+    Get the way tags tested by the filters of the given network types.
+
+    Args:
+        network_types: OSMnx network types
+
+    Returns:
+        Sorted list of tag names
+    """
+    return sorted({tag for nt in network_types for tag, _ in network_filter_clauses(nt)})
+
+
+def ensure_filter_tags() -> None:
+    """Make OSMnx keep every tag the mode filters need on superset edges."""
+    missing = [tag for tag in filter_tags() if tag not in ox.settings.useful_tags_way]
+    if missing:
+        ox.settings.useful_tags_way = list(ox.settings.useful_tags_way) + missing
+
+
+class SupersetNetwork:
+    """A projected, unsimplified 'all' network with its edge tag table."""
+
+    def __init__(self, graph: nx.MultiDiGraph):
+        """
+        Index a superset graph for filtering.
+
+        Args:
+            graph: Projected, unsimplified graph of network type 'all',
+                built with the tags from filter_tags()
+        """
+        self.graph = graph
+        edges = list(graph.edges(keys=True, data=True))
+        self.edges = edges
+
+        # Factorize each tag column once; filters then only test the
+        # distinct values and index the result by code
+        self.tag_codes = {}
+        self.tag_values = {}
+        for tag in filter_tags():
+            codes, values = pd.factorize(
+                pd.Series([data.get(tag) for _, _, _, data in edges], dtype=object))
+            self.tag_codes[tag] = codes
+            self.tag_values[tag] = values.astype(str)
+
+        self.memory_bytes = (graph_memory_bytes(graph) + sys.getsizeof(edges) +
+                             sum(codes.nbytes for codes in self.tag_codes.values()))
+
+    def mode_mask(self, network_type: str) -> np.ndarray:
+        """
+        Select the superset edges belonging to a network type.
+
+        Args:
+            network_type: OSMnx network type
+
+        Returns:
+            Boolean array aligned with self.edges
+        """
+        mask = np.ones(len(self.edges), dtype=bool)
+        for tag, pattern in network_filter_clauses(network_type):
+            codes = self.tag_codes[tag]
+            if pattern is None:
+                mask &= codes >= 0
+                continue
+            regex = re.compile(pattern)
+            matches = np.array([regex.search(value) is not None
+                                for value in self.tag_values[tag]] + [False])
+            # Missing tags have code -1, which picks the trailing False
+            mask &= ~matches[codes]
+        return mask
+
+    def derive(self, network_type: str) -> nx.MultiDiGraph:
+        """
+        Build the unsimplified graph of one network type from the superset.
+
+        Attribute dicts are copied, so the result can be simplified and
+        pruned without touching the cached superset. Bidirectional types
+        (walk) get a reverse edge for every oneway edge, and only the largest
+        weakly connected component is kept, matching a direct OSMnx load.
+
+        Args:
+            network_type: OSMnx network type
+
+        Returns:
+            Projected, unsimplified graph of that network type
+        """
+        if network_type not in DERIVED_NETWORK_TYPES:
+            raise ValueError(f"Cannot derive network type {network_type!r} "
+                             f"from the '{SUPERSET_NETWORK_TYPE}' network")
+
+        mask = self.mode_mask(network_type)
+        bidirectional = network_type in ox.settings.bidirectional_network_types
+        selected = [self.edges[i] for i in np.flatnonzero(mask)]
+
+        graph = nx.MultiDiGraph(**self.graph.graph)
+        if bidirectional:
+            for u, v, _, data in selected:
+                graph.add_edge(u, v, **{**data, 'oneway': False})
+                if data.get('oneway'):
+                    graph.add_edge(v, u, **{**data, 'oneway': False, 'reversed': True})
+        else:
+            graph.add_edges_from((u, v, key, dict(data)) for u, v, key, data in selected)
+
+        nodes = self.graph.nodes
+        graph.add_nodes_from((node, dict(nodes[node])) for node in list(graph.nodes))
+
+        if graph.number_of_nodes():
+            largest = max(nx.weakly_connected_components(graph), key=len)
+            graph.remove_nodes_from([node for node in list(graph.nodes) if node not in largest])
+        if 'street_count' in next(iter(nodes.data()), (None, {}))[1]:
+            nx.set_node_attributes(graph, ox.stats.count_streets_per_node(graph), 'street_count')
+
+        logger.info(f"Derived {network_type} graph from superset: "
+                    f"{graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges "
+                    f"({int(mask.sum())} of {len(mask)} superset edges)")
+        return graph
+
+
+class SupersetCache:
+    """Thread-safe LRU cache of superset networks keyed by region."""
+
+    def __init__(self, memory_budget_mb: float = 256):
+        """
+        Initialize the cache.
+
+        Args:
+            memory_budget_mb: Estimated memory of the cached networks (see
+                edge_attributes.graph_memory_bytes) above which the least
+                recently used ones are evicted
+        """
+        self.memory_budget_bytes = int(memory_budget_mb * 1e6)
+        self._entries: "OrderedDict[Hashable, SupersetNetwork]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, region: Hashable) -> Optional[SupersetNetwork]:
+        """Get a cached superset network, or None."""
+        with self._lock:
+            entry = self._entries.get(region)
+            if entry is not None:
+                self._entries.move_to_end(region)
+            return entry
+
+    def put(self, region: Hashable, graph: nx.MultiDiGraph) -> SupersetNetwork:
+        """
+        Index and cache a superset graph.
+
+        Args:
+            region: Hashable region key
+            graph: Projected, unsimplified 'all' graph
+
+        Returns:
+            The indexed SupersetNetwork (not cached if it alone exceeds the
+            memory budget)
+        """
+        entry = SupersetNetwork(graph)
+        if entry.memory_bytes > self.memory_budget_bytes:
+            logger.info(f"Superset network of {entry.memory_bytes / 1e6:.1f} MB exceeds the "
+                        "cache budget, not cached")
+            return entry
+
+        with self._lock:
+            self._entries[region] = entry
+            self._entries.move_to_end(region)
+            total = sum(e.memory_bytes for e in self._entries.values())
+            while total > self.memory_budget_bytes:
+                evicted, evicted_entry = self._entries.popitem(last=False)
+                total -= evicted_entry.memory_bytes
+                logger.info(f"Evicted superset network for {evicted!r} "
+                            f"({evicted_entry.memory_bytes / 1e6:.1f} MB)")
+        return entry
+
+    def clear(self) -> None:
+        """Drop all cached networks."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of cached regions, their memory use and the budget."""
+        with self._lock:
+            return {
+                'regions': len(self._entries),
+                'memory_mb': round(sum(e.memory_bytes for e in self._entries.values()) / 1e6, 2),
+                'memory_budget_mb': round(self.memory_budget_bytes / 1e6, 2),
+            }
+
+
+# Process-wide cache shared by all MapLoader instances
+superset_cache = SupersetCache()
@@ -0,0 +1,399 @@
+"""
+Streaming ingestion of Overpass API street network responses.
+
+Large place loads normally parse the whole Overpass response into Python
+dicts, build a GeoDataFrame-backed graph and then project it, which peaks at
+several times the final graph size. This module downloads responses straight
+to the OSMnx cache folder, parses their elements one at a time and builds the
+projected street graph from compact arrays.
+"""
+
+import json
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from hashlib import sha1
+from itertools import groupby
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+import logging
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import requests
+import shapely
+from pyproj import CRS, Transformer
+from pyproj.aoi import AreaOfInterest
+from pyproj.database import query_utm_crs_info
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# OSM 'oneway' tag values meaning travel in one direction only, and the
+# subset meaning against the node order (same as OSMnx)
+ONEWAY_VALUES = {'yes', 'true', '1', '-1', 'reverse', 'T', 'F'}
+REVERSED_VALUES = {'-1', 'reverse', 'T'}
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_elements(fp: IO[str], chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the elements of an Overpass JSON response one at a time.
+
+    Only the element being decoded and one read chunk are held in memory.
+
+    Args:
+        fp: Text file object positioned at the start of the response
+        chunk_size: Number of characters read at a time
+
+    Yields:
+        Element dicts ('node', 'way', ...) in document order
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+
+    def fill() -> bool:
+        nonlocal buffer, pos
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    # Skip ahead to the opening bracket of the elements array
+    while True:
+        start = buffer.find('"elements"', pos)
+        if start >= 0:
+            bracket = buffer.find('[', start)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+        elif len(buffer) > 16:
+            # Keep a tail in case the key is split across chunks
+            pos = len(buffer) - 16
+        if not fill():
+            raise ValueError("Overpass response has no 'elements' array")
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE + ',':
+            pos += 1
+        if pos >= len(buffer):
+            if not fill():
+                raise ValueError("Overpass response ended inside 'elements'")
+            continue
+        if buffer[pos] == ']':
+            pos += 1
+            break
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Element is split across chunks
+            if not fill():
+                raise
+            continue
+        pos = end
+        yield element
+
+    # Anything after the array is small; Overpass reports partial results
+    # (timeouts, memory exhaustion) in a trailing "remark"
+    tail = buffer[pos:] + fp.read()
+    if '"remark"' in tail:
+        remark = tail[tail.index('"remark"'):].split(':', 1)[1].strip().rstrip('}').strip()
+        raise ValueError(f"Overpass response is incomplete: {remark}")
+
+
+def network_queries(polygon, network_type: str) -> List[str]:
+    """
+    Build the Overpass queries OSMnx would send for a network download.
+
+    Args:
+        polygon: Shapely (Multi)Polygon in lat/lon
+        network_type: OSMnx network type
+
+    Returns:
+        List of Overpass QL query strings, one per polygon subdivision
+    """
+    # Reuse OSMnx's query construction so cache keys match its own
+    way_filter = network_way_filter(network_type)
+    settings = overpass_settings()
+    return [
+        f"{settings};(way{way_filter}(poly:{coord_str!r});>;);out;"
+        for coord_str in _overpass_module()._make_overpass_polygon_coord_strs(polygon)
+    ]
+
+
+def network_way_filter(network_type: str) -> str:
+    """
+    Get the Overpass way filter OSMnx uses for a network type.
+
+    Args:
+        network_type: OSMnx network type
+
+    Returns:
+        Overpass QL filter such as '["highway"]["area"!~"yes"]...'
+    """
+    return _overpass_module()._get_network_filter(network_type)
+
+
+def overpass_settings() -> str:
+    """Get the '[out:json][timeout:...]' settings OSMnx starts its queries with."""
+    return _overpass_module()._make_overpass_settings()
+
+
+def cache_path_for_query(query: str, overpass_url: Optional[str] = None,
+                         cache_folder: Optional[str] = None) -> str:
+    """
+    Get the OSMnx cache file path for an Overpass query.
+
+    Args:
+        query: Overpass QL query string
+        overpass_url: Overpass API base URL (default: OSMnx setting)
+        cache_folder: Cache directory (default: OSMnx setting)
+
+    Returns:
+        Path of the cache file (which may not exist yet)
+    """
+    url = (overpass_url or ox.settings.overpass_url).rstrip('/') + '/interpreter'
+    prepared_url = requests.Request('GET', url, params=OrderedDict(data=query)).prepare().url
+    digest = sha1(prepared_url.encode('utf-8')).hexdigest()
+    return os.path.join(str(cache_folder or ox.settings.cache_folder), f"{digest}.json")
+
+
+def fetch_to_cache(query: str, session: Optional[requests.Session] = None,
+                   overpass_url: Optional[str] = None,
+                   cache_folder: Optional[str] = None) -> str:
+    """
+    Stream an Overpass query response to its cache file.
+
+    The response body is written to disk in chunks and never parsed here. A
+    cache hit returns immediately.
+
+    Args:
+        query: Overpass QL query string
+        session: Optional HTTP session to send the request with
+        overpass_url: Overpass API base URL (default: OSMnx setting)
+        cache_folder: Cache directory (default: OSMnx setting)
+
+    Returns:
+        Path of the cache file holding the response
+
+    Raises:
+        requests.HTTPError: If the server responds with an error status
+    """
+    cache_path = cache_path_for_query(query, overpass_url, cache_folder)
+    if os.path.isfile(cache_path):
+        logger.info(f"Using cached Overpass response {cache_path}")
+        return cache_path
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    url = (overpass_url or ox.settings.overpass_url).rstrip('/') + '/interpreter'
+    logger.info(f"Streaming Overpass response to {cache_path}")
+
+    http = session or requests
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with http.post(url, data={'data': query}, stream=True,
+                   timeout=ox.settings.requests_timeout,
+                   **ox.settings.requests_kwargs) as response:
+        response.raise_for_status()
+        with open(temp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+
+    if _has_remark(temp_path):
+        os.remove(temp_path)
+        raise ValueError(f"Overpass returned an incomplete response for {cache_path}")
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def download_graph(polygon, network_type: str, retain_all: bool = False) -> nx.MultiDiGraph:
+    """
+    Download the unsimplified street graph inside a polygon through OSMnx.
+
+    Unlike ox.graph_from_polygon, the polygon is neither buffered nor cut
+    back after simplification: callers pass the buffered area and cut the
+    graph themselves once it is simplified. Queries and cache files are
+    OSMnx's own.
+
+    Args:
+        polygon: Shapely (Multi)Polygon in lat/lon
+        network_type: OSMnx network type
+        retain_all: If True, keep every connected component
+
+    Returns:
+        Lat/lon graph truncated to the polygon
+    """
+    responses = _overpass_module()._download_overpass_network(polygon, network_type, None)
+    bidirectional = network_type in ox.settings.bidirectional_network_types
+    # OSMnx has no public way to build a graph from responses either
+    graph = ox.graph._create_graph(responses, bidirectional)
+    graph = ox.truncate.truncate_graph_polygon(graph, polygon)
+    if not retain_all:
+        graph = ox.truncate.largest_component(graph, strongly=False)
+    return graph
+
+
+def build_graph(sources: Iterable[str], network_type: str,
+                polygon=None, retain_all: bool = False) -> nx.MultiDiGraph:
+    """
+    Build a projected, unsimplified street graph from Overpass response files.
+
+    Nodes and ways are streamed from each file; coordinates and edge
+    endpoints are collected in typed arrays, projected to UTM in one
+    vectorized call and only then turned into a NetworkX graph. Nodes get
+    'x'/'y' (UTM) and 'lat'/'lon' attributes and edges get great-circle
+    'length', like a projected OSMnx graph.
+
+    Args:
+        sources: Paths of Overpass JSON responses (e.g. OSMnx cache files)
+        network_type: OSMnx network type, for oneway handling
+        polygon: Optional lat/lon polygon to truncate the graph to
+        retain_all: If True, keep every connected component
+
+    Returns:
+        Largest weakly connected component of the street network (or the
+        whole network with retain_all)
+    """
+    bidirectional = network_type in ox.settings.bidirectional_network_types
+    useful_tags = ox.settings.useful_tags_way
+
+    node_ids = array('q')
+    lats = array('d')
+    lons = array('d')
+    edge_u = array('q')
+    edge_v = array('q')
+    edge_way = array('q')
+    edge_reversed = array('b')
+    ways = []
+    seen_ways = set()
+
+    for source in sources:
+        with open(source, 'r', encoding='utf-8') as fp:
+            for element in iter_elements(fp):
+                kind = element.get('type')
+                if kind == 'node':
+                    node_ids.append(element['id'])
+                    lats.append(element['lat'])
+                    lons.append(element['lon'])
+                elif kind == 'way' and element['id'] not in seen_ways:
+                    seen_ways.add(element['id'])
+                    tags = element.get('tags', {})
+                    attrs = {'osmid': element['id']}
+                    for tag in useful_tags:
+                        if tag in tags:
+                            attrs[tag] = sys.intern(tags[tag])
+                    refs = [ref for ref, _ in groupby(element['nodes'])]
+                    oneway = _is_one_way(attrs, bidirectional)
+                    if oneway and attrs.get('oneway') in REVERSED_VALUES:
+                        refs.reverse()
+                    attrs['oneway'] = oneway
+
+                    way_index = len(ways)
+                    ways.append(attrs)
+                    for a, b in zip(refs[:-1], refs[1:]):
+                        edge_u.append(a)
+                        edge_v.append(b)
+                        edge_way.append(way_index)
+                        edge_reversed.append(0)
+                    if not oneway:
+                        for a, b in zip(refs[:-1], refs[1:]):
+                            edge_u.append(b)
+                            edge_v.append(a)
+                            edge_way.append(way_index)
+                            edge_reversed.append(1)
+
+    if not ways:
+        raise ValueError("No street data in Overpass response(s)")
+
+    ids, first = np.unique(np.frombuffer(node_ids, dtype=np.int64), return_index=True)
+    lat = np.frombuffer(lats, dtype=np.float64)[first]
+    lon = np.frombuffer(lons, dtype=np.float64)[first]
+    del node_ids, lats, lons
+
+    u = np.frombuffer(edge_u, dtype=np.int64)
+    v = np.frombuffer(edge_v, dtype=np.int64)
+    ui = np.searchsorted(ids, u).clip(max=len(ids) - 1)
+    vi = np.searchsorted(ids, v).clip(max=len(ids) - 1)
+    keep = (ids[ui] == u) & (ids[vi] == v)
+    if polygon is not None:
+        inside = shapely.contains_xy(polygon, lon, lat)
+        keep &= inside[ui] & inside[vi]
+    ui, vi = ui[keep], vi[keep]
+    way_index = np.frombuffer(edge_way, dtype=np.int64)[keep]
+    is_reversed = np.frombuffer(edge_reversed, dtype=np.int8)[keep]
+
+    crs = _utm_crs(lon, lat)
+    transformer = Transformer.from_crs('EPSG:4326', crs, always_xy=True)
+    x, y = transformer.transform(lon, lat)
+    lengths = ox.distance.great_circle(lat[ui], lon[ui], lat[vi], lon[vi])
+
+    used = np.unique(np.concatenate([ui, vi]))
+    graph = nx.MultiDiGraph(crs=crs.to_string(), created_with='overpass_stream')
+    graph.add_nodes_from(
+        (node, {'y': yy, 'x': xx, 'lat': la, 'lon': lo})
+        for node, yy, xx, la, lo in zip(ids[used].tolist(), y[used].tolist(), x[used].tolist(),
+                                        lat[used].tolist(), lon[used].tolist())
+    )
+    graph.add_edges_from(
+        (a, b, {**ways[w], 'reversed': bool(r), 'length': length})
+        for a, b, w, r, length in zip(ids[ui].tolist(), ids[vi].tolist(), way_index.tolist(),
+                                      is_reversed.tolist(), lengths.tolist())
+    )
+
+    if not retain_all:
+        graph = ox.truncate.largest_component(graph, strongly=False)
+    logger.info(f"Built graph from stream: {graph.number_of_nodes()} nodes, "
+                f"{graph.number_of_edges()} edges")
+    return graph
+
+
+def _is_one_way(attrs: Dict[str, Any], bidirectional: bool) -> bool:
+    """Determine if a way allows travel in one direction only (OSMnx rules)."""
+    if ox.settings.all_oneway:
+        return True
+    if bidirectional:
+        return False
+    return attrs.get('oneway') in ONEWAY_VALUES or attrs.get('junction') == 'roundabout'
+
+
+def _utm_crs(lon: np.ndarray, lat: np.ndarray) -> CRS:
+    """Pick the UTM CRS covering the data, as GeoPandas' estimate_utm_crs does."""
+    infos = query_utm_crs_info(
+        datum_name='WGS 84',
+        area_of_interest=AreaOfInterest(
+            west_lon_degree=float(lon.min()), south_lat_degree=float(lat.min()),
+            east_lon_degree=float(lon.max()), north_lat_degree=float(lat.max())
+        )
+    )
+    # Prefer the zone containing the center of the data
+    center = (float(lon.min() + lon.max()) / 2, float(lat.min() + lat.max()) / 2)
+    for info in infos:
+        box = info.area_of_use
+        if box.west <= center[0] <= box.east and box.south <= center[1] <= box.north:
+            return CRS.from_epsg(info.code)
+    return CRS.from_epsg(infos[0].code)
+
+
+def _overpass_module():
+    """
+    OSMnx's private Overpass query module.
+
+    OSMnx has no public API for its query strings, and queries must match
+    its own for cache files to be shared. All uses of the private module go
+    through here, so an OSMnx upgrade that changes it needs fixing in one
+    place only.
+    """
+    from osmnx import _overpass
+    return _overpass
+
+
+def _has_remark(path: str, tail_bytes: int = 4096) -> bool:
+    """Check the end of a response file for an Overpass error remark."""
+    with open(path, 'rb') as f:
+        f.seek(max(0, os.path.getsize(path) - tail_bytes))
+        return b'"remark"' in f.read()
@@ -0,0 +1,171 @@
+"""
+Multi-resolution route geometry for map display.
+
+Route GeoJSON carries every OSM vertex of every traversal, which the web map
+does not need at city zoom. simplify_lines() runs Douglas-Peucker over many
+polylines stored in one flat coordinate array (a route's per-edge lines):
+instead of recursing line by line, every pass measures all open ranges of
+all lines at once and splits those whose farthest vertex is beyond the
+tolerance. RouteLevels precomputes keep masks at a few tolerances when a
+route is planned, and picks one for a requested tolerance or map zoom.
+Per-segment output simplifies each traversed edge on its own so every
+segment keeps its endpoints; the single route line is simplified as one
+polyline.
+"""
+
+import math
+import numpy as np
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+
+from edge_geometry import concat_ranges
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tolerances (m) precomputed for each planned route
+DEFAULT_TOLERANCES = (2.0, 8.0, 32.0, 128.0)
+
+# Web Mercator ground resolution at zoom 0 on the equator (m per 256 px tile pixel)
+METERS_PER_PIXEL_Z0 = 156543.03
+
+# Equirectangular scale of one degree (m)
+METERS_PER_DEGREE = 111320.0
+
+
+def simplify_lines(points: np.ndarray, offsets: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify polylines stored back to back in one array (Douglas-Peucker).
+
+    Args:
+        points: (n, 2) lon/lat vertices of all lines
+        offsets: Line boundaries; line i is points[offsets[i]:offsets[i + 1]]
+        tolerance: Largest distance (m) a dropped vertex may be from the
+            simplified line
+
+    Returns:
+        Boolean mask of vertices to keep; the first and last vertex of every
+        line are always kept
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    if not len(points):
+        return keep
+    xy = _local_meters(points)
+
+    starts = np.asarray(offsets[:-1], dtype=np.int64)
+    ends = np.asarray(offsets[1:], dtype=np.int64) - 1
+    lines = ends >= starts
+    keep[starts[lines]] = True
+    keep[ends[lines]] = True
+
+    # Ranges with interior vertices still to be checked
+    open_ranges = ends - starts > 1
+    starts, ends = starts[open_ranges], ends[open_ranges]
+    while len(starts):
+        counts = ends - starts - 1
+        interior = concat_ranges(starts + 1, counts)
+        owner = np.repeat(np.arange(len(starts)), counts)
+        distance = _segment_distance(xy[interior], xy[starts][owner], xy[ends][owner])
+
+        # Farthest interior vertex of each range
+        group_starts = np.cumsum(counts) - counts
+        farthest = np.maximum.reduceat(distance, group_starts)
+        at_max = np.flatnonzero(distance == farthest[owner])
+        _, first = np.unique(owner[at_max], return_index=True)
+        split_at = interior[at_max[first]]
+
+        split = farthest > tolerance
+        keep[split_at[split]] = True
+        starts = np.concatenate([starts[split], split_at[split]])
+        ends = np.concatenate([split_at[split], ends[split]])
+        remaining = ends - starts > 1
+        starts, ends = starts[remaining], ends[remaining]
+    return keep
+
+
+def tolerance_for_zoom(zoom: float, latitude: float) -> float:
+    """
+    Tolerance (m) of about half a screen pixel at a Web Mercator zoom level.
+
+    Args:
+        zoom: Map zoom level
+        latitude: Latitude the map is centered on
+
+    Returns:
+        Tolerance in meters
+    """
+    return 0.5 * METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+class RouteLevels:
+    """Keep masks of a route's line at several simplification tolerances."""
+
+    def __init__(self, points: np.ndarray, point_edges: np.ndarray, n_edges: int,
+                 tolerances: Iterable[float] = DEFAULT_TOLERANCES):
+        """
+        Simplify a route line at each tolerance, per segment and as a whole.
+
+        Args:
+            points: (n, 2) lon/lat route line
+            point_edges: Route position of each point
+            n_edges: Number of route edges
+            tolerances: Tolerances (m) to precompute
+        """
+        self.n_points = len(points)
+        counts = np.bincount(point_edges, minlength=n_edges)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.latitude = float(np.mean(points[:, 1])) if len(points) else 0.0
+        whole = np.array([0, len(points)])
+        tolerances = sorted(float(t) for t in tolerances)
+        # Every traversed edge on its own, so segment endpoints survive
+        self.masks: Dict[float, np.ndarray] = {
+            t: simplify_lines(points, offsets, t) for t in tolerances
+        }
+        self.line_masks: Dict[float, np.ndarray] = {
+            t: simplify_lines(points, whole, t) for t in tolerances
+        }
+        kept = ', '.join(f"{t:g} m: {int(self.masks[t].sum())}/{int(self.line_masks[t].sum())}"
+                         for t in tolerances)
+        logger.info(f"Route simplified from {self.n_points} points "
+                    f"(per segment/whole line {kept})")
+
+    def mask(self, tolerance: Optional[float] = None, zoom: Optional[float] = None,
+             segments: bool = True) -> Tuple[float, Optional[np.ndarray]]:
+        """
+        Pick the coarsest precomputed level within a tolerance or zoom.
+
+        Args:
+            tolerance: Largest acceptable tolerance (m)
+            zoom: Map zoom level, used when tolerance is not given
+            segments: If True, the level for per-segment output, otherwise
+                the level for the single route line
+
+        Returns:
+            Tuple of (tolerance used, keep mask), or (0.0, None) for full
+            resolution
+        """
+        if tolerance is None and zoom is not None:
+            tolerance = tolerance_for_zoom(zoom, self.latitude)
+        if not tolerance:
+            return 0.0, None
+        levels = [t for t in self.masks if t <= tolerance]
+        if not levels:
+            return 0.0, None
+        masks = self.masks if segments else self.line_masks
+        return levels[-1], masks[levels[-1]]
+
+
+def _local_meters(points: np.ndarray) -> np.ndarray:
+    """Project lon/lat to meters with an equirectangular approximation."""
+    scale_x = METERS_PER_DEGREE * math.cos(math.radians(float(np.mean(points[:, 1]))))
+    return np.column_stack([points[:, 0] * scale_x, points[:, 1] * METERS_PER_DEGREE])
+
+
+def _segment_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance from each point p to the segment from a to b."""
+    ab = b - a
+    length_sq = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', p - a, ab) / np.where(length_sq > 0, length_sq, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = a + ab * t[:, None]
+    return np.hypot(p[:, 0] - closest[:, 0], p[:, 1] - closest[:, 1])
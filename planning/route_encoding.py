@@ -0,0 +1,323 @@
+"""
+Compact route payloads for the web map.
+
+The segmented route GeoJSON repeats a Feature wrapper, six properties and
+a nested [lon, lat] array of decimal text per point, which makes long
+routes large to send and slow to parse. RouteColumns gathers the same data
+as flat columns - the route line, per-segment point offsets, traversal
+numbers and street-name codes into a name table - and writes it either as
+JSON with the line as a Google encoded polyline, or as a little-endian
+binary block of quantized, delta-encoded coordinates that a browser reads
+straight into typed arrays. Columns are computed once per route, so any
+window of segments can be written in time proportional to its size.
+
+Binary layout (all little-endian, every column starts 4-byte aligned):
+    header      MAGIC, uint16 version, uint16 precision, uint32 n_points,
+                n_segments, first_segment, total_segments, unique_edges,
+                max_traversals, names_bytes
+    coords      int32[2 * n_points], interleaved lon/lat times 10**precision;
+                the first pair is absolute, the rest are deltas
+    offsets     uint32[n_segments + 1], segment i is points offsets[i]:offsets[i + 1]
+    name_codes  int32[n_segments], index into names or -1
+    traversals  uint16[n_segments], padded to 4 bytes
+    names       UTF-8 JSON array of the window's street names
+"""
+
+import json
+import struct
+import numpy as np
+from typing import Hashable, List, Optional, Tuple
+import logging
+
+from edge_geometry import EdgeGeometryTable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Payload formats served next to GeoJSON, by name and media type
+GEOJSON_MEDIA_TYPE = 'application/geo+json'
+POLYLINE_MEDIA_TYPE = 'application/vnd.streetview.route+json'
+BINARY_MEDIA_TYPE = 'application/vnd.streetview.route'
+MEDIA_TYPES = {
+    'geojson': GEOJSON_MEDIA_TYPE,
+    'polyline': POLYLINE_MEDIA_TYPE,
+    'binary': BINARY_MEDIA_TYPE,
+}
+
+MAGIC = b'SVRT'
+BINARY_VERSION = 2
+HEADER = struct.Struct('<4sHHIIIIIII')
+
+# Decimal places kept by each format (5 is about 1 m, 6 about 0.1 m)
+POLYLINE_PRECISION = 5
+BINARY_PRECISION = 6
+
+
+class RouteColumns:
+    """A route's line and per-segment metadata as flat arrays (its segment index)."""
+
+    def __init__(self, table: EdgeGeometryTable, route: List[Tuple[Hashable, Hashable]],
+                 keep: Optional[np.ndarray] = None, route_name: str = "StreetView Route"):
+        """
+        Gather the columns of a route.
+
+        Segments are the route's edges in order. As in the segmented
+        GeoJSON, an edge's traversal number counts passes over the street in
+        either direction.
+
+        Args:
+            table: Geometry table of the route's graph
+            route: List of edge tuples (node_from, node_to)
+            keep: Optional mask over the route's points, e.g. a simplification
+                level from polyline_simplify.RouteLevels
+            route_name: Name for the route
+        """
+        self.route_name = route_name
+        u_idx, v_idx, e_idx = table.route_indices(route)
+        # Edge pair of each traversal in the table, -1 for pairs not in the graph
+        self.edge_indices = e_idx.astype(np.int32)
+        points, point_edges, _ = table.route_points(u_idx, v_idx, e_idx)
+        if keep is not None:
+            points, point_edges = points[keep], point_edges[keep]
+        self.points = points
+        counts = np.bincount(point_edges, minlength=len(route))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.uint32)
+
+        # Traversal number: rank of each pass among passes over the same street
+        pair = np.minimum(u_idx, v_idx) * len(table.node_ids) + np.maximum(u_idx, v_idx)
+        order = np.argsort(pair, kind='stable')
+        sorted_pair = pair[order]
+        first = np.concatenate([[True], sorted_pair[1:] != sorted_pair[:-1]]) \
+            if len(pair) else np.zeros(0, dtype=bool)
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(pair)), 0))
+        self.traversals = np.empty(len(pair), dtype=np.uint16)
+        self.traversals[order] = np.arange(len(pair)) - group_start + 1
+        self.unique_edges = int(first.sum())
+        self.max_traversals = int(self.traversals.max()) if len(pair) else 0
+
+        # Street names, coded per distinct edge pair
+        self.names: list = []
+        codes = {}
+        edges, inverse = np.unique(e_idx, return_inverse=True)
+        edge_codes = np.full(len(edges), -1, dtype=np.int32)
+        for i, edge in enumerate(edges.tolist()):
+            if edge >= 0 and table.has_geometry[edge] and table.edge_names[edge] is not None:
+                name = table.edge_names[edge]
+                # OSM ways with several names carry a list
+                key = tuple(name) if isinstance(name, list) else name
+                if key not in codes:
+                    codes[key] = len(self.names)
+                    self.names.append(name)
+                edge_codes[i] = codes[key]
+        self.name_codes = edge_codes[inverse.ravel()]
+
+    @property
+    def n_segments(self) -> int:
+        """Number of route edges."""
+        return len(self.traversals)
+
+    def properties(self, start: int = 0, stop: Optional[int] = None) -> dict:
+        """
+        Route summary, as in the segmented GeoJSON's collection properties.
+
+        Args:
+            start: First segment of the window described
+            stop: Segment after the window (default: end of the route)
+
+        Returns:
+            Dict of route and window counts
+        """
+        start, stop = self.clip(start, stop)
+        return {
+            'name': self.route_name,
+            'total_points': len(self.points),
+            'total_edges': self.n_segments,
+            'unique_edges': self.unique_edges,
+            'max_traversals': self.max_traversals,
+            'first_segment': start,
+            'window_segments': stop - start,
+        }
+
+    def clip(self, start: int = 0, stop: Optional[int] = None) -> Tuple[int, int]:
+        """Clip a segment window to the route."""
+        stop = self.n_segments if stop is None else min(stop, self.n_segments)
+        return min(max(start, 0), stop), stop
+
+    def window(self, start: int = 0, stop: Optional[int] = None,
+               keep: Optional[np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Slice the columns to a window of segments.
+
+        Args:
+            start: First segment
+            stop: Segment after the window (default: end of the route)
+            keep: Optional mask over the whole route's points, e.g. a
+                simplification level from polyline_simplify.RouteLevels
+
+        Returns:
+            Tuple of (points, offsets from 0, traversals, name codes)
+        """
+        start, stop = self.clip(start, stop)
+        first, last = int(self.offsets[start]), int(self.offsets[stop])
+        points = self.points[first:last]
+        counts = np.diff(self.offsets[start:stop + 1].astype(np.int64))
+        if keep is not None:
+            window_keep = keep[first:last]
+            owner = np.repeat(np.arange(stop - start), counts)
+            points = points[window_keep]
+            counts = np.bincount(owner[window_keep], minlength=stop - start)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.uint32)
+        return points, offsets, self.traversals[start:stop], self.name_codes[start:stop]
+
+    def to_polyline_json(self, precision: int = POLYLINE_PRECISION, start: int = 0,
+                         stop: Optional[int] = None,
+                         keep: Optional[np.ndarray] = None) -> str:
+        """
+        Encode the route as JSON with the line as a Google encoded polyline.
+
+        Args:
+            precision: Decimal places of coordinates
+            start: First segment
+            stop: Segment after the window (default: end of the route)
+            keep: Optional mask over the route's points
+
+        Returns:
+            Compact JSON text
+        """
+        points, offsets, traversals, name_codes = self.window(start, stop, keep)
+        name_codes, names = self._window_names(name_codes)
+        return json.dumps({
+            'type': 'StreetViewRoute',
+            'encoding': 'polyline',
+            'precision': precision,
+            'line': encode_polyline(points, precision),
+            'offsets': offsets.tolist(),
+            'traversals': traversals.tolist(),
+            'name_codes': name_codes.tolist(),
+            'names': names,
+            'properties': self.properties(start, stop),
+        }, separators=(',', ':'))
+
+    def to_binary(self, precision: int = BINARY_PRECISION, start: int = 0,
+                  stop: Optional[int] = None, keep: Optional[np.ndarray] = None) -> bytes:
+        """
+        Encode the route in the binary columnar layout.
+
+        Args:
+            precision: Decimal places of coordinates
+            start: First segment
+            stop: Segment after the window (default: end of the route)
+            keep: Optional mask over the route's points
+
+        Returns:
+            Binary payload
+        """
+        points, offsets, traversals, name_codes = self.window(start, stop, keep)
+        name_codes, names = self._window_names(name_codes)
+        start, _ = self.clip(start, stop)
+        names = json.dumps(names, separators=(',', ':')).encode('utf-8')
+        header = HEADER.pack(MAGIC, BINARY_VERSION, precision, len(points),
+                             len(traversals), start, self.n_segments, self.unique_edges,
+                             self.max_traversals, len(names))
+        quantized = _quantize(points, precision)
+        deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        traversals = traversals.astype('<u2').tobytes()
+        return b''.join([
+            header,
+            deltas.astype('<i4').tobytes(),
+            offsets.astype('<u4').tobytes(),
+            name_codes.astype('<i4').tobytes(),
+            traversals,
+            b'\0' * (-len(traversals) % 4),
+            names,
+        ])
+
+    def _window_names(self, name_codes: np.ndarray) -> Tuple[np.ndarray, list]:
+        """Recode a window's street names into a table of only the names it uses."""
+        if len(name_codes) == self.n_segments:
+            return name_codes, self.names
+        used, codes = np.unique(name_codes, return_inverse=True)
+        codes = codes.ravel().astype(np.int32)
+        if len(used) and used[0] < 0:
+            used, codes = used[1:], codes - 1
+        return codes, [self.names[i] for i in used.tolist()]
+
+
+def decode_binary(payload: bytes) -> dict:
+    """
+    Read a binary route payload back into arrays.
+
+    Args:
+        payload: Output of RouteColumns.to_binary()
+
+    Returns:
+        Dict with points ((n, 2) lon/lat), offsets, name_codes, traversals,
+        names and the header counts
+
+    Raises:
+        ValueError: If the payload is not a route payload of this version
+    """
+    magic, version, precision, n_points, n_segments, first_segment, total_segments, \
+        unique_edges, max_traversals, names_bytes = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Not a version {BINARY_VERSION} route payload")
+    position = HEADER.size
+
+    def column(dtype: str, count: int) -> np.ndarray:
+        nonlocal position
+        values = np.frombuffer(payload, dtype=dtype, count=count, offset=position)
+        position += values.nbytes
+        return values
+
+    deltas = column('<i4', 2 * n_points).reshape(-1, 2)
+    offsets = column('<u4', n_segments + 1)
+    name_codes = column('<i4', n_segments)
+    traversals = column('<u2', n_segments)
+    position += -position % 4
+    names = json.loads(payload[position:position + names_bytes].decode('utf-8'))
+    return {
+        'points': np.cumsum(deltas, axis=0) / 10 ** precision,
+        'offsets': offsets,
+        'name_codes': name_codes,
+        'traversals': traversals,
+        'names': names,
+        'first_segment': first_segment,
+        'total_segments': total_segments,
+        'unique_edges': unique_edges,
+        'max_traversals': max_traversals,
+    }
+
+
+def encode_polyline(points: np.ndarray, precision: int = POLYLINE_PRECISION) -> str:
+    """
+    Encode a lon/lat line with Google's encoded polyline algorithm.
+
+    Args:
+        points: (n, 2) lon/lat points
+        precision: Decimal places kept (5 is the standard polyline format)
+
+    Returns:
+        Encoded polyline, latitude first as the format specifies
+    """
+    if not len(points):
+        return ''
+    quantized = _quantize(np.asarray(points)[:, ::-1], precision)
+    values = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(values < 0, ~(values << 1), values << 1)
+
+    # Five-bit chunks, least significant first, with a continuation bit on
+    # all but the last chunk of each value
+    shifts = 5 * np.arange(7)
+    remaining = values[:, None] >> shifts
+    present = remaining > 0
+    present[:, 0] = True
+    more = np.zeros_like(present)
+    more[:, :-1] = present[:, 1:]
+    chunks = (remaining & 0x1f) | np.where(more, 0x20, 0)
+    return (chunks[present] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def _quantize(points: np.ndarray, precision: int) -> np.ndarray:
+    """Round coordinates to integers at a number of decimal places."""
+    return np.round(np.asarray(points, dtype=np.float64) * 10 ** precision).astype(np.int64)
@@ -2,19 +2,55 @@
 Module for exporting routes to various formats (GPX, KML, GeoJSON).
 """
 
-import gpxpy
-import gpxpy.gpx
 import json
 import osmnx as ox
 import networkx as nx
-from typing import List, Tuple, Optional
+from typing import BinaryIO, Iterable, Iterator, List, Tuple, Optional, TextIO, Union
+from contextlib import contextmanager
+import io
 from datetime import datetime
 import logging
+import numpy as np
+from edge_geometry import EdgeGeometryTable, is_projected
+from geojson_writer import DEFAULT_PRECISION, iter_route_geojson, write_route_geojson
+from gpx_writer import write_route_gpx
+from html_map import HTML_TOLERANCE, render_route_html
+from kml_writer import write_route_kml, write_route_kmz
+from polyline_simplify import DEFAULT_TOLERANCES, RouteLevels
+from route_encoding import RouteColumns
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Export targets: a file path or a writable text buffer
+Output = Union[str, TextIO]
+
+# Export formats and the methods writing them
+EXPORT_METHODS = {
+    'gpx': 'export_to_gpx',
+    'kml': 'export_to_kml',
+    'geojson': 'export_to_geojson',
+    'csv': 'export_to_csv',
+    'html': 'export_to_html',
+}
+
+
+@contextmanager
+def _output(output_file: Output, newline: Optional[str] = None) -> Iterator[TextIO]:
+    """Open a path for writing, or pass a text buffer through without closing it."""
+    if hasattr(output_file, 'write'):
+        yield output_file
+    else:
+        with open(output_file, 'w', newline=newline) as f:
+            yield f
+
+
+def _describe(output_file: Output) -> str:
+    """Name of an export target for log messages."""
+    return output_file if isinstance(output_file, str) else 'in-memory buffer'
+
+
 class RouteExporter:
     """Export routes to various formats for navigation and visualization."""
     
@@ -23,302 +59,179 @@ class RouteExporter:
         Initialize route exporter.
         
         Args:
-            graph: NetworkX graph with geographic data
+            graph: NetworkX graph with geographic data, or a read-only
+                graph_arrays.ArrayGraph snapshot
         """
         self.graph = graph
+        self._geometry_table = None
+    
+    def geometry_table(self) -> EdgeGeometryTable:
+        """
+        Get the lon/lat geometry table of the graph, built on first use.
+        
+        Returns:
+            EdgeGeometryTable shared by all export formats
+        """
+        if self._geometry_table is None:
+            self._geometry_table = EdgeGeometryTable(self.graph)
+        return self._geometry_table
+    
+    def _route_points(self, table: EdgeGeometryTable,
+                      route: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gather the lon/lat line of a route from the geometry table.
+        
+        Args:
+            table: Geometry table of the graph
+            route: List of edge tuples (node_from, node_to)
+            
+        Returns:
+            Tuple of (points as an (n, 2) lon/lat array, route position of
+            each point)
+        """
+        points, point_edges, _ = table.route_points(*table.route_indices(route))
+        return points, point_edges
         
     def export_to_gpx(self, route: List[Tuple[int, int]], 
-                      output_file: str,
-                      route_name: str = "StreetView Route") -> None:
+                      output_file: Output,
+                      route_name: str = "StreetView Route",
+                      max_segment_points: Optional[int] = None,
+                      include_turns: bool = False) -> None:
         """
         Export route to GPX format.
         
         Args:
             route: List of edge tuples (node_from, node_to)
-            output_file: Path to output GPX file
+            output_file: Path to output GPX file, or a text buffer to write to
             route_name: Name for the route
+            max_segment_points: If given, split the track into segments of at
+                most this many points (see gpx_writer)
+            include_turns: If True, add a route with a point per turn
         """
-        logger.info(f"Exporting route to GPX: {output_file}")
-        
-        # Create GPX object
-        gpx = gpxpy.gpx.GPX()
-        
-        # Create GPX track
-        gpx_track = gpxpy.gpx.GPXTrack()
-        gpx_track.name = route_name
-        gpx.tracks.append(gpx_track)
-        
-        # Create GPX segment
-        gpx_segment = gpxpy.gpx.GPXTrackSegment()
-        gpx_track.segments.append(gpx_segment)
-        
-        # Add points from route
-        added_nodes = set()
-        for u, v in route:
-            # Add starting node
-            if u not in added_nodes:
-                node_data = self.graph.nodes[u]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon))
-                    added_nodes.add(u)
-            
-            # Add ending node
-            if v not in added_nodes:
-                node_data = self.graph.nodes[v]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon))
-                    added_nodes.add(v)
-            
-            # Add intermediate points along edge if available
-            if self.graph.has_edge(u, v):
-                edge_data = self.graph[u][v][0]  # Get first edge if multiple
-                if 'geometry' in edge_data:
-                    # Extract intermediate points from geometry
-                    try:
-                        coords = list(edge_data['geometry'].coords)
-                        for lon, lat in coords[1:-1]:  # Skip first and last (already added)
-                            gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon))
-                    except:
-                        pass
+        logger.info(f"Exporting route to GPX: {_describe(output_file)}")
         
-        # Write to file
-        with open(output_file, 'w') as f:
-            f.write(gpx.to_xml())
+        # Points are streamed from the geometry table in chunks
+        with _output(output_file) as f:
+            size = write_route_gpx(self.geometry_table(), route, f, route_name=route_name,
+                                   max_segment_points=max_segment_points,
+                                   include_turns=include_turns)
         
-        logger.info(f"GPX file saved with {len(gpx_segment.points)} points")
+        logger.info(f"GPX file saved ({size / 1e3:.0f} kB)")
     
     def export_to_kml(self, route: List[Tuple[int, int]], 
-                      output_file: str,
-                      route_name: str = "StreetView Route") -> None:
+                      output_file: Output,
+                      route_name: str = "StreetView Route",
+                      placemarks: str = 'route') -> None:
         """
         Export route to KML format.
         
         Args:
             route: List of edge tuples (node_from, node_to)
-            output_file: Path to output KML file
+            output_file: Path to output KML file, or a text buffer to write to
             route_name: Name for the route
+            placemarks: 'route' for a single placemark through the route's
+                nodes, 'chunk' for one per chunk of street geometry, or
+                'segment' for one per traversed street (see kml_writer)
         """
-        logger.info(f"Exporting route to KML: {output_file}")
-        
-        kml_template = """<?xml version="1.0" encoding="UTF-8"?>
-<kml xmlns="http://www.opengis.net/kml/2.2">
-  <Document>
-    <name>{name}</name>
-    <description>Route generated for street coverage</description>
-    <Style id="route">
-      <LineStyle>
-        <color>ff0000ff</color>
-        <width>4</width>
-      </LineStyle>
-    </Style>
-    <Placemark>
-      <name>{name}</name>
-      <styleUrl>#route</styleUrl>
-      <LineString>
-        <coordinates>
-{coordinates}
-        </coordinates>
-      </LineString>
-    </Placemark>
-  </Document>
-</kml>"""
-        
-        # Build coordinate string
-        coords = []
-        added_nodes = set()
-        
-        for u, v in route:
-            # Add starting node
-            if u not in added_nodes:
-                node_data = self.graph.nodes[u]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    coords.append(f"          {lon},{lat},0")
-                    added_nodes.add(u)
-            
-            # Add ending node
-            if v not in added_nodes:
-                node_data = self.graph.nodes[v]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    coords.append(f"          {lon},{lat},0")
-                    added_nodes.add(v)
-        
-        # Write KML file
-        kml_content = kml_template.format(
-            name=route_name,
-            coordinates="\n".join(coords)
-        )
-        
-        with open(output_file, 'w') as f:
-            f.write(kml_content)
-        
-        logger.info(f"KML file saved with {len(coords)} points")
+        logger.info(f"Exporting route to KML: {_describe(output_file)}")
+        
+        with _output(output_file) as f:
+            size = write_route_kml(self.geometry_table(), route, f, route_name=route_name,
+                                   placemarks=placemarks)
+        
+        logger.info(f"KML file saved ({size / 1e3:.0f} kB)")
     
     def export_to_geojson(self, route: List[Tuple[int, int]], 
-                          output_file: str,
+                          output_file: Output,
                           route_name: str = "StreetView Route",
-                          include_segments: bool = False) -> None:
+                          include_segments: bool = False,
+                          compact: bool = False,
+                          precision: int = DEFAULT_PRECISION) -> None:
         """
         Export route to GeoJSON format with street geometry.
         
         Args:
             route: List of edge tuples (node_from, node_to)
-            output_file: Path to output GeoJSON file
+            output_file: Path to output GeoJSON file, or a text buffer to write to
             route_name: Name for the route
             include_segments: If True, export as separate segments with traversal metadata
+            compact: If True, stream the file without indentation and with
+                fixed coordinate precision (see geojson_writer)
+            precision: Decimal places of coordinates in compact output
+        """
+        logger.info(f"Exporting route to GeoJSON: {_describe(output_file)}")
+        
+        if compact:
+            with _output(output_file) as f:
+                size = write_route_geojson(self.geometry_table(), route, f, route_name=route_name,
+                                           include_segments=include_segments,
+                                           precision=precision)
+            logger.info(f"Compact GeoJSON file saved ({size / 1e3:.0f} kB)")
+            return
+        
+        geojson = self.geojson_data(route, route_name, include_segments)
+        
+        # Write to file
+        with _output(output_file) as f:
+            json.dump(geojson, f, indent=2)
+        
+        logger.info(f"GeoJSON saved with {len(geojson['features'])} feature(s)")
+    
+    def geojson_data(self, route: List[Tuple[int, int]],
+                     route_name: str = "StreetView Route",
+                     include_segments: bool = False,
+                     keep: Optional[np.ndarray] = None) -> dict:
         """
-        logger.info(f"Exporting route to GeoJSON: {output_file}")
+        Build the GeoJSON FeatureCollection of a route without writing it.
         
-        # Check if graph is projected and create transformer if needed
-        crs = self.graph.graph.get('crs', 'EPSG:4326')
-        transformer = None
-        if crs != 'EPSG:4326' and crs != 'epsg:4326':
-            from pyproj import Transformer
-            transformer = Transformer.from_crs(crs, 'EPSG:4326', always_xy=True)
-            logger.info(f"Graph is projected ({crs}), will transform coordinates to lat/lon")
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            route_name: Name for the route
+            include_segments: If True, separate segments with traversal metadata
+            keep: Optional mask over the route's points, e.g. a simplification
+                level from route_levels()
+            
+        Returns:
+            FeatureCollection dict, as written by export_to_geojson
+        """
+        # Street geometry and node positions, in lon/lat
+        table = self.geometry_table()
+        if is_projected(self.graph):
+            logger.info(f"Graph is projected ({self.graph.graph['crs']}), "
+                        "using coordinates transformed to lat/lon")
+        points, point_edges = self._route_points(table, route)
+        if keep is not None:
+            points, point_edges = points[keep], point_edges[keep]
+        coordinates = points.tolist()
         
         # Track edge traversals for segment analysis
         edge_traversals = {}  # (u, v) -> [traversal_indices]
         segments = []  # List of segments with metadata
         
-        # Build coordinate list using street geometry
-        coordinates = []
-        last_node = None
-        
-        for idx, (u, v) in enumerate(route):
-            # Track traversals
-            edge_key = (min(u, v), max(u, v))  # Normalize edge direction
-            if edge_key not in edge_traversals:
-                edge_traversals[edge_key] = []
-            edge_traversals[edge_key].append(idx)
-            traversal_count = len(edge_traversals[edge_key])
-            
-            # Store segment coordinates
-            segment_coords = []
-            # Try to get edge geometry for actual street path
-            if self.graph.has_edge(u, v):
-                edge_data = self.graph[u][v]
-                # Handle multi-edge case
-                if isinstance(edge_data, dict) and 'geometry' in edge_data:
-                    geometry = edge_data['geometry']
-                else:
-                    # Try to find an edge with geometry
-                    geometry = None
-                    for key in edge_data:
-                        if 'geometry' in edge_data[key]:
-                            geometry = edge_data[key]['geometry']
-                            break
-                
-                # If we have geometry, use it
-                if geometry:
-                    try:
-                        # Get coordinates from the geometry
-                        edge_coords = list(geometry.coords)
-                        
-                        # Transform coordinates if graph is projected
-                        if transformer:
-                            transformed_coords = []
-                            for x, y in edge_coords:
-                                lon, lat = transformer.transform(x, y)
-                                transformed_coords.append((lon, lat))
-                            edge_coords = transformed_coords
-                        
-                        # Skip first point if it's the same as last point (avoid duplicates)
-                        if coordinates and len(edge_coords) > 0:
-                            last_point = coordinates[-1]
-                            first_point = [edge_coords[0][0], edge_coords[0][1]]
-                            if abs(last_point[0] - first_point[0]) < 0.000001 and abs(last_point[1] - first_point[1]) < 0.000001:
-                                edge_coords = edge_coords[1:]
-                        
-                        # Add all points from the geometry
-                        for lon, lat in edge_coords:
-                            coord = [lon, lat]
-                            coordinates.append(coord)
-                            segment_coords.append(coord)
-                        
-                        # Add segment metadata if requested
-                        if include_segments and segment_coords:
-                            segment_data = {
-                                'index': idx,
-                                'from_node': u,
-                                'to_node': v,
-                                'traversal_number': traversal_count,
-                                'edge_key': f"{edge_key[0]}_{edge_key[1]}",
-                                'coordinates': segment_coords[:]
-                            }
-                            # Get street name if available
-                            if isinstance(edge_data, dict):
-                                segment_data['street_name'] = edge_data.get('name', '')
-                            else:
-                                for key in edge_data:
-                                    if 'name' in edge_data[key]:
-                                        segment_data['street_name'] = edge_data[key]['name']
-                                        break
-                            segments.append(segment_data)
-                        continue
-                    except Exception as e:
-                        logger.debug(f"Could not extract geometry for edge {u}->{v}: {e}")
-            
-            # Fallback: use node coordinates if no geometry available
-            if last_node != u:
-                node_data = self.graph.nodes[u]
-                if transformer:
-                    # Graph is projected, use x/y and transform
-                    x = node_data.get('x')
-                    y = node_data.get('y')
-                    if x is not None and y is not None:
-                        lon, lat = transformer.transform(x, y)
-                        coord = [lon, lat]
-                        coordinates.append(coord)
-                        segment_coords.append(coord)
-                else:
-                    # Graph is not projected, use lat/lon directly
-                    lat = node_data.get('lat', node_data.get('y'))
-                    lon = node_data.get('lon', node_data.get('x'))
-                    if lat and lon:
-                        coord = [lon, lat]
-                        coordinates.append(coord)
-                        segment_coords.append(coord)
-            
-            node_data = self.graph.nodes[v]
-            if transformer:
-                # Graph is projected, use x/y and transform
-                x = node_data.get('x')
-                y = node_data.get('y')
-                if x is not None and y is not None:
-                    lon, lat = transformer.transform(x, y)
-                    coord = [lon, lat]
-                    coordinates.append(coord)
-                    segment_coords.append(coord)
-            else:
-                # Graph is not projected, use lat/lon directly
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    coord = [lon, lat]
-                    coordinates.append(coord)
-                    segment_coords.append(coord)
-            
-            # Add segment for fallback case
-            if include_segments and segment_coords:
-                segments.append({
+        if include_segments:
+            u_idx, v_idx, e_idx = table.route_indices(route)
+            counts = np.bincount(point_edges, minlength=len(route))
+            ends = np.cumsum(counts).tolist()
+            for idx, ((u, v), count, end) in enumerate(zip(route, counts.tolist(), ends)):
+                # Track traversals
+                edge_key = (min(u, v), max(u, v))  # Normalize edge direction
+                edge_traversals.setdefault(edge_key, []).append(idx)
+                if not count:
+                    continue
+                segment_data = {
                     'index': idx,
                     'from_node': u,
                     'to_node': v,
-                    'traversal_number': traversal_count,
+                    'traversal_number': len(edge_traversals[edge_key]),
                     'edge_key': f"{edge_key[0]}_{edge_key[1]}",
-                    'coordinates': segment_coords[:],
+                    'coordinates': coordinates[end - count:end],
                     'street_name': ''
-                })
-            
-            last_node = v
+                }
+                # Get street name if available (edges with geometry only)
+                edge = int(e_idx[idx])
+                if edge >= 0 and table.has_geometry[edge] and table.edge_names[edge] is not None:
+                    segment_data['street_name'] = table.edge_names[edge]
+                segments.append(segment_data)
         
         # Create GeoJSON structure
         if include_segments:
@@ -374,61 +287,205 @@ class RouteExporter:
                 ]
             }
         
-        # Write to file
-        with open(output_file, 'w') as f:
-            json.dump(geojson, f, indent=2)
+        return geojson
+    
+    def export_to_string(self, route: List[Tuple[int, int]], fmt: str, **options) -> str:
+        """
+        Export a route to a string instead of a file.
         
-        logger.info(f"GeoJSON file saved with {len(coordinates)} points")
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            fmt: One of 'gpx', 'kml', 'geojson', 'csv', 'html'
+            **options: Passed to the format's export method
+            
+        Returns:
+            The exported document
+            
+        Raises:
+            ValueError: If the format is not supported
+        """
+        if fmt not in EXPORT_METHODS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        buffer = io.StringIO()
+        getattr(self, EXPORT_METHODS[fmt])(route, buffer, **options)
+        return buffer.getvalue()
+    
+    def export_to_bytes(self, route: List[Tuple[int, int]], fmt: str, **options) -> bytes:
+        """
+        Export a route to bytes, for text and binary formats alike.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            fmt: One of the text formats of export_to_string(), or 'kmz'
+            **options: Passed to the format's export method
+            
+        Returns:
+            The exported document, UTF-8 encoded for text formats
+            
+        Raises:
+            ValueError: If the format is not supported
+        """
+        if fmt == 'kmz':
+            buffer = io.BytesIO()
+            self.export_to_kmz(route, buffer, **options)
+            return buffer.getvalue()
+        return self.export_to_string(route, fmt, **options).encode('utf-8')
+    
+    def export_to_kmz(self, route: List[Tuple[int, int]],
+                      output_file: Union[str, BinaryIO],
+                      route_name: str = "StreetView Route",
+                      placemarks: str = 'route') -> None:
+        """
+        Export route to KMZ, the zipped KML that Google Earth and most
+        navigation apps open directly.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            output_file: Path to output KMZ file, or a binary buffer to write to
+            route_name: Name for the route
+            placemarks: Placemark mode, as for export_to_kml()
+        """
+        logger.info(f"Exporting route to KMZ: {_describe(output_file)}")
+        
+        # The KML is compressed as it is written
+        size = write_route_kmz(self.geometry_table(), route, output_file,
+                               route_name=route_name, placemarks=placemarks)
+        
+        logger.info(f"KMZ file saved ({size / 1e3:.0f} kB of KML)")
+    
+    def iter_geojson(self, route: List[Tuple[int, int]],
+                     route_name: str = "StreetView Route",
+                     include_segments: bool = False,
+                     precision: int = DEFAULT_PRECISION,
+                     keep: Optional[np.ndarray] = None) -> Iterator[str]:
+        """
+        Generate compact GeoJSON for a route piece by piece, for streaming responses.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            route_name: Name for the route
+            include_segments: If True, one feature per segment with traversal metadata
+            precision: Decimal places of coordinates
+            keep: Optional mask over the route's points, e.g. a simplification
+                level from route_levels()
+            
+        Returns:
+            Iterator of JSON text pieces
+        """
+        return iter_route_geojson(self.geometry_table(), route, route_name=route_name,
+                                  include_segments=include_segments, precision=precision,
+                                  keep=keep)
+    
+    def route_levels(self, route: List[Tuple[int, int]],
+                     tolerances: Iterable[float] = DEFAULT_TOLERANCES) -> RouteLevels:
+        """
+        Precompute simplified versions of a route's line for map display.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            tolerances: Simplification tolerances (m)
+            
+        Returns:
+            RouteLevels whose masks can be passed as keep= to geojson_data()
+            and iter_geojson()
+        """
+        points, point_edges = self._route_points(self.geometry_table(), route)
+        return RouteLevels(points, point_edges, len(route), tolerances)
+    
+    def route_columns(self, route: List[Tuple[int, int]],
+                      route_name: str = "StreetView Route",
+                      keep: Optional[np.ndarray] = None) -> RouteColumns:
+        """
+        Gather a route's line and segment metadata as flat columns.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            route_name: Name for the route
+            keep: Optional mask over the route's points, e.g. a simplification
+                level from route_levels()
+            
+        Returns:
+            RouteColumns, which encode to polyline JSON or binary payloads
+        """
+        return RouteColumns(self.geometry_table(), route, keep=keep, route_name=route_name)
     
     def export_to_csv(self, route: List[Tuple[int, int]], 
-                      output_file: str) -> None:
+                      output_file: Output) -> None:
         """
         Export route to CSV format with waypoints.
         
         Args:
             route: List of edge tuples (node_from, node_to)
-            output_file: Path to output CSV file
+            output_file: Path to output CSV file, or a text buffer to write to
         """
-        logger.info(f"Exporting route to CSV: {output_file}")
+        logger.info(f"Exporting route to CSV: {_describe(output_file)}")
         
         import csv
         
-        with open(output_file, 'w', newline='') as csvfile:
+        with _output(output_file, newline='') as csvfile:
             fieldnames = ['waypoint_id', 'latitude', 'longitude', 'from_node', 'to_node']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             
-            waypoint_id = 0
-            for u, v in route:
-                # Write from node
-                node_data = self.graph.nodes[u]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                
-                if lat and lon:
-                    writer.writerow({
-                        'waypoint_id': waypoint_id,
-                        'latitude': lat,
-                        'longitude': lon,
-                        'from_node': u,
-                        'to_node': v
-                    })
-                    waypoint_id += 1
+            # One waypoint per edge, at its from node
+            table = self.geometry_table()
+            u_idx = table.route_indices(route)[0]
+            valid = table.node_valid[u_idx]
+            lats = table.node_lat[u_idx[valid]].tolist()
+            lons = table.node_lon[u_idx[valid]].tolist()
+            edges = [edge for edge, keep in zip(route, valid.tolist()) if keep]
+            for waypoint_id, ((u, v), lat, lon) in enumerate(zip(edges, lats, lons)):
+                writer.writerow({
+                    'waypoint_id': waypoint_id,
+                    'latitude': lat,
+                    'longitude': lon,
+                    'from_node': u,
+                    'to_node': v
+                })
+            waypoint_id = len(edges)
         
         logger.info(f"CSV file saved with {waypoint_id} waypoints")
     
+    def export_to_html(self, route: List[Tuple[int, int]],
+                       output_file: Output = "route_map.html",
+                       route_name: str = "StreetView Route",
+                       tolerance: Optional[float] = HTML_TOLERANCE) -> None:
+        """
+        Export route to a lightweight interactive HTML map.
+        
+        The page draws the route's street geometry, simplified and packed as
+        an encoded polyline (see html_map), so it stays small and opens
+        quickly for large routes.
+        
+        Args:
+            route: List of edge tuples (node_from, node_to)
+            output_file: Path to output HTML file, or a text buffer to write to
+            route_name: Name for the route
+            tolerance: Simplification tolerance (m), or None for every point
+        """
+        logger.info(f"Exporting route to HTML map: {_describe(output_file)}")
+        
+        points, point_edges = self._route_points(self.geometry_table(), route)
+        page = render_route_html(points, route_name=route_name, tolerance=tolerance,
+                                 point_edges=point_edges)
+        
+        with _output(output_file) as f:
+            f.write(page)
+        
+        logger.info(f"HTML map saved ({len(page) / 1e3:.0f} kB)")
+    
     def visualize_route_folium(self, route: List[Tuple[int, int]], 
-                               output_file: str = "route_map.html") -> None:
+                               output_file: Output = "route_map.html") -> None:
         """
         Create an interactive Folium map of the route.
         
         Args:
             route: List of edge tuples (node_from, node_to)
-            output_file: Path to output HTML file
+            output_file: Path to output HTML file, or a text buffer to write to
         """
         import folium
         
-        logger.info(f"Creating interactive map: {output_file}")
+        logger.info(f"Creating interactive map: {_describe(output_file)}")
         
         # Get coordinates for centering map
         first_node = route[0][0]
@@ -439,15 +496,12 @@ class RouteExporter:
         # Create folium map
         m = folium.Map(location=[center_lat, center_lon], zoom_start=15)
         
-        # Add route as polyline
-        route_coords = []
-        for u, v in route:
-            for node in [u, v]:
-                node_data = self.graph.nodes[node]
-                lat = node_data.get('lat', node_data.get('y'))
-                lon = node_data.get('lon', node_data.get('x'))
-                if lat and lon:
-                    route_coords.append([lat, lon])
+        # Add route as polyline through both end nodes of every edge
+        table = self.geometry_table()
+        u_idx, v_idx, _ = table.route_indices(route)
+        nodes = np.column_stack([u_idx, v_idx]).ravel()
+        nodes = nodes[table.node_valid[nodes]]
+        route_coords = np.column_stack([table.node_lat[nodes], table.node_lon[nodes]]).tolist()
         
         # Add the route
         folium.PolyLine(
@@ -473,5 +527,9 @@ class RouteExporter:
             ).add_to(m)
         
         # Save map
-        m.save(output_file)
-        logger.info(f"Interactive map saved to {output_file}")
\ No newline at end of file
+        if isinstance(output_file, str):
+            m.save(output_file)
+        else:
+            # Map.save() writes bytes and closes file objects it is given
+            output_file.write(m.get_root().render())
+        logger.info(f"Interactive map saved to {_describe(output_file)}")
\ No newline at end of file
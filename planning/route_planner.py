@@ -6,6 +6,7 @@ import os
 from typing import Optional, Union, Tuple, List
 import logging
 from map_loader import MapLoader
+from graph_pool import RegionGraphPool
 from cpp_solver import CPPSolver
 from route_exporter import RouteExporter
 import networkx as nx
@@ -17,15 +18,33 @@ logger = logging.getLogger(__name__)
 class RoutePlanner:
     """Main class for planning routes that cover all streets in an area."""
     
-    def __init__(self, network_type: str = 'drive'):
+    def __init__(self, network_type: str = 'drive', prune_attributes: bool = False,
+                 streaming: bool = False, shared_download: bool = False,
+                 graph_pool: Optional[RegionGraphPool] = None,
+                 repair: bool = False):
         """
         Initialize route planner.
         
         Args:
             network_type: Type of network ('drive', 'walk', 'bike', etc.)
+            prune_attributes: If True, drop edge attributes not needed for
+                planning and exporting (see MapLoader)
+            streaming: If True, load places through the streaming Overpass
+                parser (see MapLoader)
+            shared_download: If True, derive the network from a cached
+                per-region 'all' download shared across network types
+                (see MapLoader)
+            graph_pool: Pool of loaded region graphs shared between
+                planners (see MapLoader)
+            repair: If True, clean up graph artifacts before solving
+                (see MapLoader)
         """
         self.network_type = network_type
-        self.map_loader = MapLoader(network_type)
+        self.map_loader = MapLoader(network_type, prune_attributes=prune_attributes,
+                                    streaming=streaming,
+                                    shared_download=shared_download,
+                                    graph_pool=graph_pool,
+                                    repair=repair)
         self.graph = None
         self.solver = None
         self.route = None
@@ -83,6 +102,21 @@ class RoutePlanner:
         self._setup_solver_and_exporter()
         return self.graph
     
+    def load_area_from_snapshot(self, directory: str):
+        """
+        Load a street network saved with MapLoader.save_snapshot.
+        
+        Args:
+            directory: Snapshot directory
+            
+        Returns:
+            Read-only graph_arrays.ArrayGraph backed by memory-mapped files
+        """
+        logger.info(f"Loading area from snapshot {directory}")
+        self.graph = self.map_loader.load_snapshot(directory)
+        self._setup_solver_and_exporter()
+        return self.graph
+    
     def _setup_solver_and_exporter(self):
         """Setup solver and exporter after graph is loaded."""
         if self.graph:
@@ -118,7 +152,7 @@ class RoutePlanner:
         
         Args:
             output_dir: Directory for output files
-            formats: List of formats to export ('gpx', 'kml', 'geojson', 'csv', 'html')
+            formats: List of formats to export ('gpx', 'kml', 'kmz', 'geojson', 'csv', 'html')
             base_name: Base name for output files
             
         Returns:
@@ -146,6 +180,11 @@ class RoutePlanner:
                 self.exporter.export_to_kml(self.route, output_file)
                 output_files['kml'] = output_file
                 
+            elif fmt == 'kmz':
+                output_file = os.path.join(output_dir, f"{base_name}.kmz")
+                self.exporter.export_to_kmz(self.route, output_file)
+                output_files['kmz'] = output_file
+                
             elif fmt == 'geojson':
                 output_file = os.path.join(output_dir, f"{base_name}.geojson")
                 self.exporter.export_to_geojson(self.route, output_file)
@@ -158,7 +197,7 @@ class RoutePlanner:
                 
             elif fmt == 'html':
                 output_file = os.path.join(output_dir, f"{base_name}_map.html")
-                self.exporter.visualize_route_folium(self.route, output_file)
+                self.exporter.export_to_html(self.route, output_file)
                 output_files['html'] = output_file
         
         logger.info(f"Routes exported to {output_dir}")
@@ -181,12 +220,18 @@ class RoutePlanner:
         Get statistics about the planned route.
         
         Returns:
-            Dictionary with route statistics
+            Dictionary with route statistics; with repair enabled, also the
+            street length the repair dropped (dropped_street_length_m)
         """
         if not self.solver or not self.route:
             raise ValueError("No route planned. Plan a route first.")
         
-        return self.solver.get_route_stats()
+        stats = self.solver.get_route_stats()
+        repair_report = self.map_loader.repair_report
+        if repair_report is not None:
+            # Street length graph_repair removed, which the route does not cover
+            stats['dropped_street_length_m'] = repair_report['dropped_length']
+        return stats
     
     def full_pipeline(self, place_name: str, 
                      output_dir: str = "output",
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test edge attribute pruning, interning and graph memory accounting.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import os
+import sys
+
+import networkx as nx
+from shapely.geometry import box
+
+import overpass_stream
+from edge_attributes import (KEPT_EDGE_ATTRIBUTES, edge_highway, edge_name, graph_memory_bytes,
+                             memory_report, prune_edge_attributes)
+from map_loader import MapLoader
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+AREA = box(-122.275, 37.860, -122.255, 37.875)
+
+
+def load_graph(prune_attributes: bool):
+    """Load part of the cached area as a preprocessed graph."""
+    loader = MapLoader('drive', prune_attributes=prune_attributes)
+    graph = loader._preprocess_graph(overpass_stream.build_graph([CACHE_FILE], 'drive',
+                                                                 polygon=AREA))
+    return graph, loader
+
+
+def test_pruning_round_trip():
+    """Test that pruned edges keep only what is read and give back the same values."""
+    print("=" * 60)
+    print("PRUNING ROUND TRIP TEST")
+    print("=" * 60)
+
+    G = nx.MultiDiGraph()
+    G.add_node(1, x=0.0, y=0.0, lat=37.0, lon=-122.0, street_count=3)
+    G.add_node(2, x=1.0, y=0.0, lat=37.0, lon=-121.9, street_count=1)
+    G.add_edge(1, 2, length=10.0, oneway=False, name='Main Street', highway='residential',
+               osmid=100, lanes='2', maxspeed='25 mph', reversed=False)
+    G.add_edge(2, 1, length=10.0, oneway=False, name='Main Street', highway='residential',
+               osmid=100, lanes='2')
+    G.add_edge(1, 2, length=12.0, oneway=True, name=['Oak Avenue', 'Elm Street'],
+               highway=['secondary', 'tertiary'], osmid=[200, 201])
+    G.add_edge(2, 1, length=12.0, oneway=True)
+    original = [dict(data) for _, _, data in G.edges(data=True)]
+
+    prune_edge_attributes(G)
+
+    for before, (_, _, after) in zip(original, G.edges(data=True)):
+        for attr in ('name', 'highway', 'osmid'):
+            assert attr not in after, f"{attr} kept as a plain attribute"
+        allowed = set(KEPT_EDGE_ATTRIBUTES) | {'name_code', 'highway_code'}
+        assert set(after) <= allowed, f"Unused attributes kept: {set(after) - allowed}"
+        assert after['length'] == before['length'] and after['oneway'] == before['oneway'], \
+            "Length or oneway changed"
+        assert edge_name(G, after) == before.get('name') and \
+            edge_highway(G, after) == before.get('highway'), \
+            f"Interned values do not read back: {before}"
+    assert edge_name(G, {}, default='unnamed') == 'unnamed', "Default not returned"
+    assert edge_name(G, {'name': 'Plain'}) == 'Plain', "Unpruned name not read"
+
+    # Equal values share one table entry, lists included
+    assert G.graph['name_table'] == ['Main Street', ['Oak Avenue', 'Elm Street']], \
+        f"Unexpected name table {G.graph['name_table']}"
+    assert G.graph['highway_table'] == ['residential', ['secondary', 'tertiary']], \
+        f"Unexpected highway table {G.graph['highway_table']}"
+    assert all(set(data) <= {'x', 'y', 'lat', 'lon'} for _, data in G.nodes(data=True)), \
+        "Unused node attributes kept"
+
+    print("  ✓ Names and highway classes read back through their codes")
+
+
+def test_memory_report():
+    """Test the pruned graph's memory report against a direct measurement."""
+    print("\n" + "=" * 60)
+    print("MEMORY REPORT TEST")
+    print("=" * 60)
+
+    full, _ = load_graph(prune_attributes=False)
+    pruned, loader = load_graph(prune_attributes=True)
+    report = loader.memory_report
+    print(f"  {report['before_mb']} MB -> {report['after_mb']} MB "
+          f"({report['saved_percent']}% saved)")
+
+    assert report['before_mb'] == round(graph_memory_bytes(full) / 1e6, 2), \
+        "Size before pruning differs from the unpruned graph"
+    assert report['after_mb'] == round(graph_memory_bytes(pruned) / 1e6, 2), \
+        "Size after pruning differs from the pruned graph"
+    assert 0 < report['saved_mb'] < report['before_mb'], "Pruning did not save memory"
+
+    for (_, _, a), (_, _, b) in zip(full.edges(data=True), pruned.edges(data=True)):
+        assert edge_name(pruned, b) == a.get('name') and \
+            edge_highway(pruned, b) == a.get('highway'), "Pruned graph lost an edge's values"
+
+    assert memory_report(2_000_000, 1_500_000) == \
+        {'before_mb': 2.0, 'after_mb': 1.5, 'saved_mb': 0.5, 'saved_percent': 25.0}, \
+        "Report arithmetic wrong"
+    assert memory_report(0, 0)['saved_percent'] == 0.0, "Empty graph not handled"
+
+    print("  ✓ Memory report matches the measured graphs")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all edge attribute tests."""
+    results = [
+        ("Pruning round trip", run_test(test_pruning_round_trip)),
+        ("Memory report", run_test(test_memory_report)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
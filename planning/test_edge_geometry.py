@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test the shared lon/lat edge geometry table used by route exports.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import gpxpy
+import numpy as np
+from pyproj import Transformer
+from shapely.geometry import box
+
+import overpass_stream
+from edge_geometry import EdgeGeometryTable
+from graph_simplify import edge_coordinates
+from map_loader import MapLoader
+from route_exporter import RouteExporter
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+AREA = box(-122.275, 37.860, -122.255, 37.875)
+
+
+def load_graph():
+    """Load part of the cached area as a preprocessed, pruned graph."""
+    loader = MapLoader('drive', prune_attributes=True)
+    return loader._preprocess_graph(overpass_stream.build_graph([CACHE_FILE], 'drive',
+                                                                polygon=AREA))
+
+
+def test_table_geometry():
+    """Test that the table holds each edge's geometry reprojected to lon/lat."""
+    print("=" * 60)
+    print("GEOMETRY TABLE TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    table = EdgeGeometryTable(graph)
+    transformer = Transformer.from_crs(graph.graph['crs'], 'EPSG:4326', always_xy=True)
+
+    assert len(table.edge_index) == len({(u, v) for u, v in graph.edges()}), \
+        "Table does not have one entry per edge pair"
+    for u, v in list(graph.edges())[:300]:
+        edge = table.edge_index[(u, v)]
+        coords = next((c for c in map(edge_coordinates, graph[u][v].values()) if c is not None), None)
+        if coords is None:
+            assert not table.has_geometry[edge], f"Geometry recorded for {(u, v)}, which has none"
+            continue
+        expected = [transformer.transform(float(x), float(y)) for x, y in coords]
+        actual = table.edge_coords(edge)
+        assert np.allclose(actual, expected, atol=1e-9), \
+            f"Geometry of {(u, v)} differs from a per-point transform"
+
+    print(f"  {len(table.edge_index)} edge pairs, {len(table.coords)} vertices")
+    print("  ✓ Table geometry matches per-point reprojection")
+
+
+def test_all_formats_share_table():
+    """Test that all five formats are written from one geometry table."""
+    print("\n" + "=" * 60)
+    print("ALL FORMATS FROM ONE TABLE TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    route = [(u, v) for u, v in graph.edges()]
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.time()
+        RouteExporter(graph).export_to_geojson(route, os.path.join(folder, 'one.geojson'))
+        one_time = time.time() - start
+
+        exporter = RouteExporter(graph)
+        start = time.time()
+        exporter.export_to_geojson(route, os.path.join(folder, 'route.geojson'))
+        table = exporter.geometry_table()
+        exporter.export_to_gpx(route, os.path.join(folder, 'route.gpx'))
+        exporter.export_to_kml(route, os.path.join(folder, 'route.kml'))
+        exporter.export_to_csv(route, os.path.join(folder, 'route.csv'))
+        exporter.visualize_route_folium(route, os.path.join(folder, 'route.html'))
+        all_time = time.time() - start
+        print(f"  GeoJSON only: {one_time * 1000:.0f} ms, all five formats: {all_time * 1000:.0f} ms")
+
+        assert exporter.geometry_table() is table, "Geometry table rebuilt between formats"
+
+        # GPX carries the street geometry between nodes, in lat/lon
+        with open(os.path.join(folder, 'route.gpx')) as f:
+            points = gpxpy.parse(f).tracks[0].segments[0].points
+        west, south, east, north = AREA.bounds
+        inside = all(south - 0.01 <= p.latitude <= north + 0.01 and
+                     west - 0.01 <= p.longitude <= east + 0.01 for p in points)
+        assert inside and len(points) > graph.number_of_nodes(), \
+            "GPX track lacks street geometry or is not in lat/lon"
+
+    print("  ✓ All formats written from one geometry table")
+
+
+def reference_line(graph, route):
+    """Route line built edge by edge with per-point transforms and duplicate checks."""
+    transformer = Transformer.from_crs(graph.graph['crs'], 'EPSG:4326', always_xy=True)
+    coordinates = []
+    last_node = None
+    for u, v in route:
+        geometry = None
+        if graph.has_edge(u, v):
+            geometry = next((c for c in map(edge_coordinates, graph[u][v].values())
+                             if c is not None), None)
+        if geometry is not None:
+            edge_coords = [transformer.transform(float(x), float(y)) for x, y in geometry]
+            if coordinates and abs(coordinates[-1][0] - edge_coords[0][0]) < 0.000001 and \
+                    abs(coordinates[-1][1] - edge_coords[0][1]) < 0.000001:
+                edge_coords = edge_coords[1:]
+            coordinates.extend(list(c) for c in edge_coords)
+            continue
+        for node in ([v] if last_node == u else [u, v]):
+            coordinates.append(list(transformer.transform(graph.nodes[node]['x'],
+                                                          graph.nodes[node]['y'])))
+        last_node = v
+    return coordinates
+
+
+def test_geojson_line():
+    """Test that the vectorized GeoJSON line matches per-point assembly."""
+    print("\n" + "=" * 60)
+    print("GEOJSON LINE TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    edges = list(graph.edges(data=True))
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in edges[::7]:
+        data.pop('coords', None)
+    route = [(u, v) for u, v, _ in edges] * 3
+
+    start = time.time()
+    expected = reference_line(graph, route)
+    reference_time = time.time() - start
+
+    exporter = RouteExporter(graph)
+    table = exporter.geometry_table()
+    start = time.time()
+    points, point_edges = exporter._route_points(table, route)
+    vector_time = time.time() - start
+    print(f"  {len(route)} edges: per-point {reference_time * 1000:.0f} ms, "
+          f"vectorized {vector_time * 1000:.1f} ms")
+
+    assert points.shape == (len(expected), 2) and np.allclose(points, expected, atol=1e-9), \
+        f"Line differs: {len(points)} vs {len(expected)} points"
+    assert not np.any(np.diff(point_edges) < 0), "Points out of route order"
+
+    print("  ✓ Vectorized line matches")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all edge geometry tests."""
+    results = [
+        ("Table geometry", run_test(test_table_geometry)),
+        ("All formats share table", run_test(test_all_formats_share_table)),
+        ("GeoJSON line", run_test(test_geojson_line)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
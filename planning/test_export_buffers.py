@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Test exporting routes to in-memory buffers and structures.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from shapely.geometry import box
+
+import overpass_stream
+from content_encoding import choose_encoding
+from map_loader import MapLoader
+from route_exporter import EXPORT_METHODS, RouteExporter
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner():
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.270, 37.865, -122.262, 37.871)))
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()]
+    return planner
+
+
+def comparable(text, fmt):
+    """Drop lines that differ between two exports of the same route."""
+    return [line for line in text.splitlines() if 'timestamp' not in line]
+
+
+def test_buffers_match_files():
+    """Test that every format writes the same document to a buffer as to a file."""
+    print("=" * 60)
+    print("BUFFERS MATCH FILES TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    with tempfile.TemporaryDirectory() as folder:
+        for fmt, method in EXPORT_METHODS.items():
+            path = os.path.join(folder, f'route.{fmt}')
+            getattr(exporter, method)(planner.route, path)
+            with open(path, newline='') as f:
+                expected = f.read()
+            actual = exporter.export_to_string(planner.route, fmt)
+            assert comparable(expected, fmt) == comparable(actual, fmt), \
+                f"{fmt.upper()} buffer output differs from the file"
+            print(f"  {fmt.upper()}: {len(actual) / 1e3:.0f} kB in memory")
+
+        path = os.path.join(folder, 'route.geojson')
+        with open(path) as f:
+            loaded = json.load(f)
+    data = exporter.geojson_data(planner.route)
+    assert comparable(json.dumps(data, indent=2), 'geojson') == \
+        comparable(json.dumps(loaded, indent=2), 'geojson'), \
+        "geojson_data differs from the exported file"
+
+    try:
+        exporter.export_to_string(planner.route, 'shp')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Unknown format accepted")
+
+    print("  ✓ All formats export to memory")
+
+
+def test_backend_export():
+    """Test that the backend serves exports from memory."""
+    print("\n" + "=" * 60)
+    print("BACKEND EXPORT TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner()
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+    try:
+        response = asyncio.run(backend.export_route('test-route', 'gpx'))
+    finally:
+        del backend.route_service.routes['test-route']
+
+    disposition = response.headers.get('content-disposition', '')
+    assert response.status_code == 200 and b'<gpx' in response.body and \
+        'route_test-route.gpx' in disposition, \
+        "GPX export not served from memory"
+
+    print(f"  GPX response: {len(response.body) / 1e3:.0f} kB")
+    print("  ✓ Export served without a file")
+
+
+def test_export_cache():
+    """Test that exports are generated once and revalidated with ETags."""
+    print("\n" + "=" * 60)
+    print("EXPORT CACHE TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+    from route_service import EXPORT_CACHE_MB
+
+    planner = load_planner()
+    exporter = planner.exporter
+    generated = []
+    export_to_string = exporter.export_to_string
+
+    def counting_export(route, fmt, **options):
+        generated.append(fmt)
+        return export_to_string(route, fmt, **options)
+
+    exporter.export_to_string = counting_export
+    backend.route_service.routes['cached-route'] = {'route_id': 'cached-route', 'planner': planner}
+
+    async def requests():
+        # Concurrent first downloads generate the export once
+        first, second = await asyncio.gather(backend.export_route('cached-route', 'gpx'),
+                                             backend.export_route('cached-route', 'gpx'))
+        etag = first.headers['etag']
+        start = time.time()
+        repeat = await backend.export_route('cached-route', 'gpx')
+        repeat_time = time.time() - start
+        not_modified = await backend.export_route('cached-route', 'gpx',
+                                                  if_none_match=f'"other", W/{etag}')
+        stale = await backend.export_route('cached-route', 'gpx', if_none_match='"other"')
+        csv = await backend.export_route('cached-route', 'csv', if_none_match=etag)
+        return first, second, repeat, repeat_time, not_modified, stale, csv
+
+    async def over_budget():
+        # Room for one stored GPX export: each download evicts the other format
+        for fmt in ('gpx', 'csv', 'gpx'):
+            await backend.export_route('cached-route', fmt)
+
+    service = backend.route_service
+    try:
+        first, second, repeat, repeat_time, not_modified, stale, csv = asyncio.run(requests())
+        locks_left = len(service._export_locks)
+        stored = service._exports[('cached-route', 'gpx')]
+        service.export_budget_bytes = sum(len(data) for data, _ in stored.values()) + 1
+        service._exports.clear()
+        service._export_bytes = 0
+        asyncio.run(over_budget())
+        stored_after = list(service._exports)
+    finally:
+        del service.routes['cached-route']
+        service.export_budget_bytes = int(EXPORT_CACHE_MB * 1e6)
+        service._exports.clear()
+        service._export_bytes = 0
+
+    etag = first.headers['etag']
+    assert generated == ['gpx', 'csv', 'gpx', 'csv', 'gpx'], \
+        f"Exports generated {generated}, expected GPX and CSV once each, then again when evicted"
+    assert locks_left == 0, "Export locks kept after generation"
+    assert stored_after == [('cached-route', 'gpx')], "Stored exports exceed the budget"
+    assert etag == f'"{hashlib.sha256(first.body).hexdigest()[:32]}"' and \
+        second.body == first.body and repeat.body == first.body and \
+        'max-age' in first.headers.get('cache-control', ''), \
+        "Cached export or its headers wrong"
+    assert not_modified.status_code == 304 and not not_modified.body and \
+        not_modified.headers['etag'] == etag, \
+        "Matching If-None-Match not answered with 304"
+    assert stale.status_code == 200 and csv.status_code == 200 and csv.headers['etag'] != etag, \
+        "Non-matching If-None-Match not answered with the export"
+
+    print(f"  GPX {len(first.body) / 1e3:.0f} kB, ETag {etag}, "
+          f"repeat download {repeat_time * 1000:.2f} ms")
+    print("  ✓ Exports cached and revalidated")
+
+
+def asgi_get(app, path, headers):
+    """GET a path from an ASGI application, returning (status, headers, body)."""
+    messages = []
+    requested = []
+
+    async def receive():
+        if requested:
+            # Streaming responses listen for a disconnect until they finish
+            await asyncio.Event().wait()
+        requested.append(True)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+             'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+             'root_path': '', 'query_string': b'', 'server': ('test', 80),
+             'client': ('test', 1234),
+             'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return start['status'], {k.decode(): v.decode() for k, v in start['headers']}, body
+
+
+def test_compressed_exports():
+    """Test precompressed export variants, KMZ, and compressed API responses."""
+    print("\n" + "=" * 60)
+    print("COMPRESSED EXPORTS TEST")
+    print("=" * 60)
+
+    cases = [
+        (None, 'identity'),
+        ('gzip, deflate', 'gzip'),
+        ('gzip;q=0.5, br', 'br'),
+        ('br;q=0, *', 'gzip'),
+        ('gzip;q=0, identity', 'identity'),
+        ('*;q=0', 'identity'),
+        ('deflate', 'identity'),
+    ]
+    for header, expected in cases:
+        chosen = choose_encoding(header, {'identity', 'gzip', 'br'})
+        assert chosen == expected, \
+            f"Accept-Encoding {header!r} chose {chosen}, expected {expected}"
+    assert choose_encoding('br, gzip;q=0.8', {'identity', 'gzip'}) == 'gzip', \
+        "Unavailable coding chosen"
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner()
+    kml = planner.exporter.export_to_string(planner.route, 'kml', placemarks='segment')
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+
+    async def requests():
+        plain = await backend.export_route('test-route', 'geojson')
+        zipped = await backend.export_route('test-route', 'geojson',
+                                            accept_encoding='gzip, deflate, br;q=0')
+        not_modified = await backend.export_route('test-route', 'geojson',
+                                                  if_none_match=zipped.headers['etag'],
+                                                  accept_encoding='gzip')
+        kmz = await backend.export_route('test-route', 'kmz', accept_encoding='gzip')
+        return plain, zipped, not_modified, kmz
+
+    try:
+        plain, zipped, not_modified, kmz = asyncio.run(requests())
+        # Through the whole application, including the compression middleware
+        segments = asgi_get(backend.app, '/api/route/test-route/segments',
+                            {'Accept-Encoding': 'gzip'})
+        export = asgi_get(backend.app, '/api/export/test-route/csv',
+                          {'Accept-Encoding': 'gzip'})
+    finally:
+        del backend.route_service.routes['test-route']
+
+    assert zipped.headers.get('content-encoding') == 'gzip' and \
+        gzip.decompress(zipped.body) == plain.body and 'content-encoding' not in plain.headers and \
+        zipped.headers['etag'] != plain.headers['etag'] and \
+        zipped.headers.get('vary') == 'Accept-Encoding', \
+        "gzip variant not served"
+    assert not_modified.status_code == 304, "gzip variant's ETag not revalidated"
+    with zipfile.ZipFile(io.BytesIO(kmz.body)) as archive:
+        assert archive.namelist() == ['doc.kml'] and archive.read('doc.kml').decode() == kml, \
+            "KMZ does not hold the KML document"
+    assert 'content-encoding' not in kmz.headers, "Already compressed KMZ compressed again"
+    status, headers, body = segments
+    assert status == 200 and headers.get('content-encoding') == 'gzip' and \
+        json.loads(gzip.decompress(body))['features'], \
+        "Segments JSON not compressed"
+    status, headers, body = export
+    assert status == 200 and headers.get('content-encoding') == 'gzip' and \
+        gzip.decompress(body) == planner.exporter.export_to_bytes(planner.route, 'csv'), \
+        "Precompressed export altered by the middleware"
+
+    print(f"  GeoJSON {len(plain.body) / 1e3:.0f} kB, gzip {len(zipped.body) / 1e3:.0f} kB; "
+          f"KML {len(kml) / 1e3:.0f} kB, KMZ {len(kmz.body) / 1e3:.0f} kB")
+    print("  ✓ Compressed variants served by Accept-Encoding")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all in-memory export tests."""
+    results = [
+        ("Buffers match files", run_test(test_buffers_match_files)),
+        ("Backend export", run_test(test_backend_export)),
+        ("Export cache", run_test(test_export_cache)),
+        ("Compressed exports", run_test(test_compressed_exports)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test the local place boundary gazetteer.
+Uses temporary stores and cached synthetic Overpass data, so it runs
+without network access.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import osmnx as ox
+from shapely.geometry import box, mapping
+
+import overpass_stream
+from gazetteer import Gazetteer, normalize_place_name
+from map_loader import DOWNLOAD_BUFFER, MapLoader
+
+PIEDMONT = box(-122.249, 37.816, -122.210, 37.836)
+
+
+def write_seed_file(folder: str) -> str:
+    """Write a GeoJSON seed file with one place and its aliases."""
+    path = os.path.join(folder, 'places.geojson')
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature',
+            'properties': {'name': 'Piedmont, California, USA',
+                           'aliases': ['Piedmont, CA', 'City of Piedmont']},
+            'geometry': mapping(PIEDMONT),
+        }]}, f)
+    return path
+
+
+def test_store():
+    """Test normalization, seeding, alias lookup and persistence."""
+    print("=" * 60)
+    print("GAZETTEER STORE TEST")
+    print("=" * 60)
+
+    assert normalize_place_name(" piedmont ,California,  USA.") == \
+        normalize_place_name("Piedmont, California, USA"), \
+        "Equivalent names normalize differently"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'gazetteer.json')
+        gazetteer = Gazetteer(store, online_fallback=False)
+        added = gazetteer.seed_from_file(write_seed_file(tmp))
+        print(f"  Seeded {added} place(s)")
+
+        for name in ('PIEDMONT, california, usa', 'piedmont, ca', 'City of Piedmont'):
+            polygon = gazetteer.lookup(name)
+            assert polygon is not None and polygon.equals(PIEDMONT), f"Lookup failed for {name!r}"
+
+        # A fresh instance reads the saved store
+        reloaded = Gazetteer(store, online_fallback=False)
+        reloaded.add_alias('Piedmont, CA', 'Piedmont')
+        assert reloaded.lookup('piedmont') is not None, \
+            "Saved store or alias not found after reload"
+
+        try:
+            reloaded.resolve('Atlantis')
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown place resolved without online fallback")
+
+    print("  ✓ Names, aliases and persisted store resolve locally")
+
+
+def test_load_by_place_offline():
+    """Test that a warm store lets load_by_place run without any network request."""
+    print("\n" + "=" * 60)
+    print("OFFLINE LOAD BY PLACE TEST")
+    print("=" * 60)
+
+    old_cache, old_url = ox.settings.cache_folder, ox.settings.overpass_url
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            ox.settings.cache_folder = tmp
+            # Nothing listens here, so any request would fail
+            ox.settings.overpass_url = 'http://127.0.0.1:9/api'
+
+            gazetteer = Gazetteer(os.path.join(tmp, 'gazetteer.json'), online_fallback=False)
+            gazetteer.seed_from_file(write_seed_file(tmp))
+
+            # Pre-populate the Overpass cache with a small street grid
+            west, south, east, north = PIEDMONT.bounds
+            nodes = [(1 + i * 10 + j, south + (i + 1) * 0.004, west + (j + 1) * 0.006)
+                     for i in range(4) for j in range(5)]
+            elements = [{'type': 'node', 'id': n, 'lat': lat, 'lon': lon} for n, lat, lon in nodes]
+            for i in range(4):
+                elements.append({'type': 'way', 'id': 100 + i, 'tags': {'highway': 'residential'},
+                                 'nodes': [1 + i * 10 + j for j in range(5)]})
+            for j in range(5):
+                elements.append({'type': 'way', 'id': 200 + j, 'tags': {'highway': 'residential'},
+                                 'nodes': [1 + i * 10 + j for i in range(4)]})
+            buffered = ox.utils_geo.buffer_geometry(PIEDMONT, DOWNLOAD_BUFFER)
+            for query in overpass_stream.network_queries(buffered, 'drive'):
+                with open(overpass_stream.cache_path_for_query(query), 'w') as f:
+                    json.dump({'version': 0.6, 'elements': elements}, f)
+
+            loader = MapLoader('drive', streaming=True, gazetteer=gazetteer)
+            graph = loader.load_by_place('Piedmont, CA')
+            print(f"  Loaded {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        finally:
+            ox.settings.cache_folder, ox.settings.overpass_url = old_cache, old_url
+
+    assert graph.number_of_edges() != 0, "Empty graph"
+    print("  ✓ Place loaded from gazetteer and cache with no network access")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all gazetteer tests."""
+    results = [
+        ("Gazetteer store", run_test(test_store)),
+        ("Offline load by place", run_test(test_load_by_place_offline)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
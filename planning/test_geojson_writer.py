@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Test the streaming GeoJSON writer and the streamed segments endpoint.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+from fastapi.responses import StreamingResponse
+from shapely.geometry import box
+
+import overpass_stream
+from geojson_writer import iter_route_geojson, write_route_geojson
+from map_loader import MapLoader
+from route_exporter import RouteExporter
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_graph():
+    """Load part of the cached area as a preprocessed, pruned graph."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in list(graph.edges(data=True))[::9]:
+        data.pop('coords', None)
+    return graph
+
+
+def without_timestamp(properties):
+    """Properties other than the export time."""
+    return {k: v for k, v in properties.items() if k != 'timestamp'}
+
+
+def features_match(expected, actual):
+    """Compare two FeatureCollections' features, coordinates to 1e-6."""
+    if len(expected['features']) != len(actual['features']):
+        return False
+    for a, b in zip(expected['features'], actual['features']):
+        if without_timestamp(a['properties']) != without_timestamp(b['properties']):
+            return False
+        coords_a = np.array(a['geometry']['coordinates'])
+        coords_b = np.array(b['geometry']['coordinates'])
+        if coords_a.shape != coords_b.shape or not np.allclose(coords_a, coords_b, atol=6e-7):
+            return False
+    return True
+
+
+def test_matches_export():
+    """Test that streamed output matches export_to_geojson, across chunk boundaries."""
+    print("=" * 60)
+    print("STREAMED OUTPUT TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    route = [(u, v) for u, v in graph.edges()] * 2
+    exporter = RouteExporter(graph)
+    table = exporter.geometry_table()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for include_segments in (False, True):
+            path = os.path.join(folder, 'route.geojson')
+            exporter.export_to_geojson(route, path, include_segments=include_segments)
+            with open(path) as f:
+                expected = json.load(f)
+            indented_size = os.path.getsize(path)
+
+            text = ''.join(iter_route_geojson(table, route, include_segments=include_segments,
+                                              chunk_edges=37))
+            actual = json.loads(text)
+            label = 'segments' if include_segments else 'single line'
+            print(f"  {label}: {indented_size / 1e3:.0f} kB indented, {len(text) / 1e3:.0f} kB streamed")
+
+            assert features_match(expected, actual), \
+                f"Streamed {label} output differs from export_to_geojson"
+            expected_props = without_timestamp(expected.get('properties', {}))
+            actual_props = without_timestamp(actual.get('properties', {}))
+            assert expected_props == actual_props, \
+                f"Collection properties differ: {expected_props} vs {actual_props}"
+            assert len(text) * 1.5 <= indented_size, "Streamed output is not much smaller"
+
+        # Compact file export goes through the same writer
+        path = os.path.join(folder, 'compact.geojson')
+        exporter.export_to_geojson(route, path, compact=True, precision=5)
+        with open(path) as f:
+            text = f.read()
+        numbers = re.findall(r'-?\d+\.(\d+)', text.split('"coordinates":[')[1].split(']]')[0])
+        assert numbers and all(len(decimals) == 5 for decimals in numbers), \
+            "Precision not applied"
+
+    print("  ✓ Streamed GeoJSON matches the indented export")
+
+
+def test_constant_memory():
+    """Test that peak memory does not grow with route length."""
+    print("\n" + "=" * 60)
+    print("CONSTANT MEMORY TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    table = RouteExporter(graph).geometry_table()
+    edges = [(u, v) for u, v in graph.edges()]
+
+    peaks = []
+    for repeat in (20, 80):
+        route = edges * repeat
+        tracemalloc.start()
+        size = write_route_geojson(table, route, _NullWriter())
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        print(f"  {len(route)} edges, {size / 1e6:.1f} MB written, peak {peaks[-1] / 1e6:.2f} MB")
+
+    assert peaks[1] <= peaks[0] * 1.5, "Peak memory grows with route length"
+
+    print("  ✓ Peak memory independent of route length")
+
+
+def test_segments_endpoint():
+    """Test that the backend streams segments without building the document."""
+    print("\n" + "=" * 60)
+    print("SEGMENTS ENDPOINT TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+    from route_planner import RoutePlanner
+
+    graph = load_graph()
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()]
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+
+    async def fetch():
+        response = await backend.get_route_segments('test-route')
+        body = [piece async for piece in response.body_iterator]
+        return response, ''.join(body)
+
+    response, body = asyncio.run(fetch())
+    del backend.route_service.routes['test-route']
+    assert isinstance(response, StreamingResponse) and \
+        response.media_type == 'application/geo+json', f"Unexpected response: {response!r}"
+    data = json.loads(body)
+    assert data['properties']['total_edges'] == len(planner.route) and data['features'], \
+        "Streamed segments incomplete"
+
+    print(f"  {len(data['features'])} segments, {len(body) / 1e3:.0f} kB")
+    print("  ✓ Segments endpoint streams GeoJSON")
+
+
+class _NullWriter:
+    """Text sink that discards what it is given."""
+
+    def write(self, text):
+        return len(text)
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all streaming GeoJSON tests."""
+    results = [
+        ("Streamed output", run_test(test_matches_export)),
+        ("Constant memory", run_test(test_constant_memory)),
+        ("Segments endpoint", run_test(test_segments_endpoint)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
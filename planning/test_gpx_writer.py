@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test the streaming GPX writer against gpxpy's output.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import io
+import os
+import sys
+import time
+
+import gpxpy
+import gpxpy.gpx
+from shapely.geometry import box
+
+import overpass_stream
+from gpx_writer import iter_route_gpx, route_turns
+from map_loader import MapLoader
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner(repeat=1):
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in list(graph.edges(data=True))[::9]:
+        data.pop('coords', None)
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * repeat
+    return planner
+
+
+def gpxpy_document(table, route, route_name="StreetView Route"):
+    """The GPX document as export_to_gpx built it through gpxpy objects."""
+    gpx = gpxpy.gpx.GPX()
+    track = gpxpy.gpx.GPXTrack()
+    track.name = route_name
+    gpx.tracks.append(track)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    track.segments.append(segment)
+    u_idx, v_idx, e_idx = table.route_indices(route)
+    lat, lon = table.node_lat.tolist(), table.node_lon.tolist()
+    added = ~table.node_valid
+    for u, v, e in zip(u_idx.tolist(), v_idx.tolist(), e_idx.tolist()):
+        if not added[u]:
+            segment.points.append(gpxpy.gpx.GPXTrackPoint(lat[u], lon[u]))
+            added[u] = True
+        if e >= 0:
+            for point_lon, point_lat in table.edge_coords(e)[1:-1].tolist():
+                segment.points.append(gpxpy.gpx.GPXTrackPoint(point_lat, point_lon))
+        if not added[v]:
+            segment.points.append(gpxpy.gpx.GPXTrackPoint(lat[v], lon[v]))
+            added[v] = True
+    return gpx.to_xml()
+
+
+def test_matches_gpxpy():
+    """Test that the writer's output is byte for byte gpxpy's."""
+    print("=" * 60)
+    print("MATCHES GPXPY TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    table = planner.exporter.geometry_table()
+    route = planner.route
+    expected = gpxpy_document(table, route, "Berkeley <test> & more")
+
+    for chunk_edges in (1, 97, 4096):
+        actual = ''.join(iter_route_gpx(table, route, route_name="Berkeley <test> & more",
+                                        chunk_edges=chunk_edges))
+        assert actual == expected, f"Output with {chunk_edges}-edge chunks differs from gpxpy"
+
+    buffer = io.StringIO()
+    planner.exporter.export_to_gpx(route, buffer)
+    assert buffer.getvalue() == gpxpy_document(table, route), "export_to_gpx differs from gpxpy"
+    assert ''.join(iter_route_gpx(table, [])) == gpxpy_document(table, []), \
+        "Empty route differs from gpxpy"
+
+    points = len(gpxpy.parse(expected).tracks[0].segments[0].points)
+    print(f"  {len(route)} edges, {points} points, {len(expected) / 1e3:.0f} kB")
+    print("  ✓ Same document as gpxpy")
+
+
+def test_segments_and_turns():
+    """Test splitting the track into segments and the route of turns."""
+    print("\n" + "=" * 60)
+    print("SEGMENTS AND TURNS TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    table = planner.exporter.geometry_table()
+    route = planner.route
+    whole = gpxpy.parse(''.join(iter_route_gpx(table, route))).tracks[0].segments[0].points
+
+    document = ''.join(iter_route_gpx(table, route, max_segment_points=500,
+                                      include_turns=True, chunk_edges=300))
+    gpx = gpxpy.parse(document)
+    segments = gpx.tracks[0].segments
+    assert all(len(segment.points) <= 500 for segment in segments) and len(segments) >= 2, \
+        "Segments not limited to 500 points"
+    joined = segments[0].points + [p for segment in segments[1:] for p in segment.points[1:]]
+    assert [(p.latitude, p.longitude) for p in joined] == \
+        [(p.latitude, p.longitude) for p in whole], \
+        "Segments do not join up to the whole track"
+    for previous, segment in zip(segments, segments[1:]):
+        assert (previous.points[-1].latitude, previous.points[-1].longitude) == \
+            (segment.points[0].latitude, segment.points[0].longitude), \
+            "Segment does not start where the previous one ended"
+
+    turns = route_turns(table, route)
+    points = gpx.routes[0].points
+    assert turns and [(p.latitude, p.longitude, p.name) for p in points] == turns, \
+        "Route of turns differs between chunked and whole route"
+    assert all(p.name.startswith(('Turn left', 'Turn right', 'Make a U-turn')) for p in points), \
+        "Unexpected turn instruction"
+    named = sum(' onto ' in p.name for p in points)
+
+    print(f"  {len(segments)} segments, {len(points)} turns ({named} with a street name), "
+          f"e.g. {points[0].name!r}")
+    print("  ✓ Segments join up and turns are written")
+
+
+def test_speed():
+    """Test that the writer is much faster than building gpxpy objects."""
+    print("\n" + "=" * 60)
+    print("SPEED TEST")
+    print("=" * 60)
+
+    planner = load_planner(repeat=20)
+    table = planner.exporter.geometry_table()
+    route = planner.route
+
+    start = time.time()
+    expected = gpxpy_document(table, route)
+    gpxpy_time = time.time() - start
+    start = time.time()
+    actual = ''.join(iter_route_gpx(table, route))
+    writer_time = time.time() - start
+
+    print(f"  {len(route)} edges, {len(actual) / 1e6:.1f} MB: gpxpy {gpxpy_time * 1000:.0f} ms, "
+          f"writer {writer_time * 1000:.0f} ms ({gpxpy_time / writer_time:.0f}x)")
+    assert actual == expected, "Output differs from gpxpy"
+    assert writer_time * 5 <= gpxpy_time, "Writer not substantially faster"
+
+    print("  ✓ Writer much faster than gpxpy")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all GPX writer tests."""
+    results = [
+        ("Matches gpxpy", run_test(test_matches_gpxpy)),
+        ("Segments and turns", run_test(test_segments_and_turns)),
+        ("Speed", run_test(test_speed)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test columnar graph snapshots opened through memory maps.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+from shapely.geometry import box
+
+import overpass_stream
+from cpp_solver import CPPSolver
+from graph_arrays import load_graph_arrays, save_graph_arrays
+from graph_simplify import edge_coordinates
+from graph_stats import graph_stats
+from map_loader import MapLoader
+from route_exporter import RouteExporter
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_graph(polygon=None):
+    """Load the cached area (or part of it) as a preprocessed, pruned graph."""
+    loader = MapLoader('drive', prune_attributes=True)
+    return loader._preprocess_graph(overpass_stream.build_graph([CACHE_FILE], 'drive',
+                                                                polygon=polygon))
+
+
+def test_round_trip():
+    """Test that a snapshot holds the same nodes, edges and statistics and opens fast."""
+    print("=" * 60)
+    print("SNAPSHOT ROUND TRIP TEST")
+    print("=" * 60)
+
+    graph = load_graph()
+    with tempfile.TemporaryDirectory() as folder:
+        directory = os.path.join(folder, 'berkeley')
+        save_graph_arrays(graph, directory)
+        pickle_file = os.path.join(folder, 'berkeley.pkl')
+        with open(pickle_file, 'wb') as f:
+            pickle.dump(graph, f)
+
+        start = time.time()
+        snapshot = load_graph_arrays(directory)
+        snapshot_time = time.time() - start
+        start = time.time()
+        with open(pickle_file, 'rb') as f:
+            pickle.load(f)
+        pickle_time = time.time() - start
+        print(f"  Open snapshot: {snapshot_time * 1000:.1f} ms, unpickle: {pickle_time * 1000:.1f} ms")
+
+        assert isinstance(snapshot.coords, np.memmap), "Snapshot arrays are not memory-mapped"
+        assert sorted(snapshot.nodes) == sorted(graph.nodes), "Node ids differ"
+        for n in list(graph.nodes)[:500]:
+            assert snapshot.nodes[n] == {k: graph.nodes[n][k] for k in ('x', 'y', 'lat', 'lon')}, \
+                f"Coordinates of node {n} differ"
+
+        def edge_rows(g):
+            return sorted((u, v, k, round(d['length'], 6), d.get('oneway'))
+                          for u, v, k, d in g.edges(keys=True, data=True))
+        assert edge_rows(snapshot) == edge_rows(graph), "Edges differ"
+        for u, v, k, data in list(graph.edges(keys=True, data=True))[:500]:
+            stored, original = edge_coordinates(snapshot[u][v][k]), edge_coordinates(data)
+            assert (stored is None) == (original is None) and \
+                (stored is None or np.array_equal(stored, np.asarray(original)[:, :2])), \
+                f"Edge geometry differs for {(u, v, k)}"
+
+        expected, actual = graph_stats(graph), graph_stats(snapshot)
+        for key in ('n_nodes', 'n_edges', 'n_odd_degree_nodes', 'is_strongly_connected'):
+            assert expected[key] == actual[key], \
+                f"Statistic {key} differs: {expected[key]} vs {actual[key]}"
+        assert snapshot_time < pickle_time, "Opening the snapshot is not faster than unpickling"
+
+    print("  ✓ Snapshot matches the graph and opens without deserializing")
+
+
+def test_solver_and_exporter():
+    """Test that CPPSolver and RouteExporter read a snapshot like the NetworkX graph."""
+    print("\n" + "=" * 60)
+    print("SOLVER AND EXPORTER ON SNAPSHOT TEST")
+    print("=" * 60)
+
+    graph = load_graph(box(-122.270, 37.865, -122.262, 37.871))
+    with tempfile.TemporaryDirectory() as folder:
+        snapshot = load_graph_arrays(save_graph_arrays(graph, os.path.join(folder, 'area')))
+
+        columns = ['node_from', 'node_to', 'length', 'name', 'highway']
+        expected = CPPSolver(graph)._graph_to_edgelist()[columns]
+        actual = CPPSolver(snapshot)._graph_to_edgelist()[columns]
+
+        def frame_rows(frame):
+            return sorted(tuple(None if isinstance(x, float) and np.isnan(x) else x for x in row)
+                          for row in frame.itertuples(index=False))
+        assert frame_rows(expected) == frame_rows(actual), "Solver edge lists differ"
+
+        # Every street once, in graph order (postman_problems itself is not run here)
+        route = [(u, v) for u, v in graph.edges()]
+        print(f"  Exporting {len(route)} route edges")
+
+        for extension, method in (('gpx', 'export_to_gpx'), ('kml', 'export_to_kml'),
+                                  ('geojson', 'export_to_geojson'), ('csv', 'export_to_csv')):
+            paths = [os.path.join(folder, f'{label}.{extension}') for label in ('nx', 'snapshot')]
+            getattr(RouteExporter(graph), method)(route, paths[0])
+            getattr(RouteExporter(snapshot), method)(route, paths[1])
+            with open(paths[0]) as a, open(paths[1]) as b:
+                # Exports are stamped with the time they were written
+                assert [line for line in a if 'timestamp' not in line] == \
+                    [line for line in b if 'timestamp' not in line], \
+                    f"{extension.upper()} export differs"
+            print(f"  {extension.upper()} export identical")
+
+    print("  ✓ Solver and exporter read the snapshot directly")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all graph snapshot tests."""
+    results = [
+        ("Round trip", run_test(test_round_trip)),
+        ("Solver and exporter", run_test(test_solver_and_exporter)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test serving bounding boxes from the region graph pool.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import os
+import sys
+import time
+
+from shapely.geometry import box
+
+import overpass_stream
+from graph_pool import RegionGraphPool
+from map_loader import MapLoader
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+# Box inside the cached Berkeley area
+INNER_BBOX = (37.875, 37.860, -122.255, -122.275)
+
+
+def load_region(repair: bool = False):
+    """Load the cached area as a preprocessed graph and return it, its extent and memory report."""
+    loader = MapLoader('drive', prune_attributes=True, repair=repair)
+    graph = loader._preprocess_graph(overpass_stream.build_graph([CACHE_FILE], 'drive'))
+    lats = [data['lat'] for _, data in graph.nodes(data=True)]
+    lons = [data['lon'] for _, data in graph.nodes(data=True)]
+    return graph, box(min(lons), min(lats), max(lons), max(lats)), loader.memory_report
+
+
+def edge_summary(graph) -> list:
+    """Sorted (u, v, length) of every edge, lengths rounded to centimetres."""
+    return sorted((u, v, round(length, 2)) for u, v, length in graph.edges(data='length'))
+
+
+def test_pooled_bbox():
+    """Test that a contained bbox is cut out of the pool and matches a fresh load."""
+    print("=" * 60)
+    print("POOLED BBOX TEST")
+    print("=" * 60)
+
+    graph, extent, report = load_region(repair=True)
+    pool = RegionGraphPool()
+    loader = MapLoader('drive', prune_attributes=True, graph_pool=pool, repair=True)
+    pool.add(loader._pool_key(), extent, graph, report)
+
+    start = time.time()
+    cut = loader.load_by_bbox(*INNER_BBOX)
+    cut_time = time.time() - start
+
+    # A fresh load simplifies the whole download, then cuts it to the box
+    fresh_loader = MapLoader('drive', prune_attributes=True, repair=True)
+    start = time.time()
+    fresh = fresh_loader._preprocess_graph(
+        overpass_stream.build_graph([CACHE_FILE], 'drive'),
+        fresh_loader._region_extent(('bbox',) + INNER_BBOX))
+    fresh_time = time.time() - start
+
+    cut_length = sum(d['length'] for _, _, d in cut.edges(data=True))
+    fresh_length = sum(d['length'] for _, _, d in fresh.edges(data=True))
+    print(f"  Pooled cut: {cut.number_of_nodes()} nodes, {cut_length:.0f} m in {cut_time * 1000:.1f} ms")
+    print(f"  Fresh load: {fresh.number_of_nodes()} nodes, {fresh_length:.0f} m in "
+          f"{fresh_time * 1000:.1f} ms (from cache, no download)")
+
+    assert pool.stats()['hits'] == 1, "Bbox was not served from the pool"
+    assert set(cut.nodes) == set(fresh.nodes) and edge_summary(cut) == edge_summary(fresh), \
+        "Pooled cut differs from a fresh load"
+    assert dict(cut.nodes(data='street_count')) == dict(fresh.nodes(data='street_count')), \
+        "Pooled cut has different street counts than a fresh load"
+    assert loader.repair_report == fresh_loader.repair_report, \
+        "Pooled cut was not repaired like a fresh load"
+    assert loader.memory_report is not None and \
+        abs(loader.memory_report['saved_percent'] - report['saved_percent']) < 0.5, \
+        "Pooled cut has no memory report"
+    assert cut.graph is not graph.graph and \
+        not any(cut[u][v] is graph[u][v] for u, v in cut.edges()), \
+        "Pooled cut shares structure with the pooled graph"
+
+    print("  ✓ Contained bbox served from the pool")
+
+
+def test_pool_lookup_and_budget():
+    """Test misses for other keys and uncontained boxes, and LRU eviction."""
+    print("\n" + "=" * 60)
+    print("POOL LOOKUP AND BUDGET TEST")
+    print("=" * 60)
+
+    graph, extent, _ = load_region()
+    pool = RegionGraphPool()
+    key = MapLoader('drive', prune_attributes=True)._pool_key()
+    walk_key = MapLoader('walk', prune_attributes=True)._pool_key()
+    pool.add(key, extent, graph)
+
+    west, south, east, north = extent.bounds
+    assert pool.get_bbox(walk_key, *INNER_BBOX) is None, \
+        "Graph served for a different network type"
+    assert pool.get_bbox(key, north + 0.01, south, east, west) is None, \
+        "Graph served for a box extending past the pooled extent"
+
+    # Budget for one graph: adding a second evicts the least recently used
+    budget_mb = pool.stats()['memory_mb'] * 1.5
+    pool = RegionGraphPool(memory_budget_mb=budget_mb)
+    pool.add(key, extent, graph)
+    pool.add(walk_key, extent, graph)
+    stats = pool.stats()
+    print(f"  Budget {budget_mb:.1f} MB: {stats['graphs']} graph(s) pooled")
+    assert stats['graphs'] == 1 and \
+        pool.get_bbox(walk_key, *INNER_BBOX) is not None, \
+        "Least recently used graph was not evicted"
+
+    print("  ✓ Lookups keyed and contained, pool kept within budget")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all graph pool tests."""
+    results = [
+        ("Pooled bbox", run_test(test_pooled_bbox)),
+        ("Lookup and budget", run_test(test_pool_lookup_and_budget)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
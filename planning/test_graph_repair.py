@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test the graph validation and repair pass.
+Uses a synthetic graph and a cached Overpass response from cache/, so it
+runs without OSM access.
+"""
+
+import os
+import sys
+import networkx as nx
+import numpy as np
+
+import overpass_stream
+from graph_repair import repair_graph
+from graph_stats import graph_stats
+from map_loader import MapLoader
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def build_test_graph() -> nx.MultiDiGraph:
+    """Build a two-way grid with one of each artifact the repair pass handles."""
+    G = nx.MultiDiGraph(crs='EPSG:32610')
+
+    def street(a, b, length=100.0, oneway=False):
+        coords = np.array([[G.nodes[n]['x'], G.nodes[n]['y']] for n in (a, b)])
+        G.add_edge(a, b, length=length, oneway=oneway, coords=coords)
+        if not oneway:
+            G.add_edge(b, a, length=length, oneway=oneway, coords=coords[::-1])
+
+    for i in range(4):
+        for j in range(4):
+            G.add_node((i, j), x=i * 100.0, y=j * 100.0)
+            if i:
+                street((i - 1, j), (i, j))
+            if j:
+                street((i, j - 1), (i, j))
+
+    G.add_edge((1, 1), (1, 1), length=20.0, oneway=False)          # short self-loop
+    G.add_edge((2, 2), (2, 2), length=500.0, oneway=False)         # loop road, kept
+    street((0, 0), (1, 0))                                         # duplicate street
+    G.add_node('dup', x=300.0, y=300.0)
+    G.add_node((4, 3), x=400.0, y=300.0)
+    street((3, 3), 'dup', length=0.0)                              # coincident node
+    street('dup', (4, 3))                                          # reached through it
+    G.add_node('stub', x=-100.0, y=0.0)
+    street('stub', (0, 0), oneway=True)                            # clipped one-way
+    G.add_node('island1', x=900.0, y=900.0)
+    G.add_node('island2', x=950.0, y=900.0)
+    street('island1', 'island2', length=50.0)                      # tiny fragment
+    return G
+
+
+def test_lossless_defaults():
+    """Test that the default repair only drops duplicates and zero-length edges."""
+    print("=" * 60)
+    print("LOSSLESS DEFAULTS TEST")
+    print("=" * 60)
+
+    G = build_test_graph()
+    length_before = sum(d['length'] for _, _, d in G.edges(data=True))
+    report = repair_graph(G)
+    print(f"  Report: {report}")
+
+    expected = {'self_loops': 0, 'duplicate_edges': 2, 'oneway_stub_edges': 0,
+                'zero_length_edges': 2, 'fragment_nodes': 0, 'dropped_length': 0.0}
+    for key, value in expected.items():
+        assert report[key] == value, f"Expected {value} for {key}, got {report[key]}"
+
+    # Only the duplicated street's second copy is gone
+    length_after = sum(d['length'] for _, _, d in G.edges(data=True))
+    assert abs(length_before - length_after - 200.0) < 1e-6 and \
+        G.has_edge((1, 1), (1, 1)) and G.has_edge('stub', (0, 0)) and 'island1' in G, \
+        "Default repair dropped a street"
+
+    print("  ✓ No street dropped by default")
+
+
+def test_synthetic_artifacts():
+    """Test that each artifact is removed or repaired and reported."""
+    print("\n" + "=" * 60)
+    print("SYNTHETIC ARTIFACTS TEST")
+    print("=" * 60)
+
+    G = build_test_graph()
+    stats_before = graph_stats(G)
+    report = repair_graph(G, drop_self_loops=True, drop_oneway_stubs=True,
+                          drop_fragments=True)
+    print(f"  Report: {report}")
+
+    # Short loop 20 m, one-way stub 100 m, fragment 2 x 50 m
+    expected = {'self_loops': 1, 'duplicate_edges': 2, 'oneway_stub_edges': 1,
+                'zero_length_edges': 2, 'fragment_nodes': 3, 'dropped_length': 220.0}
+    for key, value in expected.items():
+        assert report[key] == value, f"Expected {value} for {key}, got {report[key]}"
+
+    assert 'dup' not in G and G.has_edge((3, 3), (4, 3)) and G.has_edge((2, 2), (2, 2)), \
+        "Coincident node not merged, or a real street was dropped"
+
+    # Memoized statistics were kept up to date through the repair
+    stats_after = graph_stats(G)
+    total_length = sum(d['length'] for _, _, d in G.edges(data=True))
+    assert stats_after['n_edges'] == G.number_of_edges() and \
+        stats_after['n_nodes'] == G.number_of_nodes() and \
+        stats_after['n_odd_degree_nodes'] == report['odd_nodes_after'] and \
+        abs(stats_after['total_edge_length'] - total_length) <= 1e-6 and \
+        stats_after['n_edges'] != stats_before['n_edges'], "Memoized statistics not updated"
+
+    print("  ✓ All artifacts repaired")
+
+
+def test_berkeley_reduction():
+    """Test that the opt-in repairs shrink a Berkeley bbox and report the street they drop."""
+    print("\n" + "=" * 60)
+    print("BERKELEY BBOX REDUCTION TEST")
+    print("=" * 60)
+
+    raw = overpass_stream.build_graph([CACHE_FILE], 'drive')
+    extent = MapLoader('drive')._region_extent(('bbox', 37.875, 37.860, -122.255, -122.275))
+    plain = MapLoader('drive')._preprocess_graph(raw.copy(), extent)
+    lossless = MapLoader('drive', repair=True)
+    lossless_graph = lossless._preprocess_graph(raw.copy(), extent)
+    lossy = MapLoader('drive', repair=True,
+                      repair_options={'drop_self_loops': True, 'drop_oneway_stubs': True,
+                                      'drop_fragments': True})
+    repaired = lossy._preprocess_graph(raw, extent)
+
+    before, after = graph_stats(plain), graph_stats(repaired)
+    print(f"  Edges: {before['n_edges']} -> {after['n_edges']}")
+    print(f"  Odd-degree nodes: {before['n_odd_degree_nodes']} -> {after['n_odd_degree_nodes']}")
+    print(f"  Street dropped: {lossless.repair_report['dropped_length']} m by default, "
+          f"{lossy.repair_report['dropped_length']} m with the lossy repairs")
+
+    assert lossless.repair_report['dropped_length'] == 0.0 and \
+        abs(graph_stats(lossless_graph)['total_edge_length'] - before['total_edge_length']) < 1.0, \
+        "Default repair dropped street length"
+    assert after['n_edges'] < before['n_edges'] and \
+        after['n_odd_degree_nodes'] < before['n_odd_degree_nodes'], \
+        "Repair did not shrink the solver input"
+    dropped = before['total_edge_length'] - after['total_edge_length']
+    assert abs(lossy.repair_report['dropped_length'] - dropped) < 1.0, \
+        "Reported dropped length differs from the street length removed"
+    print("  ✓ Fewer edges and odd-degree nodes go into CPPSolver, losses reported")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all graph repair tests."""
+    results = [
+        ("Lossless defaults", run_test(test_lossless_defaults)),
+        ("Synthetic artifacts", run_test(test_synthetic_artifacts)),
+        ("Berkeley reduction", run_test(test_berkeley_reduction)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Test the vectorized graph simplification against OSMnx.
+Uses synthetic graphs and a cached Overpass response from cache/, so it
+runs without OSM access.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import networkx as nx
+import osmnx as ox
+from graph_simplify import simplify_graph
+from map_loader import DOWNLOAD_BUFFER, MapLoader
+import overpass_stream
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+# Berkeley boxes (north, south, east, west) inside the cached response
+BBOXES = [(37.875, 37.860, -122.255, -122.275), (37.8687, 37.8637, -122.2573, -122.2623)]
+
+
+def build_test_graph(blocks: int = 4, vertices_per_block: int = 3) -> nx.MultiDiGraph:
+    """
+    Build a grid of two-way streets with interstitial vertices on each block,
+    plus a oneway loop, a cul-de-sac and an isolated ring.
+    """
+    G = nx.MultiDiGraph(crs='EPSG:32610')
+    next_id = [1000]
+
+    def add_node(x, y):
+        node = next_id[0]
+        next_id[0] += 1
+        G.add_node(node, x=float(x), y=float(y))
+        return node
+
+    def add_street(a, b, name, way_id, oneway=False):
+        ax, ay = G.nodes[a]['x'], G.nodes[a]['y']
+        bx, by = G.nodes[b]['x'], G.nodes[b]['y']
+        chain = [a]
+        for i in range(1, vertices_per_block + 1):
+            t = i / (vertices_per_block + 1)
+            chain.append(add_node(ax + (bx - ax) * t, ay + (by - ay) * t + 0.5 * i))
+        chain.append(b)
+        for p, q in zip(chain[:-1], chain[1:]):
+            attrs = {'osmid': way_id, 'name': name, 'highway': 'residential',
+                     'oneway': oneway, 'length': 10.0}
+            G.add_edge(p, q, **attrs)
+            if not oneway:
+                G.add_edge(q, p, **attrs)
+
+    corners = {(i, j): add_node(i * 100, j * 100)
+               for i in range(blocks + 1) for j in range(blocks + 1)}
+    way_id = 1
+    for i in range(blocks + 1):
+        for j in range(blocks + 1):
+            if i < blocks:
+                add_street(corners[i, j], corners[i + 1, j], f"Street {j}", way_id)
+                way_id += 1
+            if j < blocks:
+                add_street(corners[i, j], corners[i, j + 1], f"Avenue {i}", way_id)
+                way_id += 1
+
+    # Oneway loop leaving and returning to the same corner
+    loop_start = corners[0, 0]
+    a = add_node(-50, -20)
+    b = add_node(-60, -60)
+    G.add_edge(loop_start, a, osmid=900, name='Loop', oneway=True, length=5.0)
+    G.add_edge(a, b, osmid=901, name='Loop', oneway=True, length=6.0)
+    G.add_edge(b, loop_start, osmid=901, name='Loop', oneway=True, length=7.0)
+
+    # Cul-de-sac with interstitial vertices
+    add_street(corners[blocks, blocks], add_node(blocks * 100 + 80, blocks * 100 + 80),
+               'Court', 950)
+
+    # Isolated ring of interstitial nodes
+    ring = [add_node(-500 + 10 * k, -500 + (k % 2) * 5) for k in range(4)]
+    for p, q in zip(ring, ring[1:] + ring[:1]):
+        G.add_edge(p, q, osmid=990, length=3.0)
+        G.add_edge(q, p, osmid=990, length=3.0)
+
+    return G
+
+
+def test_matches_osmnx():
+    """Test that nodes, edges and lengths match ox.simplify_graph."""
+    print("=" * 60)
+    print("SIMPLIFICATION TOPOLOGY TEST")
+    print("=" * 60)
+
+    G = build_test_graph()
+    expected = ox.simplify_graph(G.copy())
+    result = simplify_graph(G.copy())
+
+    print(f"  Input: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+    print(f"  OSMnx: {expected.number_of_nodes()} nodes, {expected.number_of_edges()} edges")
+    print(f"  Ours:  {result.number_of_nodes()} nodes, {result.number_of_edges()} edges")
+
+    assert set(expected.nodes()) == set(result.nodes()), "Node sets differ"
+
+    def edge_summary(graph):
+        return sorted((u, v, round(d['length'], 6)) for u, v, d in graph.edges(data=True))
+
+    assert edge_summary(expected) == edge_summary(result), "Edges or lengths differ"
+
+    for u, v, data in result.edges(data=True):
+        coords = data.get('coords')
+        if coords is None:
+            continue
+        assert tuple(coords[0]) == (result.nodes[u]['x'], result.nodes[u]['y']) and \
+            tuple(coords[-1]) == (result.nodes[v]['x'], result.nodes[v]['y']), \
+            f"Coordinates of edge {u}->{v} do not start/end at its nodes"
+
+    loop = [d for u, v, d in result.edges(data=True) if d.get('name') == 'Loop']
+    assert loop and sorted(loop[0]['osmid']) == [900, 901], "Merged edge lost its OSM way IDs"
+
+    print("  ✓ Topology, lengths, coordinates and way IDs match")
+
+
+def test_full_load_matches_osmnx():
+    """Test that a full bbox load has the topology of an OSMnx-simplified load."""
+    print("\n" + "=" * 60)
+    print("FULL LOAD TOPOLOGY TEST")
+    print("=" * 60)
+
+    def odd_nodes(graph):
+        return sum(1 for _, degree in graph.degree() if degree % 2 == 1)
+
+    def edge_summary(graph):
+        return sorted((u, v, round(d['length'], 3)) for u, v, d in graph.edges(data=True))
+
+    cache_folder = ox.settings.cache_folder
+    with tempfile.TemporaryDirectory() as tmp:
+        ox.settings.cache_folder = tmp
+        try:
+            for north, south, east, west in BBOXES:
+                # Serve the cached response for the query OSMnx sends
+                area = ox.utils_geo.bbox_to_poly((west, south, east, north))
+                buffered = ox.utils_geo.buffer_geometry(area, DOWNLOAD_BUFFER)
+                for query in overpass_stream.network_queries(buffered, 'drive'):
+                    shutil.copy(CACHE_FILE, overpass_stream.cache_path_for_query(query))
+
+                expected = ox.graph_from_bbox((west, south, east, north), network_type='drive')
+                result = MapLoader('drive').load_by_bbox(north, south, east, west)
+                print(f"  N={north}: OSMnx {len(expected)} nodes, {expected.number_of_edges()} "
+                      f"edges, {odd_nodes(expected)} odd; ours {len(result)} nodes, "
+                      f"{result.number_of_edges()} edges, {odd_nodes(result)} odd")
+
+                assert set(expected.nodes) == set(result.nodes), \
+                    f"Node sets differ for N={north}"
+                assert edge_summary(expected) == edge_summary(result), \
+                    f"Edges or lengths differ for N={north}"
+                assert all(result.nodes[n]['street_count'] == expected.nodes[n]['street_count']
+                           for n in result.nodes), f"Street counts differ for N={north}"
+        finally:
+            ox.settings.cache_folder = cache_folder
+
+    print("  ✓ Boundary intersections kept: nodes, edges and odd nodes match OSMnx")
+
+
+def test_speed():
+    """Compare running time on a city-sized synthetic grid."""
+    print("\n" + "=" * 60)
+    print("SIMPLIFICATION SPEED TEST")
+    print("=" * 60)
+
+    G = build_test_graph(blocks=40, vertices_per_block=4)
+    print(f"  Input: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+
+    H = G.copy()
+    start = time.time()
+    ox.simplify_graph(H)
+    osmnx_time = time.time() - start
+
+    H = G.copy()
+    start = time.time()
+    simplify_graph(H)
+    our_time = time.time() - start
+
+    print(f"  OSMnx: {osmnx_time:.2f}s")
+    print(f"  Ours:  {our_time:.2f}s ({osmnx_time / max(our_time, 1e-9):.1f}x)")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all simplification tests."""
+    results = [
+        ("Topology matches OSMnx", run_test(test_matches_osmnx)),
+        ("Full load matches OSMnx", run_test(test_full_load_matches_osmnx)),
+        ("Speed comparison", run_test(test_speed)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Test memoized, incrementally updated graph statistics.
+Uses synthetic graphs so it runs without OSM access.
+"""
+
+import gc
+import random
+import sys
+import time
+import networkx as nx
+import graph_stats as graph_stats_module
+from graph_repair import repair_graph
+from graph_stats import (graph_stats, invalidate_stats, record_edge_added,
+                         record_edge_removed, record_node_removed, track_stats)
+
+
+def build_test_graph(size: int = 30) -> nx.MultiDiGraph:
+    """Build a grid of two-way streets with a few oneway blocks."""
+    G = nx.MultiDiGraph()
+    rng = random.Random(0)
+    for i in range(size):
+        for j in range(size):
+            for a, b in (((i, j), (i + 1, j)), ((i, j), (i, j + 1))):
+                if b[0] >= size or b[1] >= size:
+                    continue
+                length = rng.uniform(50, 150)
+                G.add_edge(a, b, length=length)
+                if rng.random() > 0.1:
+                    G.add_edge(b, a, length=length)
+    return G
+
+
+def reference_stats(graph: nx.MultiDiGraph) -> dict:
+    """Statistics computed directly with NetworkX, as get_graph_stats used to."""
+    odd = {n for n in graph.nodes() if (graph.in_degree(n) + graph.out_degree(n)) % 2 == 1}
+    return {
+        'n_nodes': graph.number_of_nodes(),
+        'n_edges': graph.number_of_edges(),
+        'total_edge_length': sum(d['length'] for _, _, d in graph.edges(data=True)),
+        'is_strongly_connected': nx.is_strongly_connected(graph),
+        'is_eulerian': nx.is_eulerian(graph),
+        'odd': odd,
+    }
+
+
+def matches(stats: dict, reference: dict) -> bool:
+    return (all(stats[k] == reference[k] for k in
+                ('n_nodes', 'n_edges', 'is_strongly_connected', 'is_eulerian')) and
+            abs(stats['total_edge_length'] - reference['total_edge_length']) < 1e-6 and
+            stats['n_odd_degree_nodes'] == len(reference['odd']) and
+            set(stats['odd_degree_nodes']) <= reference['odd'])
+
+
+def test_matches_networkx():
+    """Test that statistics match NetworkX and are memoized."""
+    print("=" * 60)
+    print("GRAPH STATISTICS TEST")
+    print("=" * 60)
+
+    G = build_test_graph()
+    start = time.time()
+    stats = graph_stats(G)
+    first = time.time() - start
+    start = time.time()
+    graph_stats(G)
+    second = time.time() - start
+    print(f"  First call {first * 1000:.1f} ms, memoized call {second * 1000:.3f} ms")
+
+    assert matches(stats, reference_stats(G)), "Statistics differ from NetworkX"
+
+    # A copy must not share (and corrupt) the original's statistics
+    H = G.copy()
+    u, v, key, data = next(iter(H.edges(keys=True, data=True)))
+    H.remove_edge(u, v, key)
+    record_edge_removed(H, u, v, data['length'])
+    assert matches(graph_stats(G), reference_stats(G)) and \
+        matches(graph_stats(H), reference_stats(H)), "Copy shares statistics with the original"
+
+    print("  ✓ Statistics match NetworkX")
+
+
+def test_incremental_updates():
+    """Test that recorded mutations keep the statistics exact."""
+    print("\n" + "=" * 60)
+    print("INCREMENTAL UPDATE TEST")
+    print("=" * 60)
+
+    G = build_test_graph(size=12)
+    graph_stats(G)
+    rng = random.Random(1)
+    nodes = list(G.nodes)
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.45:
+            u, v = rng.choice(nodes), rng.choice(nodes)
+            length = rng.uniform(1, 100)
+            G.add_edge(u, v, length=length)
+            record_edge_added(G, u, v, length)
+        elif action < 0.9 and G.number_of_edges():
+            u, v, key, data = rng.choice(list(G.edges(keys=True, data=True)))
+            G.remove_edge(u, v, key)
+            record_edge_removed(G, u, v, data['length'])
+        else:
+            node = rng.choice(list(G.nodes))
+            for u, v, key, data in list(G.in_edges(node, keys=True, data=True)) + \
+                    list(G.out_edges(node, keys=True, data=True)):
+                if G.has_edge(u, v, key):
+                    G.remove_edge(u, v, key)
+                    record_edge_removed(G, u, v, data['length'])
+            G.remove_node(node)
+            record_node_removed(G, node)
+            nodes.remove(node)
+
+        if step % 25 == 0:
+            assert matches(graph_stats(G), reference_stats(G)), \
+                f"Statistics drifted at step {step}"
+
+    incremental = graph_stats(G)
+    invalidate_stats(G)
+    assert matches(incremental, reference_stats(G)) and \
+        incremental['n_odd_degree_nodes'] == graph_stats(G)['n_odd_degree_nodes'], \
+        "Incremental statistics differ from a full recompute"
+
+    print("  ✓ 300 recorded mutations kept statistics exact")
+
+
+def test_unrecorded_changes():
+    """Test that unrecorded edge changes and reused ids never give stale statistics."""
+    print("\n" + "=" * 60)
+    print("UNRECORDED CHANGE TEST")
+    print("=" * 60)
+
+    G = build_test_graph(size=10)
+    graph_stats(G)
+    u, v, key = next(iter(G.edges(keys=True)))
+    G.remove_edge(u, v, key)
+    assert matches(graph_stats(G), reference_stats(G)), "Unrecorded edge removal went unnoticed"
+    G.add_edge(u, v, length=1.0)
+    assert matches(graph_stats(G), reference_stats(G)), "Unrecorded edge addition went unnoticed"
+
+    # Graphs of the same size created after one is freed often get its id()
+    for _ in range(20):
+        H = build_test_graph(size=10)
+        graph_stats(H)
+        del H
+        gc.collect()
+        H = build_test_graph(size=10)
+        H.remove_edge(*next(iter(H.edges(keys=True))))
+        H.add_edge(0, 1, length=5000.0)
+        assert matches(graph_stats(H), reference_stats(H)), "Statistics leaked to a new graph"
+        del H
+
+    print("  ✓ Unrecorded changes and new graphs recompute statistics")
+
+
+def test_tracked_repair():
+    """Test that a repair run after track_stats() keeps the statistics exact."""
+    print("\n" + "=" * 60)
+    print("TRACKED REPAIR TEST")
+    print("=" * 60)
+
+    G = build_test_graph(size=12)
+    rng = random.Random(2)
+    nodes = list(G.nodes)
+    for _ in range(20):
+        node = rng.choice(nodes)
+        G.add_edge(node, node, length=rng.uniform(1, 50))
+        u, v, data = rng.choice(list(G.edges(data=True)))
+        G.add_edge(u, v, **data)
+
+    track_stats(G)
+    state = graph_stats_module._STATS[G]
+    report = repair_graph(G, drop_self_loops=True)
+    assert report['self_loops'] and report['duplicate_edges'], "Repair found nothing to fix"
+    assert graph_stats_module._STATS[G] is state, "Repair forced a recompute"
+
+    tracked = graph_stats(G)
+    invalidate_stats(G)
+    assert matches(tracked, reference_stats(G)) and \
+        tracked['n_odd_degree_nodes'] == graph_stats(G)['n_odd_degree_nodes'], \
+        "Tracked statistics differ from a full recompute"
+
+    print(f"  ✓ {report['edges_before'] - report['edges_after']} repaired edges "
+          f"updated the statistics incrementally")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all graph statistics tests."""
+    results = [
+        ("Matches NetworkX", run_test(test_matches_networkx)),
+        ("Incremental updates", run_test(test_incremental_updates)),
+        ("Unrecorded changes", run_test(test_unrecorded_changes)),
+        ("Tracked repair", run_test(test_tracked_repair)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test the lean HTML map export.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from shapely.geometry import LineString, box
+
+import overpass_stream
+from html_map import render_route_html
+from map_loader import MapLoader
+from route_planner import RoutePlanner
+
+# Degrees to local meters around Berkeley
+METERS = np.array([111320.0 * np.cos(np.radians(37.87)), 111320.0])
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner(repeat=1):
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * repeat
+    return planner
+
+
+def page_payload(page):
+    """The route payload embedded in a page."""
+    match = re.search(r'<script type="application/json" id="route">(.*?)</script>', page, re.S)
+    return json.loads(match.group(1))
+
+
+def decode_polyline(encoded, precision):
+    """Decode a Google encoded polyline to (n, 2) lon/lat points."""
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    lat_lon = np.cumsum(np.array(values).reshape(-1, 2), axis=0) / 10 ** precision
+    return lat_lon[:, ::-1]
+
+
+def test_page_geometry():
+    """Test that the page carries the GeoJSON export's line, simplified."""
+    print("=" * 60)
+    print("PAGE GEOMETRY TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    buffer = io.StringIO()
+    exporter.export_to_html(planner.route, buffer, route_name="Berkeley </script> & co")
+    page = buffer.getvalue()
+    geojson = exporter.geojson_data(planner.route)
+    line = np.array(geojson['features'][0]['geometry']['coordinates'])
+
+    payload = page_payload(page)
+    points = decode_polyline(payload['polyline'], payload['precision'])
+    assert payload['name'] == "Berkeley </script> & co" and payload['points'] == len(points), \
+        "Payload header wrong"
+    assert '<title>Berkeley &lt;/script&gt; &amp; co</title>' in page, \
+        "Route name not escaped in the page"
+    assert np.allclose(points[[0, -1]], line[[0, -1]], atol=1e-5) and len(points) < len(line), \
+        "Line not simplified from the GeoJSON line"
+    # Every drawn point is a point of the street geometry, up to rounding
+    route_line = LineString(line * METERS)
+    distances = route_line.distance(LineString(points * METERS).interpolate(
+        np.linspace(0, 1, 2000), normalized=True))
+    assert np.max(distances) <= 2.0 + 1.5, f"Drawn line {np.max(distances):.1f} m from the route"
+
+    full = page_payload(render_route_html(line, tolerance=None, precision=6))
+    assert np.allclose(decode_polyline(full['polyline'], 6), line, atol=6e-7), \
+        "Unsimplified line differs"
+    empty = page_payload(render_route_html(np.zeros((0, 2))))
+    assert empty['points'] == 0 and empty['polyline'] == '', "Empty route not handled"
+
+    print(f"  {len(points)} of {len(line)} points drawn, "
+          f"{np.max(distances):.2f} m from the route at most")
+    print("  ✓ Page draws the street geometry")
+
+
+def test_size_and_speed():
+    """Test that the page is much smaller and faster to make than the Folium map."""
+    print("\n" + "=" * 60)
+    print("SIZE AND SPEED TEST")
+    print("=" * 60)
+
+    planner = load_planner(repeat=20)
+    exporter = planner.exporter
+    exporter.geometry_table()
+
+    # Best of three, so a garbage collection pause does not decide the test
+    lean_time = folium_time = float('inf')
+    for _ in range(3):
+        start = time.time()
+        lean = exporter.export_to_string(planner.route, 'html')
+        lean_time = min(lean_time, time.time() - start)
+        buffer = io.StringIO()
+        start = time.time()
+        exporter.visualize_route_folium(planner.route, buffer)
+        folium_time = min(folium_time, time.time() - start)
+    folium_page = buffer.getvalue()
+
+    print(f"  {len(planner.route)} edges: lean {len(lean) / 1e3:.0f} kB in "
+          f"{lean_time * 1000:.0f} ms, Folium {len(folium_page) / 1e3:.0f} kB in "
+          f"{folium_time * 1000:.0f} ms")
+    # Although the page carries the street geometry, not just the nodes
+    assert len(lean) * 5 <= len(folium_page), "Page not much smaller than the Folium map"
+    assert lean_time * 3 <= folium_time, "Page not much faster to make than the Folium map"
+
+    print("  ✓ Lean page")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all HTML map tests."""
+    results = [
+        ("Page geometry", run_test(test_page_geometry)),
+        ("Size and speed", run_test(test_size_and_speed)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
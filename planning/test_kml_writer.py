@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Test the streaming KML and KMZ writer.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import io
+import json
+import os
+import sys
+import tracemalloc
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+from shapely.geometry import box
+
+import overpass_stream
+from kml_writer import iter_route_kml, write_route_kmz
+from map_loader import MapLoader
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+KML = '{http://www.opengis.net/kml/2.2}'
+
+
+def load_planner(repeat=2):
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in list(graph.edges(data=True))[::9]:
+        data.pop('coords', None)
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * repeat
+    return planner
+
+
+def original_kml(table, route, route_name="StreetView Route"):
+    """The KML document as export_to_kml built it in one string."""
+    u_idx, v_idx, _ = table.route_indices(route)
+    nodes = np.column_stack([u_idx, v_idx]).ravel()
+    nodes = nodes[table.node_valid[nodes]]
+    _, first = np.unique(nodes, return_index=True)
+    nodes = nodes[np.sort(first)]
+    coords = [f"          {lon},{lat},0"
+              for lon, lat in zip(table.node_lon[nodes].tolist(), table.node_lat[nodes].tolist())]
+    return """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+  <Document>
+    <name>{name}</name>
+    <description>Route generated for street coverage</description>
+    <Style id="route">
+      <LineStyle>
+        <color>ff0000ff</color>
+        <width>4</width>
+      </LineStyle>
+    </Style>
+    <Placemark>
+      <name>{name}</name>
+      <styleUrl>#route</styleUrl>
+      <LineString>
+        <coordinates>
+{coordinates}
+        </coordinates>
+      </LineString>
+    </Placemark>
+  </Document>
+</kml>""".format(name=route_name, coordinates="\n".join(coords))
+
+
+def placemarks_of(document):
+    """Parse placemarks as (name, style, data, coordinates) tuples."""
+    result = []
+    for placemark in ET.fromstring(document).iter(KML + 'Placemark'):
+        data = {d.get('name'): int(d.find(KML + 'value').text)
+                for d in placemark.iter(KML + 'Data')}
+        coordinates = np.array([[float(x) for x in item.split(',')[:2]] for item in
+                                placemark.find(f'.//{KML}coordinates').text.split()])
+        result.append((placemark.find(KML + 'name').text,
+                       placemark.find(KML + 'styleUrl').text, data, coordinates))
+    return result
+
+
+def test_route_placemark():
+    """Test that the single-placemark document is unchanged."""
+    print("=" * 60)
+    print("ROUTE PLACEMARK TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    table = planner.exporter.geometry_table()
+    route = planner.route
+    for chunk_edges in (1, 97, 4096):
+        actual = ''.join(iter_route_kml(table, route, chunk_edges=chunk_edges))
+        assert actual == original_kml(table, route), \
+            f"Document with {chunk_edges}-edge chunks differs from the original"
+    assert ''.join(iter_route_kml(table, [])) == original_kml(table, []), \
+        "Empty route differs from the original"
+
+    print(f"  {len(route)} edges: same document as before")
+    print("  ✓ Route placemark unchanged")
+
+
+def test_segment_placemarks():
+    """Test one placemark per traversed street with its geometry and traversal."""
+    print("\n" + "=" * 60)
+    print("SEGMENT PLACEMARKS TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    table = exporter.geometry_table()
+    route = planner.route
+
+    document = ''.join(iter_route_kml(table, route, route_name="A & B", placemarks='segment'))
+    assert document == ''.join(iter_route_kml(table, route, route_name="A & B",
+                                              placemarks='segment', chunk_edges=97)), \
+        "Document depends on the chunk size"
+    placemarks = placemarks_of(document)
+
+    segments = json.loads(''.join(exporter.iter_geojson(route, include_segments=True)))
+    traversal = {f['properties']['segment_index']: f['properties']['traversal_number']
+                 for f in segments['features']}
+    e_idx = table.route_indices(route)[2]
+    for name, style, data, coordinates in placemarks:
+        index = data['segment_index']
+        if index in traversal:
+            assert data['traversal_number'] == traversal[index], \
+                f"Traversal number differs from GeoJSON for segment {index}"
+        assert style == ('#route' if data['traversal_number'] == 1 else '#repeat'), \
+            f"Wrong style for segment {index}"
+        edge = int(e_idx[index])
+        if edge >= 0 and table.has_geometry[edge]:
+            assert np.allclose(coordinates, table.edge_coords(edge), atol=6e-7), \
+                f"Segment {index} does not carry its street geometry"
+    assert len(placemarks) >= len(segments['features']), "Segments missing"
+    named = sum(not name.startswith('Segment ') for name, _, _, _ in placemarks)
+
+    try:
+        ''.join(iter_route_kml(table, route, placemarks='street'))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Unknown placemark mode accepted")
+
+    print(f"  {len(placemarks)} placemarks, {named} named after their street, "
+          f"{sum(style == '#repeat' for _, style, _, _ in placemarks)} repeats")
+    print("  ✓ One placemark per street segment")
+
+
+def test_chunk_placemarks():
+    """Test that chunk placemarks join up to the route line."""
+    print("\n" + "=" * 60)
+    print("CHUNK PLACEMARKS TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    table = planner.exporter.geometry_table()
+    route = planner.route
+    placemarks = placemarks_of(''.join(iter_route_kml(table, route, placemarks='chunk',
+                                                      chunk_edges=250)))
+    line = np.concatenate([placemarks[0][3]] + [p[3][1:] for p in placemarks[1:]])
+    expected, _ = planner.exporter._route_points(table, route)
+    assert len(placemarks) == -(-len(route) // 250) and np.allclose(line, expected, atol=6e-7), \
+        "Chunk placemarks do not join up to the route line"
+    for previous, placemark in zip(placemarks, placemarks[1:]):
+        assert placemark[2]['first_segment'] == previous[2]['last_segment'] + 1, \
+            "Chunk ranges not consecutive"
+
+    print(f"  {len(placemarks)} placemarks, {len(line)} points")
+    print("  ✓ Chunks join up")
+
+
+def test_streaming_kmz():
+    """Test that KMZ is written in bounded memory, even to unseekable output."""
+    print("\n" + "=" * 60)
+    print("STREAMING KMZ TEST")
+    print("=" * 60)
+
+    class Unseekable(io.RawIOBase):
+        """Write-only stream, like a socket; keeps the data unless counting only."""
+        def __init__(self, keep=True):
+            self.data = bytearray() if keep else None
+            self.size = 0
+
+        def writable(self):
+            return True
+
+        def write(self, b):
+            if self.data is not None:
+                self.data.extend(b)
+            self.size += len(b)
+            return len(b)
+
+    peaks = {}
+    for repeat in (10, 40):
+        planner = load_planner(repeat=repeat)
+        table = planner.exporter.geometry_table()
+        route = planner.route
+        tracemalloc.start()
+        size = write_route_kmz(table, route, Unseekable(keep=False), placemarks='segment',
+                               chunk_edges=1024)
+        peaks[repeat] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {len(route)} edges: KML {size / 1e6:.1f} MB, "
+              f"peak memory {peaks[repeat] / 1e6:.1f} MB")
+    assert peaks[40] <= peaks[10] * 1.5, "Memory grows with the route"
+
+    kml = ''.join(iter_route_kml(table, route, placemarks='segment'))
+    output = Unseekable()
+    write_route_kmz(table, route, output, placemarks='segment')
+    with zipfile.ZipFile(io.BytesIO(bytes(output.data))) as archive:
+        assert archive.namelist() == ['doc.kml'] and archive.read('doc.kml').decode() == kml, \
+            "KMZ does not hold the KML document"
+    # Seekable output gets sizes in the entry header instead of after the data
+    buffer = io.BytesIO()
+    planner.exporter.export_to_kmz(route, buffer, placemarks='segment')
+    with zipfile.ZipFile(buffer) as archive:
+        assert archive.read('doc.kml').decode() == kml, "export_to_kmz differs from the writer"
+
+    print(f"  KMZ {len(output.data) / 1e6:.1f} MB")
+    print("  ✓ KMZ streamed in bounded memory")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all KML writer tests."""
+    results = [
+        ("Route placemark", run_test(test_route_placemark)),
+        ("Segment placemarks", run_test(test_segment_placemarks)),
+        ("Chunk placemarks", run_test(test_chunk_placemarks)),
+        ("Streaming KMZ", run_test(test_streaming_kmz)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
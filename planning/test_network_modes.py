@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Test deriving per-mode graphs from a shared 'all' network.
+Uses a synthetic Overpass response so it runs without OSM access.
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import network_modes
+import overpass_stream
+from map_loader import MapLoader
+
+# (highway, extra tags) for each street of the synthetic grid, cycled
+STREET_TAGS = [
+    ('residential', {}),
+    ('primary', {'oneway': 'yes'}),
+    ('footway', {}),
+    ('cycleway', {}),
+    ('service', {'service': 'parking_aisle'}),
+    ('residential', {'access': 'private'}),
+    ('track', {}),
+    ('motorway', {'oneway': 'yes'}),
+    ('path', {'foot': 'no'}),
+    ('secondary', {'sidewalk': 'separate'}),
+    ('tertiary', {'oneway': '-1'}),
+    ('residential', {'motor_vehicle': 'no'}),
+    ('steps', {}),
+    ('service', {}),
+    ('unclassified', {'bicycle': 'no'}),
+]
+
+
+def build_all_response(size: int = 12) -> dict:
+    """Build an Overpass 'all' response: a street grid with mixed tags plus a footway island."""
+    elements = []
+
+    def node_id(i, j):
+        return 1000 + i * 100 + j
+
+    for i in range(size):
+        for j in range(size):
+            elements.append({'type': 'node', 'id': node_id(i, j),
+                             'lat': 37.80 + i * 0.001, 'lon': -122.30 + j * 0.001})
+    way_id = 1
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((1, 0), (0, 1)):
+                if i + di >= size or j + dj >= size:
+                    continue
+                highway, extra = STREET_TAGS[way_id % len(STREET_TAGS)]
+                elements.append({'type': 'way', 'id': way_id,
+                                 'nodes': [node_id(i, j), node_id(i + di, j + dj)],
+                                 'tags': {'highway': highway, 'name': f'Street {way_id}', **extra}})
+                way_id += 1
+
+    # Footway island away from the grid
+    island = [(90000 + k, 37.70 + k * 0.001, -122.40) for k in range(4)]
+    elements.extend({'type': 'node', 'id': n, 'lat': lat, 'lon': lon} for n, lat, lon in island)
+    elements.append({'type': 'way', 'id': 99999, 'nodes': [n for n, _, _ in island],
+                     'tags': {'highway': 'footway'}})
+    return {'version': 0.6, 'elements': elements}
+
+
+def filter_response(response: dict, network_type: str) -> dict:
+    """Apply a network type's Overpass way filter to a response, way by way."""
+    clauses = network_modes.network_filter_clauses(network_type)
+
+    def passes(tags):
+        for tag, pattern in clauses:
+            if pattern is None:
+                if tag not in tags:
+                    return False
+            elif tag in tags and re.search(pattern, tags[tag]):
+                return False
+        return True
+
+    return {'version': 0.6, 'elements': [
+        e for e in response['elements'] if e['type'] == 'node' or passes(e.get('tags', {}))]}
+
+
+def write_json(data: dict, folder: str, name: str) -> str:
+    """Write a response to a file and return its path."""
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return path
+
+
+def edge_multiset(graph):
+    return Counter((u, v) for u, v in graph.edges())
+
+
+def test_derived_graphs_match_direct_loads():
+    """Test that each derived mode graph matches loading that mode directly."""
+    print("=" * 60)
+    print("DERIVED MODE GRAPHS TEST")
+    print("=" * 60)
+
+    network_modes.ensure_filter_tags()
+    response = build_all_response()
+    with tempfile.TemporaryDirectory() as tmp:
+        all_path = write_json(response, tmp, 'all.json')
+        superset = network_modes.SupersetNetwork(
+            overpass_stream.build_graph([all_path], 'all', retain_all=True))
+
+        for network_type in ('drive', 'drive_service', 'walk', 'bike', 'all_public'):
+            mode_path = write_json(filter_response(response, network_type), tmp,
+                                   f'{network_type}.json')
+            expected = overpass_stream.build_graph([mode_path], network_type)
+            derived = superset.derive(network_type)
+
+            same = (set(expected.nodes) == set(derived.nodes) and
+                    edge_multiset(expected) == edge_multiset(derived))
+            print(f"  {'✓' if same else '✗'} {network_type:14} "
+                  f"{derived.number_of_nodes():4} nodes, {derived.number_of_edges():4} edges")
+            assert same, f"Derived {network_type} graph differs from a direct load"
+
+        walk = superset.derive('walk')
+        assert not any(data['oneway'] for _, _, data in walk.edges(data=True)), \
+            "Walk graph has oneway edges"
+        assert superset.graph.number_of_edges() == len(superset.edges), \
+            "Deriving modes changed the cached superset"
+
+    print("  ✓ Derived graphs match direct loads of each mode")
+
+
+def test_shared_download_cache():
+    """Test that MapLoader switches modes for a cached region without downloading."""
+    print("\n" + "=" * 60)
+    print("SHARED DOWNLOAD CACHE TEST")
+    print("=" * 60)
+
+    network_modes.ensure_filter_tags()
+    with tempfile.TemporaryDirectory() as tmp:
+        all_path = write_json(build_all_response(size=40), tmp, 'all.json')
+        start = time.time()
+        graph = overpass_stream.build_graph([all_path], 'all', retain_all=True)
+        download_time = time.time() - start
+
+    region = ('bbox', 37.84, 37.80, -122.26, -122.30)
+    network_modes.superset_cache.clear()
+    network_modes.superset_cache.put(region, graph)
+
+    # Any download attempt would fail: there is no network access here
+    for network_type in ('drive', 'walk', 'bike'):
+        loader = MapLoader(network_type, shared_download=True)
+        start = time.time()
+        result = loader.load_by_bbox(*region[1:])
+        print(f"  {network_type:6} {result.number_of_nodes():5} nodes, "
+              f"{result.number_of_edges():5} edges in {time.time() - start:.2f}s "
+              f"(parsing the superset took {download_time:.2f}s)")
+
+    stats = network_modes.superset_cache.stats()
+    network_modes.superset_cache.clear()
+    assert stats['regions'] == 1, f"Expected one cached region, found {stats['regions']}"
+
+    print("  ✓ All modes derived from one cached download")
+
+
+def test_superset_budget():
+    """Test that the superset cache evicts by memory and skips oversized networks."""
+    print("\n" + "=" * 60)
+    print("SUPERSET BUDGET TEST")
+    print("=" * 60)
+
+    network_modes.ensure_filter_tags()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_json(build_all_response(size=12), tmp, 'all.json')
+        graph = overpass_stream.build_graph([path], 'all', retain_all=True)
+    size_mb = network_modes.SupersetNetwork(graph).memory_bytes / 1e6
+    print(f"  One superset network: {size_mb:.2f} MB")
+
+    cache = network_modes.SupersetCache(memory_budget_mb=size_mb * 2.5)
+    for region in ('a', 'b', 'c'):
+        cache.put(region, graph)
+    stats = cache.stats()
+    assert stats['regions'] == 2 and cache.get('a') is None and cache.get('c') is not None, \
+        f"Least recently used network not evicted: {stats}"
+    assert stats['memory_mb'] <= stats['memory_budget_mb'], f"Budget exceeded: {stats}"
+
+    small = network_modes.SupersetCache(memory_budget_mb=size_mb / 2)
+    assert small.put('a', graph) is not None and small.stats()['regions'] == 0, \
+        "Network larger than the budget was cached"
+
+    print("  ✓ Superset networks evicted by memory budget")
+
+
+def test_backend_shared_download():
+    """Test that the backend shares downloads only once a region is planned for two modes."""
+    print("\n" + "=" * 60)
+    print("BACKEND SHARED DOWNLOAD TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    from route_service import RouteService
+
+    service = RouteService()
+    region = ('bbox', 37.84, 37.80, -122.26, -122.30)
+    shared = [service._create_planner(network_type, region).map_loader.shared_download
+              for network_type in ('drive', 'drive', 'walk', 'bike')]
+    other = service._create_planner('drive', ('bbox', 37.85, 37.80, -122.26, -122.30))
+    print(f"  drive, drive, walk, bike: shared download {shared}")
+
+    assert shared == [False, False, True, True], f"Unexpected shared downloads {shared}"
+    assert not other.map_loader.shared_download, "Shared download for a new region"
+
+    print("  ✓ Single-mode requests download only their own network")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all network mode tests."""
+    results = [
+        ("Derived graphs match", run_test(test_derived_graphs_match_direct_loads)),
+        ("Shared download cache", run_test(test_shared_download_cache)),
+        ("Superset budget", run_test(test_superset_budget)),
+        ("Backend shared download", run_test(test_backend_shared_download)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Test streaming Overpass ingestion: incremental parsing, cache downloads and
+graph building. Uses a cached Overpass response from cache/ and a local stub
+server, so it runs without OSM access.
+"""
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import osmnx as ox
+from shapely.geometry import Polygon
+
+import overpass_stream
+from map_loader import DOWNLOAD_BUFFER, MapLoader
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+class StubOverpass:
+    """Local server answering every query with a fixed response body."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                stub.requests += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_response() -> dict:
+    """
+    Streets along a row of nodes 1-5, plus a separate two-node street.
+
+    Way 10 is two-way (1-2-3), way 11 oneway along its node order (3-4),
+    way 12 oneway against it (oneway=-1, nodes 5-4), and way 13 (6-7) is
+    not connected to the rest. Node 99 is referenced but missing.
+    """
+    nodes = [{'type': 'node', 'id': i, 'lat': 37.87, 'lon': -122.27 + i * 0.001}
+             for i in range(1, 8)]
+    ways = [
+        {'type': 'way', 'id': 10, 'nodes': [1, 2, 3],
+         'tags': {'highway': 'residential', 'name': 'Two Way Street'}},
+        {'type': 'way', 'id': 11, 'nodes': [3, 4],
+         'tags': {'highway': 'residential', 'oneway': 'yes'}},
+        {'type': 'way', 'id': 12, 'nodes': [5, 4],
+         'tags': {'highway': 'residential', 'oneway': '-1'}},
+        {'type': 'way', 'id': 13, 'nodes': [6, 7, 99],
+         'tags': {'highway': 'residential'}},
+    ]
+    return {'version': 0.6, 'elements': nodes + ways}
+
+
+def write_json(data: dict, folder: str, name: str) -> str:
+    """Write a response to a file and return its path."""
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return path
+
+
+def test_iter_elements():
+    """Test that elements split across read chunks decode as json.load reads them."""
+    print("=" * 60)
+    print("INCREMENTAL PARSING TEST")
+    print("=" * 60)
+
+    with open(CACHE_FILE) as f:
+        text = f.read()
+    expected = json.loads(text)['elements']
+
+    # Chunks much smaller than a way element, so most elements need refills
+    elements = list(overpass_stream.iter_elements(io.StringIO(text), chunk_size=97))
+    assert elements == expected, "Elements differ from json.load with 97-character chunks"
+    print(f"  {len(elements)} elements from 97-character chunks")
+
+    # Small enough that the "elements" key itself is split
+    small = json.dumps({'version': 0.6, 'generator': 'stub', 'elements': expected[:50]},
+                       indent=1)
+    for chunk_size in (1, 5, 64):
+        elements = list(overpass_stream.iter_elements(io.StringIO(small), chunk_size=chunk_size))
+        assert elements == expected[:50], f"Elements differ with {chunk_size}-character chunks"
+
+    for text, problem in (('{"version": 0.6}', "no elements array"),
+                          ('{"elements": [{"type": "node", "id": 1}', "truncated response")):
+        try:
+            list(overpass_stream.iter_elements(io.StringIO(text), chunk_size=8))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Response with {problem} accepted")
+
+    print("  ✓ Split elements decoded, malformed responses rejected")
+
+
+def test_remark_and_cache():
+    """Test that incomplete responses are rejected and leave no files behind."""
+    print("\n" + "=" * 60)
+    print("REMARK AND CACHE TEST")
+    print("=" * 60)
+
+    response = synthetic_response()
+    partial = dict(response, remark="runtime error: Query timed out in \"query\" at line 1")
+    try:
+        list(overpass_stream.iter_elements(io.StringIO(json.dumps(partial)), chunk_size=16))
+    except ValueError as e:
+        assert 'timed out' in str(e), f"Remark not reported: {e}"
+    else:
+        raise AssertionError("Response with a remark parsed as complete")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stub = StubOverpass(json.dumps(partial).encode())
+        try:
+            try:
+                overpass_stream.fetch_to_cache('partial', overpass_url=stub.url,
+                                               cache_folder=cache_dir)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("Incomplete download cached")
+            assert os.listdir(cache_dir) == [], \
+                f"Files left after an incomplete download: {os.listdir(cache_dir)}"
+
+            stub.body = json.dumps(response).encode()
+            path = overpass_stream.fetch_to_cache('complete', overpass_url=stub.url,
+                                                  cache_folder=cache_dir)
+            assert os.listdir(cache_dir) == [os.path.basename(path)], \
+                f"Unexpected cache contents: {os.listdir(cache_dir)}"
+            assert path == overpass_stream.cache_path_for_query('complete', stub.url, cache_dir), \
+                "Response not stored under the query's cache path"
+            with open(path) as f:
+                assert json.load(f) == response, "Cached response differs from the download"
+
+            overpass_stream.fetch_to_cache('complete', overpass_url=stub.url,
+                                           cache_folder=cache_dir)
+            assert stub.requests == 2, "Cached query downloaded again"
+        finally:
+            stub.close()
+
+    print("  ✓ Remarks rejected without leaving .part files; complete responses cached")
+
+
+def test_build_graph():
+    """Test oneway handling and component selection against a small network."""
+    print("\n" + "=" * 60)
+    print("BUILD GRAPH TEST")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_json(synthetic_response(), tmp, 'response.json')
+        graph = overpass_stream.build_graph([path], 'drive')
+        whole = overpass_stream.build_graph([path], 'drive', retain_all=True)
+        walk = overpass_stream.build_graph([path], 'walk')
+
+    edges = {(u, v): data for u, v, data in graph.edges(data=True)}
+    print(f"  drive: {sorted(edges)}")
+    assert set(edges) == {(1, 2), (2, 1), (2, 3), (3, 2), (3, 4), (4, 5)}, \
+        f"Unexpected drive edges {sorted(edges)}"
+    assert not edges[(1, 2)]['oneway'] and not edges[(1, 2)]['reversed'] and \
+        edges[(2, 1)]['reversed'], "Two-way street directions wrong"
+    assert edges[(3, 4)]['oneway'] and not edges[(3, 4)]['reversed'], "oneway=yes wrong"
+    # oneway=-1 runs against the node order, and is stored turned around
+    assert edges[(4, 5)]['oneway'] and not edges[(4, 5)]['reversed'] and \
+        edges[(4, 5)]['osmid'] == 12, "oneway=-1 not turned around"
+    assert edges[(1, 2)]['name'] == 'Two Way Street' and edges[(1, 2)]['length'] > 80, \
+        "Tags or length missing"
+    assert graph.graph['crs'].startswith('EPSG:326'), f"Not projected to UTM: {graph.graph['crs']}"
+    assert set(graph.nodes[1]) == {'x', 'y', 'lat', 'lon'}, "Node attributes wrong"
+
+    # Largest weakly connected component only, unless everything is kept
+    assert 6 not in graph and {(6, 7), (7, 6)} <= set(whole.edges()), \
+        "Disconnected street handled wrong"
+    assert 99 not in whole, "Edge to a missing node kept"
+    assert {(4, 3), (5, 4)} <= set(walk.edges()), "Walk graph not two-way"
+
+    print("  ✓ Oneway directions, tags and component selection match OSMnx rules")
+
+
+def test_streamed_load_matches_osmnx():
+    """Test that streamed polygon loads use OSMnx's buffered queries and graph."""
+    print("\n" + "=" * 60)
+    print("STREAMED LOAD TEST")
+    print("=" * 60)
+
+    polygon = Polygon([(-122.272, 37.862), (-122.258, 37.864), (-122.260, 37.873),
+                       (-122.270, 37.871)])
+    old_cache, old_url = ox.settings.cache_folder, ox.settings.overpass_url
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            ox.settings.cache_folder = tmp
+            # Nothing listens here, so any request missing the cache fails
+            ox.settings.overpass_url = 'http://127.0.0.1:9/api'
+            buffered = ox.utils_geo.buffer_geometry(polygon, DOWNLOAD_BUFFER)
+            for query in overpass_stream.network_queries(buffered, 'drive'):
+                shutil.copy(CACHE_FILE, overpass_stream.cache_path_for_query(query))
+
+            streamed = MapLoader('drive', streaming=True).load_by_polygon(polygon)
+            direct = MapLoader('drive').load_by_polygon(polygon)
+        finally:
+            ox.settings.cache_folder, ox.settings.overpass_url = old_cache, old_url
+
+    print(f"  streamed: {streamed.number_of_nodes()} nodes, {streamed.number_of_edges()} edges; "
+          f"OSMnx: {direct.number_of_nodes()} nodes, {direct.number_of_edges()} edges")
+    assert set(streamed.nodes) == set(direct.nodes), "Node sets differ"
+    assert sorted(streamed.edges()) == sorted(direct.edges()), "Edges differ"
+
+    print("  ✓ Streamed and OSMnx loads share cache files and give the same graph")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all streaming ingestion tests."""
+    results = [
+        ("Incremental parsing", run_test(test_iter_elements)),
+        ("Remark and cache", run_test(test_remark_and_cache)),
+        ("Build graph", run_test(test_build_graph)),
+        ("Streamed load", run_test(test_streamed_load_matches_osmnx)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test zoom-dependent simplification of route geometry.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from shapely.geometry import box
+
+import overpass_stream
+from geojson_writer import iter_route_geojson
+from map_loader import MapLoader
+from polyline_simplify import METERS_PER_DEGREE, simplify_lines, tolerance_for_zoom
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner():
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * 2
+    return planner
+
+
+def reference_simplify(points, tolerance):
+    """Recursive Douglas-Peucker of one line, in the same local meters."""
+    if len(points) < 3:
+        return [True] * len(points)
+    a, b = points[0], points[-1]
+    ab = b - a
+    length_sq = float(ab @ ab)
+    t = np.clip(((points[1:-1] - a) @ ab) / (length_sq or 1.0), 0.0, 1.0)
+    distance = np.hypot(*(points[1:-1] - (a + ab * t[:, None])).T)
+    index = int(np.argmax(distance)) + 1
+    if distance[index - 1] <= tolerance:
+        return [True] + [False] * (len(points) - 2) + [True]
+    left = reference_simplify(points[:index + 1], tolerance)
+    right = reference_simplify(points[index:], tolerance)
+    return left + right[1:]
+
+
+def test_matches_recursive():
+    """Test that the range-parallel pass keeps the same vertices as recursion."""
+    print("=" * 60)
+    print("DOUGLAS-PEUCKER TEST")
+    print("=" * 60)
+
+    rng = np.random.default_rng(7)
+    lengths = rng.integers(1, 60, size=300)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    # Random walks around Berkeley, a few meters per step
+    steps = rng.normal(scale=2e-5, size=(offsets[-1], 2))
+    points = np.cumsum(steps, axis=0) + [-122.26, 37.87]
+
+    scale = np.array([METERS_PER_DEGREE * math.cos(math.radians(points[:, 1].mean())),
+                      METERS_PER_DEGREE])
+    for tolerance in (0.5, 2.0, 8.0):
+        start = time.time()
+        keep = simplify_lines(points, offsets, tolerance)
+        vector_time = time.time() - start
+        expected = []
+        for i in range(len(lengths)):
+            expected.extend(reference_simplify(points[offsets[i]:offsets[i + 1]] * scale, tolerance))
+        assert keep.tolist() == expected, \
+            f"Kept vertices differ from recursive Douglas-Peucker at {tolerance} m"
+        print(f"  {tolerance:g} m: {int(keep.sum())} of {len(points)} vertices kept "
+              f"in {vector_time * 1000:.1f} ms")
+
+    assert keep[offsets[:-1]].all() and keep[offsets[1:] - 1].all(), "Line endpoints dropped"
+
+    print("  ✓ Vectorized simplification matches recursion")
+
+
+def test_route_levels():
+    """Test that route levels shrink with tolerance and follow the zoom."""
+    print("\n" + "=" * 60)
+    print("ROUTE LEVELS TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    route = planner.route
+    levels = exporter.route_levels(route)
+
+    for label, masks in (("per segment", levels.masks), ("whole line", levels.line_masks)):
+        counts = [int(mask.sum()) for mask in masks.values()]
+        print(f"  {levels.n_points} points, kept {label}: {counts}")
+        assert counts == sorted(counts, reverse=True) and counts[-1] < levels.n_points, \
+            "Coarser levels do not keep fewer points"
+
+    full = exporter.geojson_data(route, include_segments=True)
+    tolerance, keep = levels.mask(tolerance=40.0)
+    coarse = exporter.geojson_data(route, include_segments=True, keep=keep)
+    assert tolerance == 32.0 and len(coarse['features']) == len(full['features']), \
+        "Simplified segments do not keep one feature per segment"
+    for a, b in zip(full['features'], coarse['features']):
+        assert a['geometry']['coordinates'][-1] == b['geometry']['coordinates'][-1], \
+            "Segment endpoint moved"
+
+    _, keep = levels.mask(tolerance=40.0, segments=False)
+    streamed = json.loads(''.join(iter_route_geojson(exporter.geometry_table(), route,
+                                                     keep=keep, chunk_edges=53)))
+    expected = exporter.geojson_data(route, keep=keep)['features'][0]['geometry']['coordinates']
+    actual = streamed['features'][0]['geometry']['coordinates']
+    assert len(actual) == len(expected) and np.allclose(actual, expected, atol=6e-7), \
+        "Streamed simplified line differs across chunks"
+
+    assert levels.mask(zoom=22) == (0.0, None) and levels.mask(zoom=8)[0] == 128.0, \
+        "Zoom levels map to the wrong tolerance"
+    assert 0.0 < tolerance_for_zoom(14, 37.87) < 10.0, "Zoom 14 tolerance not a few meters"
+
+    print("  ✓ Levels picked by tolerance and zoom")
+
+
+def test_endpoints_zoom():
+    """Test that the backend serves smaller geometry at low zoom."""
+    print("\n" + "=" * 60)
+    print("ENDPOINT ZOOM TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner()
+    backend.route_service.routes['test-route'] = {
+        'route_id': 'test-route', 'status': 'completed', 'created_at': '2024-01-01T00:00:00',
+        'area_stats': {}, 'planner': planner,
+        'geojson': planner.exporter.geojson_data(planner.route),
+    }
+
+    async def fetch(zoom):
+        route = await backend.get_route('test-route', zoom=zoom)
+        segments = await backend.get_route_segments('test-route', zoom=zoom)
+        body = ''.join([piece async for piece in segments.body_iterator])
+        return len(json.dumps(route.geojson)), len(body)
+
+    try:
+        full = asyncio.run(fetch(None))
+        city = asyncio.run(fetch(11))
+    finally:
+        del backend.route_service.routes['test-route']
+
+    print(f"  Route GeoJSON: {full[0] / 1e3:.0f} kB full, {city[0] / 1e3:.0f} kB at zoom 11")
+    print(f"  Segments: {full[1] / 1e3:.0f} kB full, {city[1] / 1e3:.0f} kB at zoom 11")
+    assert city[0] < full[0] and city[1] < full[1], "Zoomed-out geometry not smaller"
+
+    print("  ✓ Endpoints simplify by zoom")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all polyline simplification tests."""
+    results = [
+        ("Douglas-Peucker", run_test(test_matches_recursive)),
+        ("Route levels", run_test(test_route_levels)),
+        ("Endpoint zoom", run_test(test_endpoints_zoom)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test the compact encoded-polyline and binary route payloads.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi import HTTPException
+from shapely.geometry import box
+
+import overpass_stream
+from map_loader import MapLoader
+from route_encoding import (BINARY_MEDIA_TYPE, POLYLINE_MEDIA_TYPE, decode_binary,
+                            encode_polyline)
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner():
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in list(graph.edges(data=True))[::9]:
+        data.pop('coords', None)
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * 3
+    return planner
+
+
+def decode_polyline(text, precision=5):
+    """Reference decoder for Google encoded polylines, returning lon/lat."""
+    values, value, shift = [], 0, 0
+    for char in text:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    lat_lon = np.cumsum(np.array(values).reshape(-1, 2), axis=0) / 10 ** precision
+    return lat_lon[:, ::-1]
+
+
+def test_polyline():
+    """Test the polyline encoder against the format's published example."""
+    print("=" * 60)
+    print("ENCODED POLYLINE TEST")
+    print("=" * 60)
+
+    example = np.array([[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]])
+    encoded = encode_polyline(example)
+    assert encoded == '_p~iF~ps|U_ulLnnqC_mqNvxq`@', f"Published example encoded as {encoded!r}"
+
+    planner = load_planner()
+    columns = planner.exporter.route_columns(planner.route)
+    payload = json.loads(columns.to_polyline_json())
+    decoded = decode_polyline(payload['line'])
+    assert decoded.shape == columns.points.shape and \
+        np.allclose(decoded, columns.points, atol=6e-6), \
+        "Route line does not decode back"
+
+    print(f"  {len(columns.points)} points in {len(payload['line']) / 1e3:.0f} kB of polyline")
+    print("  ✓ Polyline round trip")
+
+
+def test_binary_matches_geojson():
+    """Test that the binary payload carries the segmented GeoJSON's data."""
+    print("\n" + "=" * 60)
+    print("BINARY PAYLOAD TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    geojson_text = ''.join(exporter.iter_geojson(planner.route, include_segments=True))
+    binary = exporter.route_columns(planner.route).to_binary()
+    polyline = exporter.route_columns(planner.route).to_polyline_json()
+
+    start = time.time()
+    for _ in range(5):
+        geojson = json.loads(geojson_text)
+    geojson_time = (time.time() - start) / 5
+    start = time.time()
+    for _ in range(5):
+        data = decode_binary(binary)
+    binary_time = (time.time() - start) / 5
+
+    print(f"  GeoJSON {len(geojson_text) / 1e3:.0f} kB, polyline {len(polyline) / 1e3:.0f} kB, "
+          f"binary {len(binary) / 1e3:.0f} kB")
+    print(f"  Parse: GeoJSON {geojson_time * 1000:.1f} ms, binary {binary_time * 1000:.2f} ms")
+
+    features = geojson['features']
+    offsets = data['offsets']
+    non_empty = np.flatnonzero(np.diff(offsets))
+    assert len(non_empty) == len(features), \
+        f"{len(non_empty)} segments with points, GeoJSON has {len(features)}"
+    for segment, feature in zip(non_empty.tolist(), features):
+        props = feature['properties']
+        code = int(data['name_codes'][segment])
+        name = data['names'][code] if code >= 0 else ''
+        assert props['segment_index'] == segment and \
+            props['traversal_number'] == int(data['traversals'][segment]) and \
+            props['street_name'] == name, \
+            f"Segment {segment} metadata differs"
+        points = data['points'][offsets[segment]:offsets[segment + 1]]
+        assert np.allclose(points, feature['geometry']['coordinates'], atol=1.1e-6), \
+            f"Segment {segment} geometry differs"
+    assert data['max_traversals'] == geojson['properties']['max_traversals'] and \
+        data['unique_edges'] == geojson['properties']['unique_edges'], \
+        "Summary counts differ"
+
+    assert len(geojson_text) >= 5 * len(binary) and geojson_time >= 5 * binary_time, \
+        "Binary payload not 5x smaller and faster to parse"
+
+    print("  ✓ Binary payload matches the GeoJSON")
+
+
+def test_segments_endpoint():
+    """Test that the segments endpoint serves the format asked for."""
+    print("\n" + "=" * 60)
+    print("SEGMENTS FORMAT TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner()
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+    try:
+        binary = asyncio.run(backend.get_route_segments(
+            'test-route', accept=f'{BINARY_MEDIA_TYPE}, application/json;q=0.5'))
+        polyline = asyncio.run(backend.get_route_segments('test-route', format='polyline'))
+        try:
+            asyncio.run(backend.get_route_segments('test-route', format='shp'))
+        except HTTPException as e:
+            assert e.status_code == 400, f"Unknown format answered with {e.status_code}"
+        else:
+            raise AssertionError("Unknown format accepted")
+    finally:
+        del backend.route_service.routes['test-route']
+
+    n_points = len(planner.exporter.route_columns(planner.route).points)
+    assert binary.media_type == BINARY_MEDIA_TYPE and \
+        decode_binary(binary.body)['offsets'][-1] == n_points, \
+        "Accept header did not select the binary payload"
+    assert polyline.media_type == POLYLINE_MEDIA_TYPE and \
+        json.loads(polyline.body)['encoding'] == 'polyline', \
+        "format=polyline not served"
+
+    print(f"  Binary {len(binary.body) / 1e3:.0f} kB, polyline {len(polyline.body) / 1e3:.0f} kB")
+    print("  ✓ Formats selected by Accept header and query parameter")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all route encoding tests."""
+    results = [
+        ("Encoded polyline", run_test(test_polyline)),
+        ("Binary payload", run_test(test_binary_matches_geojson)),
+        ("Segments formats", run_test(test_segments_endpoint)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
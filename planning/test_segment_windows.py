@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Test segment responses cut from the route's precomputed segment index.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+import networkx as nx
+import numpy as np
+from fastapi import HTTPException
+from shapely.geometry import box
+
+import overpass_stream
+from geojson_writer import window_geojson
+from map_loader import MapLoader
+from route_encoding import decode_binary
+from route_planner import RoutePlanner
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner(repeat=2, relabel=None):
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    if relabel is not None:
+        graph = nx.relabel_nodes(graph, relabel)
+    # Some streets without geometry exercise the node fallback
+    for _, _, data in list(graph.edges(data=True))[::9]:
+        data.pop('coords', None)
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * repeat
+    return planner
+
+
+def test_windows_concatenate():
+    """Test that consecutive windows add up to the full segments document."""
+    print("=" * 60)
+    print("WINDOWS CONCATENATE TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    exporter = planner.exporter
+    route = planner.route
+    columns = exporter.route_columns(route)
+    full = json.loads(''.join(exporter.iter_geojson(route, include_segments=True)))
+    keep = exporter.route_levels(route).mask(tolerance=10.0)[1]
+    simplified = exporter.geojson_data(route, include_segments=True, keep=keep)
+
+    for label, expected, mask in (("full", full, None), ("simplified", simplified, keep)):
+        features = []
+        binary_points = []
+        for start in range(0, len(route), 333):
+            window = json.loads(window_geojson(columns, route, start, start + 333, keep=mask))
+            features.extend(window['features'])
+            data = decode_binary(columns.to_binary(start=start, stop=start + 333, keep=mask))
+            assert data['first_segment'] == start and data['total_segments'] == len(route), \
+                "Binary window header wrong"
+            binary_points.append(data['points'])
+        assert len(features) == len(expected['features']), \
+            f"{label}: {len(features)} features from windows, " \
+            f"{len(expected['features'])} in the document"
+        for a, b in zip(expected['features'], features):
+            assert a['properties'] == b['properties'] and \
+                np.allclose(a['geometry']['coordinates'], b['geometry']['coordinates'], atol=6e-7), \
+                f"{label}: segment {a['properties']['segment_index']} differs"
+        all_points = np.concatenate([np.array(f['geometry']['coordinates']) for f in features])
+        assert np.allclose(np.concatenate(binary_points), all_points, atol=1.1e-6), \
+            f"{label}: binary windows differ"
+        print(f"  {label}: {len(features)} features in {len(range(0, len(route), 333))} windows")
+
+    print("  ✓ Windows concatenate to the whole route")
+
+
+def test_window_endpoint():
+    """Test offset/limit and around windows from the endpoint, and first-paint time."""
+    print("\n" + "=" * 60)
+    print("WINDOW ENDPOINT TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    # About 20k segments
+    planner = load_planner(repeat=32)
+    n_segments = len(planner.route)
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+
+    async def full_document():
+        response = await backend.get_route_segments('test-route')
+        return ''.join([piece async for piece in response.body_iterator])
+
+    try:
+        backend.route_service.route_columns('test-route')
+        start = time.time()
+        full = asyncio.run(full_document())
+        full_time = time.time() - start
+
+        start = time.time()
+        first = asyncio.run(backend.get_route_segments('test-route', offset=0, limit=500,
+                                                       format='binary'))
+        first_time = time.time() - start
+        around = json.loads(asyncio.run(backend.get_route_segments(
+            'test-route', around=1000, limit=100)).body)
+        tail = json.loads(asyncio.run(backend.get_route_segments(
+            'test-route', around=n_segments - 1)).body)
+        try:
+            asyncio.run(backend.get_route_segments('test-route', offset=-1))
+        except HTTPException as e:
+            assert e.status_code == 400, f"Negative offset answered with {e.status_code}"
+        else:
+            raise AssertionError("Negative offset accepted")
+    finally:
+        del backend.route_service.routes['test-route']
+
+    print(f"  {n_segments} segments: full document {len(full) / 1e6:.1f} MB in "
+          f"{full_time * 1000:.0f} ms, first window {len(first.body) / 1e3:.0f} kB in "
+          f"{first_time * 1000:.1f} ms")
+    window = decode_binary(first.body)
+    assert len(window['traversals']) == 500 and window['total_segments'] == n_segments, \
+        "offset/limit window wrong"
+    indices = [f['properties']['segment_index'] for f in around['features']]
+    assert around['properties']['first_segment'] == 950 and indices and \
+        all(950 <= i < 1050 for i in indices), \
+        "around window not centered"
+    assert tail['properties']['first_segment'] == n_segments - 200 and \
+        tail['properties']['window_segments'] == 200, \
+        "around window at the end not kept full"
+    assert first_time * 20 <= full_time, "First window not much faster than the whole document"
+
+    print("  ✓ Windows served from precomputed columns")
+
+
+def test_segment_index():
+    """Test that the whole segments document is answered from the segment index."""
+    print("\n" + "=" * 60)
+    print("SEGMENT INDEX TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner(repeat=8)
+    exporter = planner.exporter
+    table = exporter.geometry_table()
+    start = time.time()
+    expected = ''.join(exporter.iter_geojson(planner.route, include_segments=True))
+    graph_time = time.time() - start
+    expected = json.loads(expected)
+
+    columns = exporter.route_columns(planner.route)
+    assert columns.edge_indices.tolist() == table.route_indices(planner.route)[2].tolist(), \
+        "Edge index column wrong"
+
+    def unused(*args, **kwargs):
+        raise AssertionError("segments rebuilt from the graph")
+
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner,
+                                                  'columns': columns}
+    exporter.iter_geojson = unused
+    exporter.route_columns = unused
+
+    async def fetch():
+        response = await backend.get_route_segments('test-route')
+        return ''.join([piece async for piece in response.body_iterator])
+
+    try:
+        # First request warms up the event loop's thread pool
+        asyncio.run(fetch())
+        start = time.time()
+        actual = asyncio.run(fetch())
+        index_time = time.time() - start
+        actual = json.loads(actual)
+    finally:
+        del backend.route_service.routes['test-route']
+
+    print(f"  {len(planner.route)} segments: from the graph {graph_time * 1000:.0f} ms, "
+          f"from the index {index_time * 1000:.0f} ms")
+    assert [f['properties'] for f in actual['features']] == \
+        [f['properties'] for f in expected['features']], \
+        "Segment properties differ from the graph-built document"
+    for key in ('total_segments', 'total_edges', 'unique_edges', 'max_traversals'):
+        assert actual['properties'][key] == expected['properties'][key], f"{key} differs"
+
+    assert index_time <= graph_time, "Index slower than rebuilding from the graph"
+
+    print("  ✓ Segments answered from the index")
+
+
+def test_string_node_ids():
+    """Test that windows are written for graphs whose node ids are not integers."""
+    print("\n" + "=" * 60)
+    print("STRING NODE ID TEST")
+    print("=" * 60)
+
+    planner = load_planner(repeat=1, relabel=lambda node: f'n"{node}')
+    route = planner.route
+    columns = planner.exporter.route_columns(route)
+    expected = json.loads(''.join(planner.exporter.iter_geojson(route, include_segments=True)))
+    actual = json.loads(window_geojson(columns, route))
+
+    assert [f['properties'] for f in actual['features']] == \
+        [f['properties'] for f in expected['features']], \
+        "Window properties differ from the graph-built document"
+    sample = actual['features'][0]['properties']
+    assert sample['from_node'].startswith('n"') and sample['edge_key'].count('n"') == 2, \
+        f"Node ids not written as strings: {sample}"
+
+    print(f"  {len(actual['features'])} segments, e.g. edge_key {sample['edge_key']!r}")
+    print("  ✓ Non-integer node ids written as JSON strings")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all segment window tests."""
+    results = [
+        ("Windows concatenate", run_test(test_windows_concatenate)),
+        ("Window endpoint", run_test(test_window_endpoint)),
+        ("Segment index", run_test(test_segment_index)),
+        ("String node ids", run_test(test_string_node_ids)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test the tiled Overpass fetcher against a local stub Overpass server.
+Runs without network access.
+"""
+
+import json
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import overpass_stream
+from map_loader import MapLoader
+from tile_fetcher import TileFetcher
+
+
+class StubOverpass:
+    """Minimal Overpass server answering bbox way queries with a street grid."""
+
+    def __init__(self, fail_first: int = 0, delay: float = 0.05):
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fail_first = fail_first
+        self.delay = delay
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+                query = parse_qs(body)['data'][0]
+                with stub.lock:
+                    stub.requests += 1
+                    fail = stub.requests <= stub.fail_first
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    if fail:
+                        self.send_response(429)
+                        self.send_header('Retry-After', '0')
+                        self.end_headers()
+                        return
+                    payload = json.dumps(stub.grid_response(query)).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def grid_response(self, query: str) -> dict:
+        """Return a 3x3 two-way street grid inside the queried bbox."""
+        south, west, north, east = map(float, re.search(
+            r'\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)', query).groups())
+        # Node IDs derived from coordinates so neighboring tiles agree
+        def node_id(lat, lon):
+            return int(round(lat * 1e4)) * 10**7 + int(round(lon * 1e4)) + 5 * 10**6
+
+        lats = [south + (north - south) * k / 4 for k in (1, 2, 3)]
+        lons = [west + (east - west) * k / 4 for k in (1, 2, 3)]
+        elements = [{'type': 'node', 'id': node_id(lat, lon), 'lat': lat, 'lon': lon}
+                    for lat in lats for lon in lons]
+        way_id = abs(hash((south, west))) % 10**9
+        for i, lat in enumerate(lats):
+            elements.append({'type': 'way', 'id': way_id + i,
+                             'nodes': [node_id(lat, lon) for lon in lons],
+                             'tags': {'highway': 'residential', 'name': f'Street {i}'}})
+        for j, lon in enumerate(lons):
+            elements.append({'type': 'way', 'id': way_id + 10 + j,
+                             'nodes': [node_id(lat, lon) for lat in lats],
+                             'tags': {'highway': 'residential', 'name': f'Avenue {j}'}})
+        return {'version': 0.6, 'elements': elements}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RecordingFetcher(TileFetcher):
+    """TileFetcher noting when its rate limit lets each request start."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request_starts = []
+
+    def _wait_for_slot(self):
+        super()._wait_for_slot()
+        self.request_starts.append(time.monotonic())
+
+
+def test_concurrent_fetch():
+    """Test tiling, concurrency limit, rate limiting, retries and caching."""
+    print("=" * 60)
+    print("TILED FETCH TEST")
+    print("=" * 60)
+
+    stub = StubOverpass(fail_first=1)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        fetcher = RecordingFetcher('drive', tile_size=0.01, max_concurrency=3,
+                                   min_request_interval=0.02, backoff=0.01,
+                                   overpass_url=stub.url, cache_folder=cache_dir)
+
+        # Box straddles grid lines, so it covers a 4 x 4 block of tiles
+        north, south, east, west = 37.875, 37.845, -122.245, -122.275
+        tiles = fetcher.tiles_for_bbox(north, south, east, west)
+        print(f"  Tiles: {len(tiles)}")
+
+        begin = time.monotonic()
+        paths = fetcher.fetch_bbox(north, south, east, west)
+        print(f"  Requests: {stub.requests} (including 1 rejected with 429)")
+        print(f"  Max in flight: {stub.max_in_flight}")
+
+        assert len(paths) == len(tiles) and \
+            stub.requests == len(tiles) + 1, "Unexpected number of requests or cache files"
+        assert stub.max_in_flight <= 3, "Concurrency limit exceeded"
+        # Slots are handed out min_request_interval apart from the first call,
+        # and no request starts before its slot, however threads are woken
+        starts = sorted(fetcher.request_starts)
+        assert len(starts) == stub.requests, "Requests bypassed the rate limit"
+        for k, start in enumerate(starts):
+            assert start >= begin + k * fetcher.min_request_interval - 1e-3, \
+                f"Request {k} started {start - begin:.3f}s in, before its rate limit slot"
+
+        # Second fetch is served entirely from cache
+        fetcher.fetch_bbox(north, south, east, west)
+        assert stub.requests == len(tiles) + 1, "Cached tiles were fetched again"
+
+        graph = overpass_stream.build_graph(paths, 'drive')
+        print(f"  Graph from tiles: {graph.number_of_nodes()} nodes, "
+              f"{graph.number_of_edges()} edges")
+        assert graph.number_of_nodes() != 0, "Tiles produced an empty graph"
+
+        # Loads fetch the tiles of a margin around the box, then cut to it
+        graph = MapLoader('drive', tile_fetcher=fetcher).load_by_bbox(north, south, east, west)
+        print(f"  Requests after a tiled load: {stub.requests}")
+        assert stub.requests > len(tiles) + 1, "Margin around the box not fetched"
+        assert graph.number_of_nodes() and all(
+            south <= data['lat'] <= north and west <= data['lon'] <= east
+            for _, data in graph.nodes(data=True)), "Graph not cut to the box"
+
+        fetcher.close()
+        print("  ✓ Tiles fetched concurrently, retried, rate limited and cached")
+    finally:
+        stub.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all tile fetcher tests."""
+    results = [("Concurrent tiled fetch", run_test(test_concurrent_fetch))]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
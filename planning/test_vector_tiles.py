@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Test vector tiles of planned routes and the tile endpoint.
+Uses a cached Overpass response from cache/ so it runs without OSM access.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi import HTTPException
+from shapely.geometry import LineString, Point, box
+
+import overpass_stream
+from map_loader import MapLoader
+from route_planner import RoutePlanner
+from vector_tiles import EXTENT, MVT_MEDIA_TYPE, RouteTiler, tile_bounds
+
+# Degrees to local meters around Berkeley
+METERS = np.array([111320.0 * math.cos(math.radians(37.87)), 111320.0])
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache',
+                          'fbe91b813efb6f549c5c9265336fc6fb1e44a6ca.json')
+
+
+def load_planner():
+    """Planner with part of the cached area loaded and every street as the route."""
+    loader = MapLoader('drive', prune_attributes=True)
+    graph = loader._preprocess_graph(overpass_stream.build_graph(
+        [CACHE_FILE], 'drive', polygon=box(-122.275, 37.860, -122.255, 37.875)))
+    planner = RoutePlanner('drive')
+    planner.graph = graph
+    planner._setup_solver_and_exporter()
+    planner.route = [(u, v) for u, v in graph.edges()] * 2
+    return planner
+
+
+def tile_of(lon, lat, z):
+    """Tile containing a point."""
+    n = 2 ** z
+    lat = math.radians(lat)
+    return (z, int((lon + 180) / 360 * n),
+            int((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n))
+
+
+def read_fields(data):
+    """Parse protobuf fields as (field, wire type, value) tuples."""
+    position = 0
+
+    def varint():
+        nonlocal position
+        value, shift = 0, 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    fields = []
+    while position < len(data):
+        key = varint()
+        if key & 7 == 0:
+            fields.append((key >> 3, 0, varint()))
+        else:
+            length = varint()
+            fields.append((key >> 3, 2, data[position:position + length]))
+            position += length
+    return fields
+
+
+def read_varints(data):
+    """Parse packed varints."""
+    values, value, shift = [], 0, 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            values.append(value)
+            value, shift = 0, 0
+    return values
+
+
+def decode_tile(content):
+    """Decode an MVT tile's route layer into features with lines in tile coordinates."""
+    layers = [read_fields(value) for field, _, value in read_fields(content) if field == 3]
+    if not layers:
+        return {'features': [], 'extent': EXTENT}
+    layer = layers[0]
+    keys = [value.decode() for field, _, value in layer if field == 3]
+    values = []
+    for field, _, value in layer:
+        if field == 4:
+            kind, _, item = read_fields(value)[0]
+            values.append(item.decode() if kind == 1 else item)
+    features = []
+    for field, _, value in layer:
+        if field != 2:
+            continue
+        parts = {f: v for f, _, v in read_fields(value)}
+        tags = read_varints(parts[2])
+        properties = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+        commands = read_varints(parts[4])
+        lines, cursor, i = [], [0, 0], 0
+        while i < len(commands):
+            command, count = commands[i] & 7, commands[i] >> 3
+            i += 1
+            for _ in range(count):
+                dx, dy = (commands[i] >> 1) ^ -(commands[i] & 1), \
+                    (commands[i + 1] >> 1) ^ -(commands[i + 1] & 1)
+                i += 2
+                cursor = [cursor[0] + dx, cursor[1] + dy]
+                if command == 1:
+                    lines.append([])
+                lines[-1].append(cursor)
+        features.append({'id': parts[1], 'type': parts[3], 'properties': properties,
+                         'lines': lines})
+    extent = next(value for field, _, value in layer if field == 5)
+    name = next(value.decode() for field, _, value in layer if field == 1)
+    return {'name': name, 'features': features, 'extent': extent}
+
+
+def to_lon_lat(point, z, x, y):
+    """Tile coordinates back to lon/lat."""
+    west, south, east, north = tile_bounds(z, x, y)
+    n = 2 ** z
+    world_y = (y + point[1] / EXTENT) / n
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * world_y))))
+    return west + (east - west) * point[0] / EXTENT, lat
+
+
+def test_tile_contents():
+    """Test that tiles carry the route's segments with their attributes."""
+    print("=" * 60)
+    print("TILE CONTENTS TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    columns = planner.exporter.route_columns(planner.route)
+    tiler = RouteTiler(columns)
+    lon, lat = columns.points[len(columns.points) // 2]
+    z, x, y = tile_of(lon, lat, 16)
+
+    tile = decode_tile(tiler.tile(z, x, y))
+    assert tile.get('name') == 'route' and tile['extent'] == EXTENT and tile['features'], \
+        "Tile has no route layer"
+
+    for feature in tile['features']:
+        segment = feature['properties']['segment_index']
+        assert feature['type'] == 2 and feature['id'] == segment + 1 and \
+            feature['properties']['traversal_number'] == int(columns.traversals[segment]), \
+            f"Feature attributes wrong for segment {segment}"
+        code = int(columns.name_codes[segment])
+        if code >= 0:
+            assert feature['properties'].get('street_name') is not None, \
+                f"Street name missing for segment {segment}"
+        # Every vertex lies on the segment's line, up to simplification
+        # and rounding (local meters)
+        segment_points = columns.points[columns.offsets[segment]:columns.offsets[segment + 1]]
+        line = LineString(segment_points * METERS)
+        for part in feature['lines']:
+            for point in part:
+                distance = line.distance(Point(np.array(to_lon_lat(point, z, x, y)) * METERS))
+                assert distance <= 3.0, f"Vertex {point} {distance:.1f} m from segment {segment}"
+    print(f"  Tile {z}/{x}/{y}: {len(tile['features'])} features")
+
+    far = tiler.tile(16, 0, 0)
+    assert far == b'', "Tile away from the route is not empty"
+
+    try:
+        tiler.tile(3, 8, 0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Out of range tile accepted")
+
+    print("  ✓ Tiles carry segments with attributes")
+
+
+def test_zoom_and_cache():
+    """Test that low zooms are simplified and tiles are cached."""
+    print("\n" + "=" * 60)
+    print("ZOOM AND CACHE TEST")
+    print("=" * 60)
+
+    planner = load_planner()
+    tiler = RouteTiler(planner.exporter.route_columns(planner.route))
+    lon, lat = tiler.columns.points[0]
+
+    counts = {}
+    for z in (12, 18):
+        _, x, y = tile_of(lon, lat, z)
+        # The whole route at zoom 12, one tile of it at 18
+        start = time.time()
+        content = tiler.tile(z, x, y)
+        first = time.time() - start
+        start = time.time()
+        again = tiler.tile(z, x, y)
+        cached = time.time() - start
+        assert again is content, "Tile not served from the cache"
+        tile = decode_tile(content)
+        counts[z] = sum(len(line) for f in tile['features'] for line in f['lines'])
+        print(f"  z{z}: {len(content) / 1e3:.1f} kB, {counts[z]} vertices, "
+              f"{first * 1000:.1f} ms, cached {cached * 1e6:.0f} µs")
+
+    z12 = decode_tile(tiler.tile(*tile_of(lon, lat, 12)))
+    full = int(np.sum(np.diff(tiler.columns.offsets)))
+    assert counts[12] < full, "Zoom 12 tile not simplified"
+    assert tiler.hits == 3 and tiler.misses == 2, \
+        f"Unexpected cache counts: {tiler.hits} hits, {tiler.misses} misses"
+    assert z12['features'], "Zoom 12 tile empty"
+
+    print("  ✓ Tiles simplified per zoom and cached")
+
+
+def test_tile_endpoint():
+    """Test the backend tile endpoint."""
+    print("\n" + "=" * 60)
+    print("TILE ENDPOINT TEST")
+    print("=" * 60)
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    '..', 'web_app', 'backend'))
+    import app as backend
+
+    planner = load_planner()
+    backend.route_service.routes['test-route'] = {'route_id': 'test-route', 'planner': planner}
+    try:
+        columns = planner.exporter.route_columns(planner.route)
+        z, x, y = tile_of(*columns.points[0], 15)
+        response = asyncio.run(backend.get_route_tile('test-route', z, x, y))
+        tiler = backend.route_service.routes['test-route']['tiler']
+        asyncio.run(backend.get_route_tile('test-route', z, x, y))
+        try:
+            asyncio.run(backend.get_route_tile('test-route', 2, 9, 9))
+        except HTTPException as e:
+            assert e.status_code == 400, f"Invalid tile answered with {e.status_code}"
+        else:
+            raise AssertionError("Invalid tile accepted")
+    finally:
+        del backend.route_service.routes['test-route']
+
+    assert response.media_type == MVT_MEDIA_TYPE and decode_tile(response.body)['features'], \
+        "Tile not served"
+    assert tiler.hits == 1, "Second request not served from the route's tile cache"
+
+    print(f"  {z}/{x}/{y}.mvt: {len(response.body) / 1e3:.1f} kB")
+    print("  ✓ Tile endpoint serves cached MVT")
+
+
+def run_test(test) -> bool:
+    """Run a test function, reporting a failed assertion instead of raising it."""
+    try:
+        test()
+    except AssertionError as error:
+        print(f"  ✗ {error}")
+        return False
+    return True
+
+
+def main():
+    """Run all vector tile tests."""
+    results = [
+        ("Tile contents", run_test(test_tile_contents)),
+        ("Zoom and cache", run_test(test_zoom_and_cache)),
+        ("Tile endpoint", run_test(test_tile_endpoint)),
+    ]
+
+    print("\n" + "=" * 60)
+    print("TEST SUMMARY")
+    print("=" * 60)
+    for name, success in results:
+        status = "✓ PASSED" if success else "✗ FAILED"
+        print(f"{name:30} {status}")
+
+    return 0 if all(success for _, success in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
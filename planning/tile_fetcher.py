@@ -0,0 +1,241 @@
+"""
+Concurrent, rate-limited Overpass downloads split into cacheable tiles.
+
+A single large Overpass query for an uncached region often hits server
+timeouts, while many tiny ones waste round trips. TileFetcher cuts a region
+into grid-aligned tiles (so overlapping requests share cache files), fetches
+the uncached ones concurrently through a pooled HTTP session with retries
+and a minimum spacing between requests, and streams each response straight
+into the local cache.
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from shapely.geometry import box
+
+import overpass_stream
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limiting, gateway timeouts and
+# transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Tile as (north, south, east, west)
+Tile = Tuple[float, float, float, float]
+
+
+class TileFetcher:
+    """Fetches Overpass street data for a region as concurrent cached tiles."""
+
+    def __init__(self, network_type: str = 'drive',
+                 tile_size: float = 0.02,
+                 max_concurrency: int = 4,
+                 max_retries: int = 3,
+                 min_request_interval: float = 1.0,
+                 backoff: float = 2.0,
+                 overpass_url: Optional[str] = None,
+                 cache_folder: Optional[str] = None):
+        """
+        Initialize the tile fetcher.
+
+        Args:
+            network_type: OSMnx network type used for the way filter
+            tile_size: Tile edge length in degrees
+            max_concurrency: Maximum number of requests in flight
+            max_retries: Retries per tile after the first attempt
+            min_request_interval: Minimum seconds between request starts
+            backoff: Base delay in seconds for exponential retry backoff
+            overpass_url: Overpass API base URL (default: OSMnx setting)
+            cache_folder: Cache directory (default: OSMnx setting)
+        """
+        self.network_type = network_type
+        self.tile_size = tile_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.min_request_interval = min_request_interval
+        self.backoff = backoff
+        self.overpass_url = overpass_url
+        self.cache_folder = cache_folder
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._rate_lock = threading.Lock()
+        self._next_request_time = 0.0
+
+    def tiles_for_bbox(self, north: float, south: float,
+                       east: float, west: float) -> List[Tile]:
+        """
+        Split a bounding box into grid-aligned tiles.
+
+        Args:
+            north: Northern latitude boundary
+            south: Southern latitude boundary
+            east: Eastern longitude boundary
+            west: Western longitude boundary
+
+        Returns:
+            List of (north, south, east, west) tiles covering the box
+        """
+        size = self.tile_size
+        rows = range(math.floor(south / size), math.ceil(north / size))
+        cols = range(math.floor(west / size), math.ceil(east / size))
+        # Round to avoid floating point noise changing the query text (and
+        # so the cache key) between calls
+        return [
+            (round((r + 1) * size, 7), round(r * size, 7),
+             round((c + 1) * size, 7), round(c * size, 7))
+            for r in rows for c in cols
+        ]
+
+    def tiles_for_polygon(self, polygon) -> List[Tile]:
+        """
+        Get the grid tiles intersecting a polygon.
+
+        Args:
+            polygon: Shapely (Multi)Polygon in lat/lon
+
+        Returns:
+            List of (north, south, east, west) tiles
+        """
+        west, south, east, north = polygon.bounds
+        return [tile for tile in self.tiles_for_bbox(north, south, east, west)
+                if polygon.intersects(box(tile[3], tile[1], tile[2], tile[0]))]
+
+    def query_for_tile(self, tile: Tile, network_type: Optional[str] = None) -> str:
+        """
+        Build the Overpass query for one tile.
+
+        Args:
+            tile: (north, south, east, west) tile
+            network_type: Network type to query (default: the fetcher's)
+
+        Returns:
+            Overpass QL query string
+        """
+        north, south, east, west = tile
+        way_filter = overpass_stream.network_way_filter(network_type or self.network_type)
+        settings = overpass_stream.overpass_settings()
+        return f"{settings};(way{way_filter}({south},{west},{north},{east});>;);out;"
+
+    def is_cached(self, tile: Tile) -> bool:
+        """Check whether a tile's response is already in the cache."""
+        path = overpass_stream.cache_path_for_query(
+            self.query_for_tile(tile), self.overpass_url, self.cache_folder)
+        return os.path.isfile(path)
+
+    def fetch_bbox(self, north: float, south: float,
+                   east: float, west: float,
+                   network_type: Optional[str] = None) -> List[str]:
+        """
+        Make sure every tile of a bounding box is cached.
+
+        Args:
+            north: Northern latitude boundary
+            south: Southern latitude boundary
+            east: Eastern longitude boundary
+            west: Western longitude boundary
+            network_type: Network type to query (default: the fetcher's)
+
+        Returns:
+            Cache file paths of all tiles, in tile order
+        """
+        return self.fetch_tiles(self.tiles_for_bbox(north, south, east, west), network_type)
+
+    def fetch_polygon(self, polygon, network_type: Optional[str] = None) -> List[str]:
+        """
+        Make sure every tile intersecting a polygon is cached.
+
+        Args:
+            polygon: Shapely (Multi)Polygon in lat/lon
+            network_type: Network type to query (default: the fetcher's)
+
+        Returns:
+            Cache file paths of all tiles, in tile order
+        """
+        return self.fetch_tiles(self.tiles_for_polygon(polygon), network_type)
+
+    def fetch_tiles(self, tiles: List[Tile], network_type: Optional[str] = None) -> List[str]:
+        """
+        Fetch uncached tiles concurrently and return every tile's cache path.
+
+        Args:
+            tiles: List of (north, south, east, west) tiles
+            network_type: Network type to query (default: the fetcher's)
+
+        Returns:
+            Cache file paths, in tile order
+
+        Raises:
+            requests.RequestException: If a tile still fails after all retries
+        """
+        queries = [self.query_for_tile(tile, network_type) for tile in tiles]
+        paths = [overpass_stream.cache_path_for_query(q, self.overpass_url, self.cache_folder)
+                 for q in queries]
+        missing = [q for q, path in zip(queries, paths) if not os.path.isfile(path)]
+        logger.info(f"Fetching {len(missing)} of {len(tiles)} tiles "
+                   f"({self.max_concurrency} concurrent)")
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                # list() re-raises the first tile failure
+                list(executor.map(self._fetch_with_retries, missing))
+
+        return paths
+
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        self.session.close()
+
+    def _fetch_with_retries(self, query: str) -> str:
+        """Fetch one tile, retrying transient failures with backoff."""
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            try:
+                return overpass_stream.fetch_to_cache(
+                    query, session=self.session,
+                    overpass_url=self.overpass_url, cache_folder=self.cache_folder)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e.response, attempt)
+                logger.warning(f"Overpass responded {status}, retrying in {delay:.1f}s")
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                # ValueError: the server reported a partial result
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"Tile request failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """Honor Retry-After when the server sends it, else back off exponentially."""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * 2 ** attempt
+
+    def _wait_for_slot(self) -> None:
+        """Block until at least min_request_interval has passed since the last request."""
+        with self._rate_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_time)
+            self._next_request_time = start + self.min_request_interval
+        if start > now:
+            time.sleep(start - now)
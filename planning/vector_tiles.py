@@ -0,0 +1,308 @@
+"""
+Mapbox Vector Tiles of planned routes.
+
+A city-scale route is too large to send to the browser as one GeoJSON
+document. RouteTiler cuts the route's segments into Web Mercator tiles on
+request instead, so the map only downloads what is in view. Each tile has
+one 'route' layer with a LineString feature per traversed edge, carrying
+its segment index, traversal number and street name. Lines are simplified
+for the tile's zoom (see polyline_simplify), clipped to the tile plus a
+small buffer with shapely's vectorized operations, and written with a
+minimal protobuf encoder for the MVT 2.1 schema. Encoded tiles are kept in
+an LRU cache, so panning back over a tile costs a dictionary lookup.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import logging
+
+import numpy as np
+import shapely
+
+from edge_geometry import concat_ranges
+from polyline_simplify import simplify_lines, tolerance_for_zoom
+from route_encoding import RouteColumns
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MVT_MEDIA_TYPE = 'application/vnd.mapbox-vector-tile'
+
+LAYER_NAME = 'route'
+
+# Tile coordinate range, and the margin kept around it so line joins and
+# widths render without seams between tiles
+EXTENT = 4096
+BUFFER = 64
+
+MAX_ZOOM = 22
+
+# Zoom levels from which lines are no longer simplified
+FULL_DETAIL_ZOOM = 18
+
+# MVT geometry commands and types
+_MOVE_TO = 1
+_LINE_TO = 2
+_LINESTRING = 2
+
+# Feature attribute keys, in layer key order
+_KEYS = ('segment_index', 'traversal_number', 'street_name')
+
+
+class RouteTiler:
+    """Encodes and caches vector tiles of one route."""
+
+    def __init__(self, columns: RouteColumns, max_tiles: int = 2048):
+        """
+        Prepare a route for tiling.
+
+        Args:
+            columns: The route's line and segment metadata
+            max_tiles: Encoded tiles kept in the cache
+        """
+        self.columns = columns
+        self.max_tiles = max_tiles
+        self._cache: 'OrderedDict[Tuple[int, int, int], bytes]' = OrderedDict()
+        self._masks: Dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        points = columns.points
+        self.world = _world_coordinates(points)
+        self.latitude = float(np.mean(points[:, 1])) if len(points) else 0.0
+
+        # Bounding box of each segment in world coordinates
+        offsets = columns.offsets.astype(np.int64)
+        self.counts = np.diff(offsets)
+        self.starts = offsets[:-1]
+        self.bounds = np.full((len(self.counts), 4), np.nan)
+        filled = np.flatnonzero(self.counts)
+        if len(filled):
+            starts = self.starts[filled]
+            self.bounds[filled, 0:2] = np.minimum.reduceat(self.world, starts, axis=0)
+            self.bounds[filled, 2:4] = np.maximum.reduceat(self.world, starts, axis=0)
+
+        self.names = [_name_text(name) for name in columns.names]
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """
+        Get an encoded tile, from the cache when it was made before.
+
+        Args:
+            z: Zoom level
+            x: Tile column
+            y: Tile row (from the north)
+
+        Returns:
+            MVT protobuf bytes (empty for tiles the route does not cross)
+
+        Raises:
+            ValueError: If the tile address is out of range
+        """
+        if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"Invalid tile {z}/{x}/{y}")
+        key = (z, x, y)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        content = self._encode_tile(z, x, y)
+        with self._lock:
+            self._cache[key] = content
+            while len(self._cache) > self.max_tiles:
+                self._cache.popitem(last=False)
+        return content
+
+    def _keep_mask(self, z: int) -> np.ndarray:
+        """Points kept at a zoom level, simplifying each segment on its own."""
+        if z >= FULL_DETAIL_ZOOM:
+            return np.ones(len(self.world), dtype=bool)
+        with self._lock:
+            mask = self._masks.get(z)
+        if mask is None:
+            tolerance = tolerance_for_zoom(z, self.latitude)
+            mask = simplify_lines(self.columns.points, self.columns.offsets, tolerance)
+            with self._lock:
+                self._masks[z] = mask
+        return mask
+
+    def _encode_tile(self, z: int, x: int, y: int) -> bytes:
+        """Cut, clip and encode one tile."""
+        scale = 2 ** z
+        margin = BUFFER / EXTENT / scale
+        west, north = x / scale - margin, y / scale - margin
+        east, south = (x + 1) / scale + margin, (y + 1) / scale + margin
+        bounds = self.bounds
+        segments = np.flatnonzero((bounds[:, 0] <= east) & (bounds[:, 2] >= west) &
+                                  (bounds[:, 1] <= south) & (bounds[:, 3] >= north))
+        if not len(segments):
+            return b''
+
+        # Kept points of the candidate segments, in tile coordinates
+        index = concat_ranges(self.starts[segments], self.counts[segments])
+        owner = np.repeat(np.arange(len(segments)), self.counts[segments])
+        kept = self._keep_mask(z)[index]
+        index, owner = index[kept], owner[kept]
+        pixels = (self.world[index] * scale - [x, y]) * EXTENT
+        owner_counts = np.bincount(owner, minlength=len(segments))
+        lines = owner_counts >= 2
+        take = lines[owner]
+        segments = segments[lines]
+        if not len(segments):
+            return b''
+
+        # Clip to the tile and its buffer; a line can leave and re-enter
+        geometries = shapely.linestrings(pixels[take], indices=np.cumsum(lines)[owner[take]] - 1)
+        clipped = shapely.clip_by_rect(geometries, -BUFFER, -BUFFER,
+                                       EXTENT + BUFFER, EXTENT + BUFFER)
+        parts, part_feature = shapely.get_parts(clipped, return_index=True)
+        coords, part_index = shapely.get_coordinates(parts, return_index=True)
+        coords = np.round(coords).astype(np.int64)
+
+        # Drop points that round onto the previous one, then parts left too short
+        repeat = np.zeros(len(coords), dtype=bool)
+        repeat[1:] = (part_index[1:] == part_index[:-1]) & np.all(coords[1:] == coords[:-1], axis=1)
+        coords, part_index = coords[~repeat], part_index[~repeat]
+        part_counts = np.bincount(part_index, minlength=len(parts))
+        keep_parts = part_counts >= 2
+        keep_points = keep_parts[part_index]
+        coords, part_index = coords[keep_points], part_index[keep_points]
+        part_counts = part_counts[keep_parts]
+        part_feature = part_feature[keep_parts]
+        if not len(part_counts):
+            return b''
+
+        return self._encode_layer(segments, part_feature, part_counts, coords)
+
+    def _encode_layer(self, segments: np.ndarray, part_feature: np.ndarray,
+                      part_counts: np.ndarray, coords: np.ndarray) -> bytes:
+        """Write the tile's layer from clipped parts grouped by feature."""
+        columns = self.columns
+        values: List[bytes] = []
+        value_index: Dict[Tuple[int, object], int] = {}
+
+        def value(kind: int, item) -> int:
+            key = (kind, item)
+            if key not in value_index:
+                value_index[key] = len(values)
+                encoded = item.encode('utf-8') if kind == 1 else item
+                values.append(_field_bytes(kind, encoded) if kind == 1 else
+                              _field_varint(kind, encoded))
+            return value_index[key]
+
+        # Cursor deltas restart at the origin for each feature
+        part_starts = np.cumsum(part_counts) - part_counts
+        feature_of_point = np.repeat(part_feature, part_counts)
+        deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+        first_of_feature = np.ones(len(coords), dtype=bool)
+        first_of_feature[1:] = feature_of_point[1:] != feature_of_point[:-1]
+        deltas[first_of_feature] = coords[first_of_feature]
+        zigzag = (deltas << 1) ^ (deltas >> 63)
+
+        features = []
+        feature_parts = np.flatnonzero(np.diff(part_feature, prepend=-1))
+        feature_parts = np.append(feature_parts, len(part_feature))
+        for first, last in zip(feature_parts[:-1].tolist(), feature_parts[1:].tolist()):
+            segment = int(segments[part_feature[first]])
+            commands = []
+            for part in range(first, last):
+                start, count = int(part_starts[part]), int(part_counts[part])
+                commands.append(np.array([_command(_MOVE_TO, 1), *zigzag[start],
+                                          _command(_LINE_TO, count - 1)], dtype=np.int64))
+                commands.append(zigzag[start + 1:start + count].ravel())
+            code = int(columns.name_codes[segment])
+            tags = [0, value(5, segment), 1, value(5, int(columns.traversals[segment]))]
+            if code >= 0:
+                tags += [2, value(1, self.names[code])]
+            features.append(_field_bytes(2, b''.join([
+                _field_varint(1, segment + 1),
+                _field_bytes(2, _packed(np.array(tags, dtype=np.int64))),
+                _field_varint(3, _LINESTRING),
+                _field_bytes(4, _packed(np.concatenate(commands))),
+            ])))
+
+        layer = b''.join([
+            _field_varint(15, 2),
+            _field_bytes(1, LAYER_NAME.encode('utf-8')),
+            *features,
+            *(_field_bytes(3, key.encode('utf-8')) for key in _KEYS),
+            *(_field_bytes(4, item) for item in values),
+            _field_varint(5, EXTENT),
+        ])
+        return _field_bytes(3, layer)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Geographic bounds of a tile.
+
+    Args:
+        z: Zoom level
+        x: Tile column
+        y: Tile row (from the north)
+
+    Returns:
+        Tuple of (west, south, east, north) in degrees
+    """
+    def latitude(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / 2 ** z))))
+
+    scale = 2 ** z
+    return x / scale * 360 - 180, latitude(y + 1), (x + 1) / scale * 360 - 180, latitude(y)
+
+
+def _world_coordinates(points: np.ndarray) -> np.ndarray:
+    """Project lon/lat to Web Mercator coordinates in [0, 1], y from the north."""
+    lat = np.radians(np.clip(points[:, 1], -85.05112878, 85.05112878))
+    x = (points[:, 0] + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0
+    return np.column_stack([x, y])
+
+
+def _name_text(name) -> str:
+    """Street name as a single string (OSM ways may carry several)."""
+    return '; '.join(name) if isinstance(name, list) else str(name)
+
+
+def _command(command: int, count: int) -> int:
+    """Geometry command integer."""
+    return (command & 0x7) | (count << 3)
+
+
+def _packed(values: np.ndarray) -> bytes:
+    """Encode non-negative integers as concatenated protobuf varints."""
+    values = values.astype(np.uint64)
+    shifts = np.arange(0, 64, 7, dtype=np.uint64)
+    remaining = values[:, None] >> shifts
+    present = remaining > 0
+    present[:, 0] = True
+    more = np.zeros_like(present)
+    more[:, :-1] = present[:, 1:]
+    chunks = (remaining & np.uint64(0x7f)) | np.where(more, np.uint64(0x80), np.uint64(0))
+    return chunks[present].astype(np.uint8).tobytes()
+
+
+def _varint(value: int) -> bytes:
+    """Encode one non-negative integer as a protobuf varint."""
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    """Protobuf varint field."""
+    return _varint(field << 3) + _varint(value)
+
+
+def _field_bytes(field: int, data: bytes) -> bytes:
+    """Protobuf length-delimited field."""
+    return _varint((field << 3) | 2) + _varint(len(data)) + data
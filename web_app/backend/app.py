@@ -19,19 +19,24 @@ logging.basicConfig(
     force=True
 )
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
 from models import (
     BoundingBoxRequest, PointRadiusRequest, PlaceNameRequest,
     RouteResponse, RouteListResponse, RouteProgress, ErrorResponse
 )
 from route_service import RouteService
+from route_encoding import MEDIA_TYPES
+from geojson_writer import iter_window_geojson, window_geojson
+from vector_tiles import MVT_MEDIA_TYPE
+from content_encoding import IDENTITY, MIN_COMPRESS_BYTES
 import asyncio
 import json
 import os
 import logging
-from typing import Dict, Any
+from typing import Annotated, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
@@ -48,9 +53,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress other large responses, such as the route GeoJSON in
+# RouteResponse, on the fly; exports carry their own precompressed variants
+# and pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_BYTES, compresslevel=6)
+
 # Initialize route service
 route_service = RouteService()
 
+# Segments served around an index when no limit is given
+SEGMENT_WINDOW = 200
+
+# Planned routes never change, so their exports may be reused by clients
+EXPORT_CACHE_CONTROL = 'private, max-age=86400'
+
+EXPORT_FORMATS = ('gpx', 'kml', 'kmz', 'geojson', 'csv')
+
 # WebSocket connections manager
 class ConnectionManager:
     def __init__(self):
@@ -200,30 +218,58 @@ async def list_routes():
 
 
 @app.get("/api/route/{route_id}", response_model=RouteResponse)
-async def get_route(route_id: str):
-    """Get route details by ID."""
+async def get_route(route_id: str, zoom: Optional[float] = None,
+                    tolerance: Optional[float] = None):
+    """
+    Get route details by ID.
+    
+    With a map zoom level or a tolerance in meters, the route line is
+    returned at the coarsest precomputed simplification within it.
+    """
     route = route_service.get_route(route_id)
     
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
     
+    geojson = route.get('geojson')
+    keep = route_service.geometry_mask(route_id, zoom=zoom, tolerance=tolerance)
+    if keep is not None:
+        planner = route['planner']
+        geojson = await asyncio.to_thread(planner.exporter.geojson_data, planner.route,
+                                          keep=keep)
+    
     return RouteResponse(
         route_id=route_id,
         status=route['status'],
         created_at=route['created_at'],
         area_stats=route['area_stats'],
         route_stats=route.get('route_stats'),
-        geojson=route.get('geojson')
+        geojson=geojson
     )
 
 
 @app.get("/api/route/{route_id}/segments")
-async def get_route_segments(route_id: str):
+async def get_route_segments(route_id: str, zoom: Optional[float] = None,
+                             tolerance: Optional[float] = None,
+                             format: Optional[str] = None,
+                             offset: Optional[int] = None,
+                             limit: Optional[int] = None,
+                             around: Optional[int] = None,
+                             accept: Annotated[Optional[str], Header()] = None):
     """
     Get route segments with traversal metadata.
-    """
-    import tempfile
     
+    Responses are cut from the route's segment index (its RouteColumns),
+    built once when the route is planned. The whole segmented GeoJSON is
+    streamed as it is generated, without building the document in memory
+    first. zoom or tolerance select a simplified
+    line as for /api/route/{route_id}. format ('geojson', 'polyline' or
+    'binary'), or an Accept header with one of their media types, selects
+    a compact columnar payload instead (see route_encoding).
+    
+    offset and limit, or around (a segment index) with an optional limit,
+    restrict the response to a window of segments.
+    """
     route = route_service.get_route(route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
@@ -233,44 +279,117 @@ async def get_route_segments(route_id: str):
     if not planner or not planner.route:
         raise HTTPException(status_code=400, detail="Route not yet planned")
     
-    # Generate segmented GeoJSON to a temp file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.geojson', delete=False) as tmp:
-        tmp_path = tmp.name
-        planner.exporter.export_to_geojson(
-            planner.route, 
-            tmp_path,
-            route_name="StreetView Route",
-            include_segments=True
+    payload_format = format or _accepted_format(accept)
+    if payload_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format")
+    keep = route_service.geometry_mask(route_id, zoom=zoom, tolerance=tolerance,
+                                       segments=True)
+    windowed = offset is not None or limit is not None or around is not None
+    
+    # Segment index built when the route was planned
+    columns = await asyncio.to_thread(route_service.route_columns, route_id)
+    if payload_format == 'geojson' and not windowed:
+        return StreamingResponse(
+            iter_window_geojson(columns, planner.route, keep=keep),
+            media_type=MEDIA_TYPES['geojson']
         )
     
-    # Read and return the segmented data
-    with open(tmp_path, 'r') as f:
-        segments_data = json.load(f)
+    start, stop = _segment_window(columns.n_segments, offset, limit, around)
+    if payload_format == 'binary':
+        content = columns.to_binary(start=start, stop=stop, keep=keep)
+    elif payload_format == 'polyline':
+        content = columns.to_polyline_json(start=start, stop=stop, keep=keep)
+    else:
+        content = window_geojson(columns, planner.route, start, stop, keep=keep)
+    return Response(content, media_type=MEDIA_TYPES[payload_format])
+
+
+def _accepted_format(accept: Optional[str]) -> str:
+    """Payload format named by an Accept header, GeoJSON unless a compact one is listed."""
+    accepted = [part.split(';')[0].strip() for part in (accept or '').split(',')]
+    for name, media_type in MEDIA_TYPES.items():
+        if media_type in accepted:
+            return name
+    return 'geojson'
+
+
+def _segment_window(n_segments: int, offset: Optional[int], limit: Optional[int],
+                    around: Optional[int]) -> Tuple[int, int]:
+    """Segment range [start, stop) asked for by offset/limit or around/limit."""
+    if (offset is not None and offset < 0) or (limit is not None and limit < 1) or \
+            (around is not None and around < 0):
+        raise HTTPException(status_code=400, detail="Invalid segment window")
+    if around is not None:
+        limit = limit or SEGMENT_WINDOW
+        offset = max(0, min(around - limit // 2, n_segments - limit))
+    start = min(offset or 0, n_segments)
+    stop = n_segments if limit is None else min(n_segments, start + limit)
+    return start, stop
+
+
+@app.get("/api/route/{route_id}/tiles/{z}/{x}/{y}.mvt")
+async def get_route_tile(route_id: str, z: int, x: int, y: int):
+    """
+    Get a Mapbox Vector Tile of a route's segments.
+    
+    Tiles are simplified for their zoom level and cached after they are
+    first generated.
+    """
+    tiler = await asyncio.to_thread(route_service.route_tiler, route_id)
+    if tiler is None:
+        raise HTTPException(status_code=404, detail="Route not found")
     
-    # Clean up temp file
-    os.unlink(tmp_path)
+    try:
+        content = await asyncio.to_thread(tiler.tile, z, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return segments_data
+    return Response(content, media_type=MVT_MEDIA_TYPE)
 
 
 @app.get("/api/export/{route_id}/{format}")
-async def export_route(route_id: str, format: str):
-    """Export route to specified format."""
-    if format not in ['gpx', 'kml', 'geojson', 'csv']:
+async def export_route(route_id: str, format: str,
+                       if_none_match: Annotated[Optional[str], Header()] = None,
+                       accept_encoding: Annotated[Optional[str], Header()] = None):
+    """
+    Export route to specified format.
+    
+    Exports are generated and compressed once per route and format, and
+    each response is the stored variant the client's Accept-Encoding
+    prefers. Responses carry an ETag of the variant, and a request whose
+    If-None-Match lists it gets 304 Not Modified.
+    """
+    if format not in EXPORT_FORMATS:
         raise HTTPException(status_code=400, detail="Invalid format")
     
-    file_path = await route_service.export_route(route_id, format)
+    export = await route_service.export_route(route_id, format, accept_encoding)
     
-    if not file_path or not os.path.exists(file_path):
+    if export is None:
         raise HTTPException(status_code=404, detail="Export not found")
     
-    return FileResponse(
-        file_path,
+    content, etag, coding = export
+    headers = {'ETag': etag, 'Cache-Control': EXPORT_CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    if coding != IDENTITY:
+        headers['Content-Encoding'] = coding
+    headers['Content-Disposition'] = f'attachment; filename="route_{route_id}.{format}"'
+    return Response(
+        content,
         media_type='application/octet-stream',
-        filename=f"route_{route_id}.{format}"
+        headers=headers
     )
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time progress updates."""
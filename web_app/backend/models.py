@@ -45,7 +45,7 @@ class RouteResponse(BaseModel):
     created_at: datetime
     area_stats: Dict[str, Any]
     route_stats: Optional[Dict[str, Any]] = None
-    available_formats: List[str] = ['gpx', 'kml', 'geojson', 'csv']
+    available_formats: List[str] = ['gpx', 'kml', 'kmz', 'geojson', 'csv']
     geojson: Optional[Dict[str, Any]] = None  # For map visualization
 
 
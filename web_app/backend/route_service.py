@@ -12,8 +12,14 @@ planning_dir = os.path.join(project_root, 'planning')
 sys.path.insert(0, planning_dir)
 
 from route_planner import RoutePlanner
+from graph_pool import RegionGraphPool
+from route_encoding import RouteColumns
+from vector_tiles import RouteTiler
+from content_encoding import IDENTITY, choose_encoding, compress_variants
 from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
 import uuid
+import hashlib
 from datetime import datetime
 import json
 import asyncio
@@ -36,6 +42,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Export options per format: field apps render a placemark per street far
+# better than one placemark for the whole route
+EXPORT_OPTIONS = {
+    'kml': {'placemarks': 'segment'},
+    'kmz': {'placemarks': 'segment'},
+}
+
+# Regions whose requested network types are remembered, most recent first
+TRACKED_REGIONS = 256
+
+# Memory for stored export variants (all routes, formats and codings);
+# least recently downloaded exports are dropped first and regenerated on demand
+EXPORT_CACHE_MB = 64
+
 
 class RouteService:
     """Service for managing route planning operations."""
@@ -44,6 +64,44 @@ class RouteService:
         self.routes = {}  # In-memory storage for routes
         self.active_planners = {}  # Track active planning sessions
         self.backend_dir = backend_dir  # Store backend directory for output paths
+        # Recently loaded region graphs, reused for boxes drawn inside them
+        self.graph_pool = RegionGraphPool(memory_budget_mb=512)
+        # One export generation at a time per route and format; entries
+        # are dropped once the generation finishes
+        self._export_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        # Stored export variants by (route, format), least recently used first
+        self._exports: "OrderedDict[Tuple[str, str], Dict[str, Tuple[bytes, str]]]" = OrderedDict()
+        self._export_bytes = 0
+        self.export_budget_bytes = int(EXPORT_CACHE_MB * 1e6)
+        # Network types requested per region, to spot mode comparisons
+        self._region_modes: "OrderedDict[tuple, set]" = OrderedDict()
+    
+    def _create_planner(self, network_type: str, region: tuple) -> RoutePlanner:
+        """
+        Create the planner for one request.
+        
+        The shared 'all' download (see network_modes) costs more than a
+        single mode's download and is cached under the exact region, so it
+        only pays off when several network types are planned for the same
+        region. It is used from the second network type requested for a
+        region on.
+        
+        Args:
+            network_type: Network type of the request
+            region: Region key as MapLoader uses it, e.g. ('bbox', n, s, e, w)
+            
+        Returns:
+            RoutePlanner sharing the service's graph pool
+        """
+        modes = self._region_modes.setdefault(region, set())
+        modes.add(network_type)
+        self._region_modes.move_to_end(region)
+        while len(self._region_modes) > TRACKED_REGIONS:
+            self._region_modes.popitem(last=False)
+        
+        return RoutePlanner(network_type, prune_attributes=True,
+                            shared_download=len(modes) > 1, graph_pool=self.graph_pool,
+                            repair=True)
         
     async def plan_route_bbox(self, north: float, south: float, east: float, west: float,
                               network_type: str = 'drive',
@@ -71,7 +129,7 @@ class RouteService:
         try:
             # Initialize planner
             logger.info(f"[{route_id}] Creating RoutePlanner instance...")
-            planner = RoutePlanner(network_type)
+            planner = self._create_planner(network_type, ('bbox', north, south, east, west))
             self.active_planners[route_id] = planner
             logger.info(f"[{route_id}] RoutePlanner created successfully")
             
@@ -92,6 +150,7 @@ class RouteService:
             
             duration = (datetime.now() - start_time).total_seconds()
             logger.info(f"[{route_id}] Area loaded successfully in {duration:.2f} seconds")
+            logger.info(f"[{route_id}] Graph memory: {planner.map_loader.memory_report}")
             
             # Get area statistics
             logger.info(f"[{route_id}] Getting area statistics...")
@@ -125,23 +184,12 @@ class RouteService:
                     'progress': 70
                 })
             
-            # Export to GeoJSON for visualization
-            output_dir = os.path.join(self.backend_dir, "output", "routes", route_id)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            output_files = await asyncio.to_thread(
-                planner.export_route,
-                output_dir,
-                ['geojson'],
-                'route'
-            )
-            
-            # Load GeoJSON for immediate visualization
-            geojson_path = output_files.get('geojson')
-            geojson_data = None
-            if geojson_path and os.path.exists(geojson_path):
-                with open(geojson_path, 'r') as f:
-                    geojson_data = json.load(f)
+            # Build GeoJSON for immediate visualization, in memory
+            geojson_data = await asyncio.to_thread(planner.exporter.geojson_data, route)
+            # Simplified levels of the line for zoomed-out map views
+            geometry_levels = await asyncio.to_thread(planner.exporter.route_levels, route)
+            # Segment index that segment responses and tiles are served from
+            columns = await asyncio.to_thread(planner.exporter.route_columns, route)
             
             # Store route information
             self.routes[route_id] = {
@@ -151,9 +199,12 @@ class RouteService:
                 'area_stats': area_stats,
                 'route_stats': route_stats,
                 'planner': planner,
-                'output_dir': output_dir,
                 'geojson': geojson_data,
+                'geometry_levels': geometry_levels,
+                'columns': columns,
                 'network_type': network_type,
+                'graph_memory': planner.map_loader.memory_report,
+                'graph_repair': planner.map_loader.repair_report,
                 'region': {
                     'type': 'bbox',
                     'north': north,
@@ -208,7 +259,7 @@ class RouteService:
         route_id = str(uuid.uuid4())
         
         try:
-            planner = RoutePlanner(network_type)
+            planner = self._create_planner(network_type, ('point', lat, lon, radius_m))
             self.active_planners[route_id] = planner
             
             if progress_callback:
@@ -242,21 +293,11 @@ class RouteService:
                     'progress': 70
                 })
             
-            output_dir = os.path.join(self.backend_dir, "output", "routes", route_id)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            output_files = await asyncio.to_thread(
-                planner.export_route,
-                output_dir,
-                ['geojson'],
-                'route'
-            )
-            
-            geojson_path = output_files.get('geojson')
-            geojson_data = None
-            if geojson_path and os.path.exists(geojson_path):
-                with open(geojson_path, 'r') as f:
-                    geojson_data = json.load(f)
+            geojson_data = await asyncio.to_thread(planner.exporter.geojson_data, route)
+            # Simplified levels of the line for zoomed-out map views
+            geometry_levels = await asyncio.to_thread(planner.exporter.route_levels, route)
+            # Segment index that segment responses and tiles are served from
+            columns = await asyncio.to_thread(planner.exporter.route_columns, route)
             
             self.routes[route_id] = {
                 'route_id': route_id,
@@ -265,9 +306,12 @@ class RouteService:
                 'area_stats': area_stats,
                 'route_stats': route_stats,
                 'planner': planner,
-                'output_dir': output_dir,
                 'geojson': geojson_data,
+                'geometry_levels': geometry_levels,
+                'columns': columns,
                 'network_type': network_type,
+                'graph_memory': planner.map_loader.memory_report,
+                'graph_repair': planner.map_loader.repair_report,
                 'region': {
                     'type': 'point',
                     'latitude': lat,
@@ -318,7 +362,7 @@ class RouteService:
         route_id = str(uuid.uuid4())
         
         try:
-            planner = RoutePlanner(network_type)
+            planner = self._create_planner(network_type, ('place', place_name))
             self.active_planners[route_id] = planner
             
             if progress_callback:
@@ -352,21 +396,11 @@ class RouteService:
                     'progress': 70
                 })
             
-            output_dir = os.path.join(self.backend_dir, "output", "routes", route_id)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            output_files = await asyncio.to_thread(
-                planner.export_route,
-                output_dir,
-                ['geojson'],
-                'route'
-            )
-            
-            geojson_path = output_files.get('geojson')
-            geojson_data = None
-            if geojson_path and os.path.exists(geojson_path):
-                with open(geojson_path, 'r') as f:
-                    geojson_data = json.load(f)
+            geojson_data = await asyncio.to_thread(planner.exporter.geojson_data, route)
+            # Simplified levels of the line for zoomed-out map views
+            geometry_levels = await asyncio.to_thread(planner.exporter.route_levels, route)
+            # Segment index that segment responses and tiles are served from
+            columns = await asyncio.to_thread(planner.exporter.route_columns, route)
             
             self.routes[route_id] = {
                 'route_id': route_id,
@@ -375,9 +409,12 @@ class RouteService:
                 'area_stats': area_stats,
                 'route_stats': route_stats,
                 'planner': planner,
-                'output_dir': output_dir,
                 'geojson': geojson_data,
+                'geometry_levels': geometry_levels,
+                'columns': columns,
                 'network_type': network_type,
+                'graph_memory': planner.map_loader.memory_report,
+                'graph_repair': planner.map_loader.repair_report,
                 'region': {
                     'type': 'place',
                     'place_name': place_name
@@ -431,30 +468,155 @@ class RouteService:
             for r in self.routes.values()
         ]
     
-    async def export_route(self, route_id: str, format: str) -> Optional[str]:
+    async def export_route(self, route_id: str, format: str,
+                           accept_encoding: Optional[str] = None) -> Optional[Tuple[bytes, str, str]]:
         """
-        Export route to specified format.
+        Export route to specified format, in memory.
+        
+        A planned route never changes, so each format is generated once and
+        stored in every content coding worth serving, each with a hash of
+        the document as its ETag; later downloads are served from the stored
+        variant the client accepts. Stored exports are dropped least
+        recently used first once they exceed EXPORT_CACHE_MB, and generated
+        again if requested later.
         
         Args:
             route_id: Route ID
-            format: Export format ('gpx', 'kml', 'geojson', 'csv')
+            format: Export format ('gpx', 'kml', 'kmz', 'geojson', 'csv')
+            accept_encoding: The request's Accept-Encoding header, if any
             
         Returns:
-            Path to exported file
+            Tuple of (exported document, ETag, content coding), or None if
+            the route is unknown
         """
         route = self.routes.get(route_id)
         if not route or 'planner' not in route:
             return None
         
-        planner = route['planner']
-        output_dir = route['output_dir']
+        key = (route_id, format)
+        lock = self._export_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                variants = self._exports.get(key)
+                if variants is not None:
+                    self._exports.move_to_end(key)
+                else:
+                    variants = await self._generate_export(route_id, route['planner'], format)
+                    self._store_export(key, variants)
+        finally:
+            if not lock.locked() and self._export_locks.get(key) is lock:
+                del self._export_locks[key]
         
-        # Export the requested format
-        output_files = await asyncio.to_thread(
-            planner.export_route,
-            output_dir,
-            [format],
-            'route'
+        coding = choose_encoding(accept_encoding, variants)
+        content, etag = variants[coding]
+        return content, etag, coding
+    
+    async def _generate_export(self, route_id: str, planner: RoutePlanner,
+                               format: str) -> Dict[str, Tuple[bytes, str]]:
+        """Export a route and compress it, returning (data, ETag) per content coding."""
+        content = await asyncio.to_thread(
+            planner.exporter.export_to_bytes,
+            planner.route,
+            format,
+            **EXPORT_OPTIONS.get(format, {})
         )
+        variants = await asyncio.to_thread(compress_variants, content)
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        sizes = ', '.join(f"{coding} {len(data) / 1e3:.0f} kB"
+                          for coding, data in variants.items())
+        logger.info(f"[{route_id}] Generated {format.upper()} export: {sizes}")
+        # Each coding is a different representation, so gets its own ETag
+        return {
+            coding: (data, f'"{digest}"' if coding == IDENTITY else f'"{digest}-{coding}"')
+            for coding, data in variants.items()
+        }
+    
+    def _store_export(self, key: Tuple[str, str],
+                      variants: Dict[str, Tuple[bytes, str]]) -> None:
+        """Store an export's variants, evicting least recently used exports over budget."""
+        size = sum(len(data) for data, _ in variants.values())
+        if size > self.export_budget_bytes:
+            logger.info(f"Export of {size / 1e6:.1f} MB exceeds the export cache, not stored")
+            return
+        self._exports[key] = variants
+        self._export_bytes += size
+        while self._export_bytes > self.export_budget_bytes:
+            evicted_key, evicted = self._exports.popitem(last=False)
+            self._export_bytes -= sum(len(data) for data, _ in evicted.values())
+            logger.info(f"[{evicted_key[0]}] Dropped stored {evicted_key[1].upper()} export")
+    
+    def geometry_mask(self, route_id: str, zoom: Optional[float] = None,
+                      tolerance: Optional[float] = None,
+                      segments: bool = False) -> Optional[Any]:
+        """
+        Pick the precomputed simplification level of a route's line.
+        
+        Args:
+            route_id: Route ID
+            zoom: Map zoom level the geometry is drawn at
+            tolerance: Largest acceptable simplification tolerance (m),
+                takes precedence over zoom
+            segments: If True, the level for per-segment GeoJSON, otherwise
+                for the single route line
+            
+        Returns:
+            Keep mask over the route's points, or None for full resolution
+        """
+        route = self.routes.get(route_id)
+        if not route or (zoom is None and tolerance is None):
+            return None
+        planner = route.get('planner')
+        if not planner or not planner.route:
+            return None
+        
+        levels = route.get('geometry_levels')
+        if levels is None:
+            levels = route['geometry_levels'] = planner.exporter.route_levels(planner.route)
+        level, mask = levels.mask(tolerance=tolerance, zoom=zoom, segments=segments)
+        logger.info(f"[{route_id}] Serving geometry simplified to {level:g} m")
+        return mask
+    
+    def route_columns(self, route_id: str) -> Optional[RouteColumns]:
+        """
+        Get the segment columns of a route, creating them on first use.
+        
+        Args:
+            route_id: Route ID
+            
+        Returns:
+            RouteColumns of the planned route, or None if the route is
+            unknown or not planned
+        """
+        route = self.routes.get(route_id)
+        if not route:
+            return None
+        planner = route.get('planner')
+        if not planner or not planner.route:
+            return None
+        
+        if route.get('columns') is None:
+            route['columns'] = planner.exporter.route_columns(planner.route)
+        return route['columns']
+    
+    def route_tiler(self, route_id: str) -> Optional[RouteTiler]:
+        """
+        Get the vector tiler of a route, creating it on first use.
+        
+        Args:
+            route_id: Route ID
+            
+        Returns:
+            RouteTiler with its tile cache, or None if the route is unknown
+            or not planned
+        """
+        route = self.routes.get(route_id)
+        if not route:
+            return None
+        planner = route.get('planner')
+        if not planner or not planner.route:
+            return None
         
-        return output_files.get(format)
\ No newline at end of file
+        if route.get('tiler') is None:
+            route['tiler'] = RouteTiler(self.route_columns(route_id))
+            logger.info(f"[{route_id}] Vector tiler ready")
+        return route['tiler']
@@ -71,10 +71,9 @@ function App() {
       
       // Load segments for interactive visualization
       try {
-        const segments = await api.getRouteSegments(response.route_id);
-        setRouteSegments(segments);
         setCurrentSegment(0);
         setShowFullRoute(false);
+        const segments = await api.loadRouteSegments(response.route_id, setRouteSegments);
         console.log('Route segments loaded:', segments);
       } catch (error) {
         console.error('Error loading route segments:', error);
@@ -103,10 +102,9 @@ function App() {
       
       // Load segments for interactive visualization
       try {
-        const segments = await api.getRouteSegments(response.route_id);
-        setRouteSegments(segments);
         setCurrentSegment(0);
         setShowFullRoute(false);
+        const segments = await api.loadRouteSegments(response.route_id, setRouteSegments);
         console.log('Route segments loaded:', segments);
       } catch (error) {
         console.error('Error loading route segments:', error);
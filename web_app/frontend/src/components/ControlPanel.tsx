@@ -152,6 +152,7 @@ const ControlPanel: React.FC<ControlPanelProps> = ({
           <div className="export-buttons">
             <button onClick={() => onExport('gpx')}>Export GPX</button>
             <button onClick={() => onExport('kml')}>Export KML</button>
+            <button onClick={() => onExport('kmz')}>Export KMZ</button>
             <button onClick={() => onExport('geojson')}>Export GeoJSON</button>
             <button onClick={() => onExport('csv')}>Export CSV</button>
           </div>
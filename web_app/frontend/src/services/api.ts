@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { BINARY_MEDIA_TYPE, RouteSegments, decodeRouteBinary } from './routePayload';
 
 const API_BASE_URL = '/api';
 
@@ -76,9 +77,31 @@ class RouteAPI {
     return response.data;
   }
 
-  async getRouteSegments(routeId: string): Promise<any> {
-    const response = await axios.get(`${API_BASE_URL}/route/${routeId}/segments`);
-    return response.data;
+  async getRouteSegments(routeId: string, offset?: number, limit?: number): Promise<RouteSegments> {
+    // Binary columnar payload: several times smaller and faster to parse than GeoJSON
+    const response = await axios.get(`${API_BASE_URL}/route/${routeId}/segments`, {
+      params: { offset, limit },
+      headers: { Accept: BINARY_MEDIA_TYPE },
+      responseType: 'arraybuffer',
+    });
+    return decodeRouteBinary(response.data);
+  }
+
+  async loadRouteSegments(
+    routeId: string,
+    onWindow: (segments: RouteSegments) => void,
+    firstWindow: number = 500,
+    window: number = 5000,
+  ): Promise<RouteSegments> {
+    // A small first window paints at once; the rest loads while playback starts
+    let segments = await this.getRouteSegments(routeId, 0, firstWindow);
+    onWindow(segments);
+    for (let offset = firstWindow; offset < segments.properties.total_edges; offset += window) {
+      const more = await this.getRouteSegments(routeId, offset, window);
+      segments = { ...segments, features: segments.features.concat(more.features) };
+      onWindow(segments);
+    }
+    return segments;
   }
 
   async exportRoute(routeId: string, format: string): Promise<void> {
@@ -0,0 +1,108 @@
+// Decoder for the binary columnar route payload served by
+// /api/route/{id}/segments?format=binary (see planning/route_encoding.py).
+// It returns the same shape as the segmented GeoJSON the map components use,
+// for the whole route or for the window of segments that was asked for.
+
+export const BINARY_MEDIA_TYPE = 'application/vnd.streetview.route';
+
+const MAGIC = 'SVRT';
+const VERSION = 2;
+const HEADER_BYTES = 36;
+
+export interface RouteSegmentFeature {
+  type: 'Feature';
+  properties: {
+    segment_index: number;
+    traversal_number: number;
+    street_name: string;
+  };
+  geometry: {
+    type: 'LineString';
+    coordinates: [number, number][];
+  };
+}
+
+export interface RouteSegments {
+  type: 'FeatureCollection';
+  features: RouteSegmentFeature[];
+  properties: {
+    total_segments: number;
+    total_edges: number;
+    unique_edges: number;
+    max_traversals: number;
+    first_segment: number;
+    window_segments: number;
+  };
+}
+
+export function decodeRouteBinary(buffer: ArrayBuffer): RouteSegments {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== MAGIC || view.getUint16(4, true) !== VERSION) {
+    throw new Error('Not a route payload');
+  }
+  const precision = view.getUint16(6, true);
+  const nPoints = view.getUint32(8, true);
+  const nSegments = view.getUint32(12, true);
+  const firstSegment = view.getUint32(16, true);
+  const totalSegments = view.getUint32(20, true);
+  const uniqueEdges = view.getUint32(24, true);
+  const maxTraversals = view.getUint32(28, true);
+  const namesBytes = view.getUint32(32, true);
+
+  // Columns are 4-byte aligned, so typed arrays view the buffer directly
+  let position = HEADER_BYTES;
+  const deltas = new Int32Array(buffer, position, 2 * nPoints);
+  position += deltas.byteLength;
+  const offsets = new Uint32Array(buffer, position, nSegments + 1);
+  position += offsets.byteLength;
+  const nameCodes = new Int32Array(buffer, position, nSegments);
+  position += nameCodes.byteLength;
+  const traversals = new Uint16Array(buffer, position, nSegments);
+  position += traversals.byteLength;
+  position += (4 - (position % 4)) % 4;
+  const names: string[] = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, position, namesBytes))
+  );
+
+  const scale = Math.pow(10, precision);
+  const coordinates: [number, number][] = new Array(nPoints);
+  let lon = 0;
+  let lat = 0;
+  for (let i = 0; i < nPoints; i++) {
+    lon += deltas[2 * i];
+    lat += deltas[2 * i + 1];
+    coordinates[i] = [lon / scale, lat / scale];
+  }
+
+  // Edges that contribute no points are left out, as in the GeoJSON
+  const features: RouteSegmentFeature[] = [];
+  for (let i = 0; i < nSegments; i++) {
+    if (offsets[i + 1] === offsets[i]) continue;
+    features.push({
+      type: 'Feature',
+      properties: {
+        segment_index: firstSegment + i,
+        traversal_number: traversals[i],
+        street_name: nameCodes[i] >= 0 ? names[nameCodes[i]] : '',
+      },
+      geometry: {
+        type: 'LineString',
+        coordinates: coordinates.slice(offsets[i], offsets[i + 1]),
+      },
+    });
+  }
+
+  return {
+    type: 'FeatureCollection',
+    features,
+    properties: {
+      total_segments: features.length,
+      total_edges: totalSegments,
+      unique_edges: uniqueEdges,
+      max_traversals: maxTraversals,
+      first_segment: firstSegment,
+      window_segments: nSegments,
+    },
+  };
+}